@@ -0,0 +1,85 @@
+import asyncio
+from contextlib import AsyncExitStack
+from typing import cast
+
+import pytest
+
+from x_twitter_thread_dump._api.sharable_brower_ctx import SharableBrowserCtx, _PooledBrowser
+from x_twitter_thread_dump.browser import AsyncBrowser, AsyncPageCache
+
+pytestmark = pytest.mark.anyio
+
+
+class _FakeBrowser:
+    def is_connected(self) -> bool:
+        return True
+
+
+@pytest.fixture
+def launched() -> list[_PooledBrowser]:
+    return []
+
+
+@pytest.fixture
+def pool(monkeypatch: pytest.MonkeyPatch, launched: list[_PooledBrowser]) -> SharableBrowserCtx:
+    pool = SharableBrowserCtx(size=1)
+
+    async def _launch() -> _PooledBrowser:
+        browser = cast(AsyncBrowser, _FakeBrowser())
+        pooled = _PooledBrowser(stack=AsyncExitStack(), browser=browser, pages=AsyncPageCache(browser=browser))
+        pool._browsers.append(pooled)  # noqa: SLF001
+        launched.append(pooled)
+        return pooled
+
+    monkeypatch.setattr(pool, "_launch", _launch)
+    return pool
+
+
+async def _use(pool: SharableBrowserCtx, /) -> AsyncPageCache:
+    async with pool.acquire() as pages:
+        return pages
+
+
+async def _cancel_during_checkout(pool: SharableBrowserCtx, monkeypatch: pytest.MonkeyPatch, /) -> None:
+    checking = asyncio.Event()
+
+    async def _get_recycle_reason(_: _PooledBrowser) -> None:
+        checking.set()
+        await asyncio.Event().wait()
+
+    with monkeypatch.context() as patch:
+        patch.setattr(pool, "_get_recycle_reason", _get_recycle_reason)
+
+        task = asyncio.create_task(_use(pool))
+        await checking.wait()
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+
+async def test_cancelled_checkout_keeps_slot_browser(
+    pool: SharableBrowserCtx,
+    launched: list[_PooledBrowser],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    await _use(pool)
+    await _cancel_during_checkout(pool, monkeypatch)
+
+    assert await _use(pool) is launched[0].pages
+    assert len(launched) == 1
+
+
+async def test_cancelled_checkout_recycles_unhealthy_slot_browser(
+    pool: SharableBrowserCtx,
+    launched: list[_PooledBrowser],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    await _use(pool)
+    launched[0].healthy = False
+    await _cancel_during_checkout(pool, monkeypatch)
+
+    assert pool._browsers == []  # noqa: SLF001
+
+    await _use(pool)
+    assert len(launched) == 2
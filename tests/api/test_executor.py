@@ -0,0 +1,27 @@
+import io
+
+from PIL import Image
+
+from x_twitter_thread_dump._api.executor import result_to_bytes
+from x_twitter_thread_dump.browser import HTMLToImageResult
+from x_twitter_thread_dump.images import ImageEncoding, bytes_to_image
+
+
+def _result() -> HTMLToImageResult:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 4), "red").save(buffer, format="PNG")
+    screenshot = buffer.getvalue()
+
+    return HTMLToImageResult(img=bytes_to_image(screenshot), rects=[], scale=1.0, screenshot=screenshot)
+
+
+def test_png_screenshot_passes_through() -> None:
+    result = _result()
+
+    assert result_to_bytes(result) is result.screenshot
+
+
+def test_screenshot_is_encoded_with_requested_codec() -> None:
+    encoded = bytes_to_image(result_to_bytes(_result(), ImageEncoding(format="webp")))
+
+    assert (encoded.format, encoded.size) == ("WEBP", (8, 4))
@@ -0,0 +1,57 @@
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+
+import pytest
+
+from x_twitter_thread_dump._api.jobs import JobQueueFullError, RenderJobQueue
+
+pytestmark = pytest.mark.anyio
+
+
+def _render(size: int, /) -> Callable[[], Awaitable[list[bytes]]]:
+    async def _images() -> list[bytes]:
+        return [b"x" * size]
+
+    return _images
+
+
+async def _drain(jobs: RenderJobQueue, /) -> None:
+    await jobs._queue.join()  # noqa: SLF001
+
+
+async def test_oldest_finished_jobs_are_dropped_over_byte_budget() -> None:
+    async with RenderJobQueue(workers=1, max_bytes=25) as jobs:
+        submitted = []
+        for _ in range(3):
+            submitted.append(jobs.submit(_render(10), media_type="image/png"))
+            await _drain(jobs)
+
+        assert jobs.get(submitted[0].id) is None
+        assert [jobs.get(job.id) is not None for job in submitted[1:]] == [True, True]
+
+
+async def test_finished_jobs_expire() -> None:
+    async with RenderJobQueue(workers=1, ttl=timedelta(seconds=-1)) as jobs:
+        job = jobs.submit(_render(1), media_type="image/png")
+        await _drain(jobs)
+
+        assert jobs.get(job.id) is None
+
+
+async def test_failed_job_keeps_its_error() -> None:
+    async def _fail() -> list[bytes]:
+        raise RuntimeError("browser crashed")
+
+    async with RenderJobQueue(workers=1) as jobs:
+        job = jobs.submit(_fail, media_type="image/png")
+        await _drain(jobs)
+
+        assert (job.status, job.error) == ("failed", "browser crashed")
+
+
+def test_full_queue_rejects_jobs() -> None:
+    jobs = RenderJobQueue(max_size=1)
+    jobs.submit(_render(1), media_type="image/png")
+
+    with pytest.raises(JobQueueFullError):
+        jobs.submit(_render(1), media_type="image/png")
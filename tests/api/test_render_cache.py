@@ -0,0 +1,89 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from x_twitter_thread_dump._api.render_cache import RenderCache, render_cache_key
+
+pytestmark = pytest.mark.anyio
+
+
+def _key(n: int, /) -> str:
+    return render_cache_key(f"<html>{n}</html>")
+
+
+def test_invalidate_drops_tagged_entries(tmp_path: Path) -> None:
+    cache = RenderCache(path=tmp_path)
+    cache.put(_key(1), [b"a"], tags=["tweet-1"])
+    cache.put(_key(2), [b"b"], tags=["tweet-2"])
+
+    assert cache.invalidate("tweet-1") == 1
+    assert cache.get(_key(1)) is None
+    assert cache.get(_key(2)) == [b"b"]
+
+
+def test_evicted_entries_leave_their_tags() -> None:
+    cache = RenderCache(max_bytes=10)
+    for n in range(100):
+        cache.put(_key(n), [b"x" * 4], tags=[f"tweet-{n}", "thread"])
+
+    assert len(cache) == 2
+    assert cache.invalidate("thread") == 2
+    assert cache.invalidate(*(f"tweet-{n}" for n in range(100))) == 0
+
+
+def test_pruned_disk_entries_leave_their_tags(tmp_path: Path) -> None:
+    cache = RenderCache(max_bytes=10, path=tmp_path, max_disk_bytes=100)
+    for n in range(100):
+        cache.put(_key(n), [b"x" * 4], tags=["thread"])
+
+    files = [file for file in tmp_path.rglob("*") if file.is_file()]
+
+    assert cache.invalidate("thread") == len(files)
+    assert not any(file.exists() for file in files)
+
+
+def test_corrupted_disk_entry_is_dropped(tmp_path: Path) -> None:
+    RenderCache(path=tmp_path).put(_key(1), [b"image"])
+    (entry,) = [file for file in tmp_path.rglob("*") if file.is_file()]
+    entry.write_bytes(entry.read_bytes()[:-1])
+
+    assert RenderCache(path=tmp_path).get(_key(1)) is None
+    assert not entry.exists()
+
+
+async def test_render_is_cancelled_only_when_every_caller_is() -> None:
+    cache = RenderCache()
+    started = asyncio.Event()
+    release = asyncio.Event()
+    renders = 0
+
+    async def _render() -> list[bytes]:
+        nonlocal renders
+        renders += 1
+        started.set()
+        await release.wait()
+        return [b"image"]
+
+    first = asyncio.create_task(cache.fetch(_key(1), _render, tags=["tweet-1"]))
+    second = asyncio.create_task(cache.fetch(_key(1), _render))
+    await started.wait()
+
+    first.cancel()
+    release.set()
+
+    assert await second == [b"image"]
+    assert renders == 1
+    assert cache.get(_key(1)) == [b"image"]
+    assert cache.invalidate("tweet-1") == 1
+
+    release.clear()
+    started.clear()
+    lonely = asyncio.create_task(cache.fetch(_key(2), _render))
+    await started.wait()
+    lonely.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await lonely
+
+    assert cache.get(_key(2)) is None
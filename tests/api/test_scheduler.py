@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from x_twitter_thread_dump._api.scheduler import (
+    RenderPriority,
+    RenderRejectedError,
+    RenderScheduler,
+    render_context,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+async def _queue(
+    scheduler: RenderScheduler,
+    release: asyncio.Event,
+    *,
+    priority: RenderPriority = "interactive",
+) -> asyncio.Task[str]:
+    async def _render() -> str:
+        await release.wait()
+        return priority
+
+    async def _run() -> str:
+        with render_context(priority=priority):
+            return await scheduler.run(_render)
+
+    task = asyncio.create_task(_run())
+    await asyncio.sleep(0)
+
+    return task
+
+
+async def test_waiters_start_in_priority_order() -> None:
+    scheduler = RenderScheduler(concurrency=1)
+    release = asyncio.Event()
+    started: list[str] = []
+
+    running = await _queue(scheduler, release)
+    priorities: tuple[RenderPriority, ...] = ("batch", "crawler", "interactive")
+    queued = [await _queue(scheduler, release, priority=priority) for priority in priorities]
+    for task in queued:
+        task.add_done_callback(lambda task: started.append(task.result()))
+
+    assert scheduler.queue_depth() == 3
+
+    release.set()
+    await asyncio.gather(running, *queued)
+
+    assert started == ["interactive", "crawler", "batch"]
+    assert scheduler.running == 0
+
+
+async def test_render_rejected_when_projected_wait_exceeds_deadline() -> None:
+    scheduler = RenderScheduler(concurrency=1, initial_duration=10)
+    release = asyncio.Event()
+    running = await _queue(scheduler, release)
+
+    with render_context(priority="crawler", deadline=5), pytest.raises(RenderRejectedError) as exc_info:
+        await scheduler.run(release.wait)
+
+    assert exc_info.value.retry_after == 10
+    assert scheduler.stats.rejected == 1
+
+    release.set()
+    await running
+
+
+async def test_cancelled_waiter_released_in_same_tick() -> None:
+    scheduler = RenderScheduler(concurrency=2)
+    scheduler.set_limit(1)
+    release = asyncio.Event()
+
+    running = await _queue(scheduler, release)
+    waiting = await _queue(scheduler, release)
+    assert scheduler.queue_depth() == 1
+
+    # the freed slot pops the cancelled waiter before its task gets to leave the queue itself
+    waiting.cancel()
+    scheduler.set_limit(None)
+
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    assert scheduler.stats.cancelled == 1
+    assert scheduler.queue_depth() == 0
+
+    release.set()
+    await running
+
+    assert scheduler.running == 0
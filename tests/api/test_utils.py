@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from x_twitter_thread_dump._api.utils import single_flight
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_single_flight_coalesces_calls_with_the_same_key() -> None:
+    calls: list[tuple[str, int]] = []
+
+    @single_flight(key=lambda args: args["name"])
+    async def _fetch(name: str, attempt: int = 0) -> str:
+        calls.append((name, attempt))
+        await asyncio.sleep(0.01)
+        return name.upper()
+
+    results = await asyncio.gather(_fetch("a"), _fetch("a", attempt=1), _fetch("b"))
+
+    assert list(results) == ["A", "A", "B"]
+    assert calls == [("a", 0), ("b", 0)]
+
+    # finished calls are not reused
+    assert await _fetch("a") == "A"
+    assert len(calls) == 3
+
+
+async def test_single_flight_failure_is_shared() -> None:
+    calls = 0
+
+    @single_flight(key=lambda _: "key")
+    async def _fail() -> None:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(_fail(), _fail(), return_exceptions=True)
+
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+    assert calls == 1
@@ -0,0 +1,14 @@
+from pathlib import Path
+
+from x_twitter_thread_dump._bootstrap import XBootstrapCache
+
+
+def test_invalidate_removes_persisted_state(tmp_path: Path) -> None:
+    path = tmp_path / "bootstrap.json"
+    path.write_text("{}")
+
+    XBootstrapCache(path=path).invalidate()
+    assert not path.exists()
+
+    # nothing persisted is fine too
+    XBootstrapCache(path=path).invalidate()
@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+from x_twitter_thread_dump import MediaCache
+from x_twitter_thread_dump.cache import TieredCache
+
+pytestmark = pytest.mark.anyio
+
+
+def test_same_content_is_stored_once() -> None:
+    cache = MediaCache()
+    cache.put("https://a/1.png", b"image")
+    cache.put("https://a/2.png", b"image")
+
+    assert cache.get("https://a/2.png") == b"image"
+    assert (len(cache), cache.size) == (1, 5)
+
+
+def test_evicted_content_is_spilled_to_disk(tmp_path: Path) -> None:
+    cache = MediaCache(max_bytes=10, path=tmp_path)
+    cache.put("https://a/1.png", b"1" * 8)
+    cache.put("https://a/2.png", b"2" * 8)
+
+    assert cache.stats.evictions == 1
+    assert cache.get("https://a/1.png") == b"1" * 8
+    assert cache.stats.disk_hits == 1
+
+
+def test_disk_prune_drops_url_index_of_removed_content(tmp_path: Path) -> None:
+    cache = MediaCache(max_bytes=10, path=tmp_path, max_disk_bytes=100)
+    for n in range(50):
+        cache.put(f"https://a/{n}.png", bytes([n]) * 8)
+
+    blobs = {blob.name for blob in (tmp_path / "blobs").rglob("*") if blob.is_file()}
+    indexed = {url_path.read_text() for url_path in (tmp_path / "urls").iterdir()}
+
+    assert len(blobs) * 8 <= 100
+    assert all(digest in blobs or digest in cache._blobs for digest in indexed)  # noqa: SLF001
+
+
+async def test_concurrent_fetches_share_one_download() -> None:
+    cache = MediaCache()
+    downloads: list[str] = []
+
+    async def _download(url: str) -> bytes:
+        downloads.append(url)
+        await asyncio.sleep(0.01)
+        return b"image"
+
+    results = await asyncio.gather(*(cache.fetch("https://a/1.png", _download) for _ in range(5)))
+
+    assert results == [b"image"] * 5
+    assert downloads == ["https://a/1.png"]
+
+
+def test_expired_entries_are_dropped() -> None:
+    cache: TieredCache[str] = TieredCache(
+        max_size=10,
+        ttl=timedelta(seconds=-1),
+        dump=str.encode,
+        load=lambda _, data: data.decode(),
+    )
+    cache.put("key", "value")
+
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_dropped_keys_are_reported() -> None:
+    dropped: list[str] = []
+    cache: TieredCache[str] = TieredCache(
+        max_size=2,
+        dump=str.encode,
+        load=lambda _, data: data.decode(),
+        on_drop=dropped.extend,
+    )
+    for key in "abc":
+        cache.put(key, key)
+
+    cache.discard(["c"])
+
+    assert dropped == ["a", "c"]
+    assert cache.get("b") == "b"
+
+
+def test_dropped_content_removes_only_its_own_urls(tmp_path: Path) -> None:
+    cache = MediaCache(path=tmp_path)
+    cache.put("https://a/1.png", b"old")
+    cache.put("https://a/2.png", b"old")
+    cache.put("https://a/2.png", b"new")
+
+    cache._blobs.discard([hashlib.sha256(b"old").hexdigest()])  # noqa: SLF001
+
+    assert [path.read_text() for path in (tmp_path / "urls").iterdir()] == [hashlib.sha256(b"new").hexdigest()]
+    assert cache.get("https://a/2.png") == b"new"
+    assert not any((tmp_path / "refs").rglob(hashlib.sha256(b"old").hexdigest()))
+
+
+def test_urls_of_content_lost_on_restart_are_swept(tmp_path: Path) -> None:
+    # never spilled, so only the url index survives the restart
+    MediaCache(path=tmp_path).put("https://a/1.png", b"lost")
+
+    cache = MediaCache(max_bytes=4, path=tmp_path, max_disk_bytes=4)
+    for n, content in enumerate([b"1111", b"2222", b"3333"], start=2):
+        cache.put(f"https://a/{n}.png", content)
+
+    indexed = {path.read_text() for path in (tmp_path / "urls").iterdir()}
+
+    assert hashlib.sha256(b"lost").hexdigest() not in indexed
+    assert hashlib.sha256(b"3333").hexdigest() in indexed
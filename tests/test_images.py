@@ -0,0 +1,65 @@
+import io
+
+import pytest
+from PIL import Image
+
+from x_twitter_thread_dump.images import (
+    ImageEncoding,
+    chunk_rects,
+    get_image_codec,
+    negotiate_image_format,
+)
+from x_twitter_thread_dump.types import ClientBoundingRect
+
+
+@pytest.mark.parametrize(
+    ("accept", "expected"),
+    [
+        (None, "png"),
+        ("", "png"),
+        ("text/html", "png"),
+        ("image/jpeg", "jpeg"),
+        ("image/png, image/webp", "webp"),
+        ("image/webp;q=0.5, image/jpeg", "jpeg"),
+        ("image/webp;q=0, image/avif", "avif"),
+        ("image/webp;q=oops, IMAGE/AVIF;q=0.3", "avif"),
+        ("*/*", "png"),
+    ],
+)
+def test_negotiate_image_format(accept: str | None, expected: str) -> None:
+    assert negotiate_image_format(accept) == expected
+
+
+def test_negotiate_image_format_skips_unavailable_codecs(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("x_twitter_thread_dump.images.features.check", lambda feature: feature != "webp")
+
+    assert negotiate_image_format("image/webp, image/jpeg;q=0.1") == "jpeg"
+
+
+def test_get_image_codec_rejects_unknown_format() -> None:
+    with pytest.raises(ValueError, match="Unknown image format"):
+        get_image_codec("bmp")
+
+
+@pytest.mark.parametrize("format_", ["png", "png-fast", "webp", "jpeg"])
+def test_encoding_round_trip(format_: str) -> None:
+    encoding = ImageEncoding(format=format_)  # type: ignore[arg-type]
+    image = Image.new("RGBA", (8, 4), (255, 0, 0, 255))
+
+    encoded = Image.open(io.BytesIO(encoding.encode(image)))
+
+    assert encoded.format == encoding.codec.pil_format
+    assert encoded.size == (8, 4)
+
+
+def _rect(top: int, height: int, /) -> ClientBoundingRect:
+    return ClientBoundingRect(x=0, y=top, top=top, bottom=top + height, left=0, right=10, width=10, height=height)
+
+
+def test_chunk_rects() -> None:
+    rects = [_rect(0, 40), _rect(40, 40), _rect(80, 40), _rect(120, 200), _rect(320, 10)]
+
+    chunks = chunk_rects(rects, max_chunk_height=100)
+
+    assert [[rect["top"] for rect in chunk] for chunk in chunks] == [[0, 40], [80], [120], [320]]
+    assert chunk_rects([], max_chunk_height=100) == []
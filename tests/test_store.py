@@ -0,0 +1,124 @@
+from collections.abc import Callable
+from datetime import timedelta
+from pathlib import Path
+from typing import cast
+
+import pytest
+from httpx import AsyncClient, Client, ConnectError, MockTransport, Request, Response
+from x_client_transaction import ClientTransaction
+
+from x_twitter_thread_dump import XTwitterThreadDumpAsyncClient, XTwitterThreadDumpClient
+from x_twitter_thread_dump.entities import Tweet
+from x_twitter_thread_dump.store import TweetStore
+
+
+def _tweet(id_: int, /, *, parent_id: int | None = None, likes: int = 0) -> Tweet:
+    legacy = {
+        "full_text": f"tweet {id_}",
+        "quote_count": 0,
+        "reply_count": 0,
+        "retweet_count": 0,
+        "created_at": "Wed Oct 10 20:19:24 +0000 2018",
+        "favorite_count": likes,
+        "entities": {},
+    }
+    if parent_id is not None:
+        legacy["in_reply_to_status_id_str"] = str(parent_id)
+
+    user = {
+        "rest_id": "1",
+        "core": {"name": "Someone", "screen_name": "someone"},
+        "avatar": {"image_url": "https://pbs.twimg.com/profile_images/1/a_normal.jpg"},
+        "is_blue_verified": False,
+        "verification": {"verified": False},
+    }
+    return Tweet.from_raw_result(
+        {"result": {"rest_id": str(id_), "core": {"user_results": {"result": user}}, "legacy": legacy}},
+    )
+
+
+def test_chain_is_walked_toward_the_root(tmp_path: Path) -> None:
+    with TweetStore(path=tmp_path / "tweets.db") as store:
+        store.put([_tweet(1), _tweet(2, parent_id=1), _tweet(3, parent_id=2), _tweet(4, parent_id=1)])
+
+    with TweetStore(path=tmp_path / "tweets.db") as store:
+        chain = store.get_chain("3")
+
+        assert [tweet.id for tweet in chain.tweets] == ["3", "2", "1"]
+        assert chain.stale_ids == []
+        assert store.get_chain("5").tweets == []
+
+
+def test_chain_stops_at_missing_parent() -> None:
+    with TweetStore() as store:
+        store.put([_tweet(2, parent_id=1), _tweet(3, parent_id=2)])
+
+        assert [tweet.id for tweet in store.get_chain("3").tweets] == ["3", "2"]
+
+
+def test_counters_go_stale_before_content() -> None:
+    with TweetStore(counters_ttl=timedelta(seconds=-1)) as store:
+        store.put([_tweet(1), _tweet(2, parent_id=1)])
+        assert store.get_chain("2").stale_ids == ["2", "1"]
+
+        store.counters_ttl = timedelta(minutes=1)
+        store.update_counters([_tweet(1, likes=10)])
+
+        chain = store.get_chain("2")
+        assert [tweet.likes for tweet in chain.tweets] == [0, 10]
+        assert chain.stale_ids == []
+
+
+def test_expired_content_is_pruned() -> None:
+    with TweetStore(content_ttl=timedelta(seconds=-1)) as store:
+        store.put([_tweet(1)])
+
+        assert store.get_chain("1").tweets == []
+        assert store.prune() == 1
+
+
+class _FakeTransaction:
+    def generate_transaction_id(self, **_: str) -> str:
+        return "transaction-id"
+
+
+def _unreachable(request: Request) -> Response:
+    raise ConnectError("x.com is down", request=request)
+
+
+def _broken_payload(_: Request) -> Response:
+    return Response(200, json={"data": {}})
+
+
+@pytest.mark.parametrize("handler", [_unreachable, _broken_payload])
+@pytest.mark.anyio
+async def test_stale_counters_are_served_when_refresh_fails_async(handler: Callable[[Request], Response]) -> None:
+    with TweetStore(counters_ttl=timedelta(seconds=-1)) as store:
+        store.put([_tweet(1), _tweet(2, parent_id=1)])
+
+        async with AsyncClient(transport=MockTransport(handler)) as http_client:
+            client = XTwitterThreadDumpAsyncClient(
+                client=http_client,
+                transaction_client=cast(ClientTransaction, _FakeTransaction()),
+                store=store,
+            )
+            thread = await client.get_thread("2")
+
+    assert [tweet.id for tweet in thread] == ["1", "2"]
+
+
+@pytest.mark.parametrize("handler", [_unreachable, _broken_payload])
+def test_stale_counters_are_served_when_refresh_fails_sync(handler: Callable[[Request], Response]) -> None:
+    with (
+        TweetStore(counters_ttl=timedelta(seconds=-1)) as store,
+        Client(transport=MockTransport(handler)) as http_client,
+    ):
+        store.put([_tweet(1), _tweet(2, parent_id=1)])
+
+        client = XTwitterThreadDumpClient(
+            client=http_client,
+            transaction_client=cast(ClientTransaction, _FakeTransaction()),
+            store=store,
+        )
+
+        assert [tweet.id for tweet in client.get_thread("2")] == ["1", "2"]
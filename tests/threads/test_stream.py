@@ -0,0 +1,42 @@
+from datetime import UTC, datetime
+
+import pytest
+from httpx import AsyncClient
+
+from x_twitter_thread_dump._threads import ThreadsAsyncClient
+from x_twitter_thread_dump._threads._async import _SHORTCODE_ALPHABET
+from x_twitter_thread_dump._threads.entities import ThreadMedia, ThreadPost, ThreadUser
+
+pytestmark = pytest.mark.anyio
+
+
+def _post(pk: int, /) -> ThreadPost:
+    user = ThreadUser(
+        id="1",
+        username="someone",
+        is_verified=False,
+        profile_pic=ThreadMedia(url="https://cdn/pic.jpg", preview_url="https://cdn/pic.jpg", type="image"),
+    )
+    return ThreadPost(id=f"{pk}_1", user=user, caption=f"post {pk}", taken_at=datetime.now(UTC))
+
+
+@pytest.mark.parametrize(
+    ("post_id", "positions"),
+    [
+        (_SHORTCODE_ALPHABET[2], [2, 1, 0, -1]),
+        (_SHORTCODE_ALPHABET[4], [3, 2, 1, 0]),  # not in the thread, counted from the last post
+    ],
+)
+async def test_positions_are_counted_from_requested_post(
+    monkeypatch: pytest.MonkeyPatch,
+    post_id: str,
+    positions: list[int],
+) -> None:
+    async def _get_thread(_: str, /) -> list[ThreadPost]:
+        return [_post(pk) for pk in range(4)]
+
+    async with AsyncClient() as http_client:
+        client = ThreadsAsyncClient(http_client)
+        monkeypatch.setattr(client, "get_thread", _get_thread)
+
+        assert [position async for position, _ in client.iter_thread(post_id)] == positions
@@ -0,0 +1,26 @@
+from collections.abc import AsyncIterator
+
+import pytest
+from httpx import AsyncClient, MockTransport
+
+from x_twitter_thread_dump._tiktok import AdaptiveRateLimiter, TikTokAsyncClient, _async
+from x_twitter_thread_dump._tiktok.consts import TIKWM_BASE_URL
+
+from .fakes import FakeTikTok
+
+
+@pytest.fixture
+def fake_tiktok() -> FakeTikTok:
+    return FakeTikTok()
+
+
+@pytest.fixture
+async def tiktok_client(fake_tiktok: FakeTikTok, monkeypatch: pytest.MonkeyPatch) -> AsyncIterator[TikTokAsyncClient]:
+    monkeypatch.setattr(_async, "SCAN_DELAY", 0)
+
+    async with AsyncClient(base_url=TIKWM_BASE_URL, transport=MockTransport(fake_tiktok.handle)) as client:
+        yield TikTokAsyncClient(
+            client=client,
+            rate_limiter=AdaptiveRateLimiter(rate=1_000, burst=1_000),
+            scan_concurrency=2,
+        )
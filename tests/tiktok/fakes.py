@@ -0,0 +1,118 @@
+import asyncio
+from dataclasses import dataclass, field
+
+from httpx import Request, Response
+
+from x_twitter_thread_dump.types import AnyDict
+
+CREATOR = "creator"
+
+
+def raw_comment(comment_id: str, /, *, reply_total: int = 0, author: str = "someone") -> AnyDict:
+    return {
+        "id": comment_id,
+        "text": f"text of {comment_id}",
+        "user": {"id": author, "nickname": author, "unique_id": author},
+        "create_time": 1_700_000_000,
+        "reply_total": reply_total,
+    }
+
+
+def share_url(aweme_id: str, comment_id: str, /) -> str:
+    return f"https://www.tiktok.com/@{CREATOR}/video/{aweme_id}?share_item_id={aweme_id}&share_comment_id={comment_id}"
+
+
+@dataclass(kw_only=True)
+class FakeTikTok:
+    """tikwm and TikTok web API serving comments of fake videos from memory."""
+
+    page_size: int = 2
+    delay: float = 0.0  # seconds every tikwm request takes
+    rate_limited: int = 0  # number of upcoming tikwm requests answered with a rate-limit error
+    failing: set[str] = field(default_factory=set)  # videos whose comment list fails with 500
+
+    tops: dict[str, list[AnyDict]] = field(default_factory=dict)  # video -> top-level comments
+    replies: dict[str, list[AnyDict]] = field(default_factory=dict)  # top-level comment -> replies
+    parents: dict[str, str] = field(default_factory=dict)  # reply -> reply it answers
+
+    calls: list[tuple[str, str, int]] = field(default_factory=list)  # (endpoint, video or comment id, cursor)
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+    def add_video(self, aweme_id: str, /, *, tops: int, replies: dict[str, list[tuple[str, str]]]) -> None:
+        """Add a video with ``tops`` top-level comments ``{aweme_id}-t{n}``.
+
+        ``replies`` maps a top-level comment to its ``(reply id, answered id)`` pairs,
+        ``"0"`` answers the top-level comment itself.
+        """
+        self.tops[aweme_id] = [
+            raw_comment(top_id, reply_total=len(replies.get(top_id, [])))
+            for top_id in (f"{aweme_id}-t{n}" for n in range(tops))
+        ]
+
+        for top_id, top_replies in replies.items():
+            self.replies[top_id] = [raw_comment(reply_id) for reply_id, _ in top_replies]
+            self.parents.update(top_replies)
+
+    def endpoint_calls(self, endpoint: str, /) -> list[tuple[str, int]]:
+        return [(id_, cursor) for called, id_, cursor in self.calls if called == endpoint]
+
+    def _page(self, items: list[AnyDict], cursor: int, /) -> tuple[list[AnyDict], int, bool]:
+        end = cursor + self.page_size
+        return items[cursor:end], end, end < len(items)
+
+    async def _tikwm(self, endpoint: str, params: dict[str, str], /) -> Response:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+
+        if self.rate_limited:
+            self.rate_limited -= 1
+            return Response(200, json={"code": -1, "msg": "Free Api Limit: 1 request/second."})
+
+        cursor = int(params.get("cursor", 0))
+        if endpoint == "comment/list":
+            if params["url"] in self.failing:
+                return Response(500)
+
+            comments, cursor, has_more = self._page(self.tops[params["url"]], cursor)
+        else:
+            comments, cursor, has_more = self._page(self.replies.get(params["comment_id"], []), cursor)
+
+        return Response(200, json={"code": 0, "data": {"comments": comments, "cursor": cursor, "hasMore": has_more}})
+
+    def _web_replies(self, params: dict[str, str], /) -> Response:
+        # answered in a single page, so the polite delay between pages never kicks in
+        comments = [
+            {"cid": reply["id"], "reply_to_reply_id": self.parents[reply["id"]]}
+            for reply in self.replies.get(params["comment_id"], [])
+        ]
+
+        return Response(200, json={"comments": comments, "has_more": 0})
+
+    async def handle(self, request: Request, /) -> Response:
+        params = dict(request.url.params)
+
+        if request.method == "HEAD":
+            self.calls.append(("link", str(request.url), 0))
+            return Response(200)
+
+        if request.url.host == "www.tiktok.com":
+            self.calls.append(("web/reply", params["comment_id"], int(params["cursor"])))
+            return self._web_replies(params)
+
+        endpoint = request.url.path.removeprefix("/api/").strip("/")
+        self.calls.append((endpoint, params.get("comment_id") or params["url"], int(params["cursor"])))
+
+        return await self._tikwm(endpoint, params)
+
+
+__all__ = [
+    "CREATOR",
+    "FakeTikTok",
+    "raw_comment",
+    "share_url",
+]
@@ -0,0 +1,77 @@
+from datetime import timedelta
+from pathlib import Path
+
+from x_twitter_thread_dump._tiktok import TikTokCommentIndex
+
+from .fakes import raw_comment
+
+
+def _scan(index: TikTokCommentIndex, aweme_id: str, /, *, comments: int) -> None:
+    index.reset(aweme_id)
+    index.put_page(
+        aweme_id,
+        [raw_comment(f"{aweme_id}-t{n}") for n in range(comments)],
+        cursor=comments,
+        has_more=False,
+    )
+
+
+def test_lookup_returns_indexed_replies() -> None:
+    with TikTokCommentIndex() as index:
+        index.reset("1")
+        index.put_page("1", [raw_comment("t0"), raw_comment("t1", reply_total=2)], cursor=2, has_more=True)
+        index.put_replies("1", "t1", [raw_comment("r0"), raw_comment("r1")])
+        index.put_parents("1", {"r0": "0", "r1": "r0"})
+
+        hits = {hit.comment_id: hit for hit in index.lookup("1", ["t0", "r1", "missing"])}
+        video = index.get_video("1")
+
+        assert hits.keys() == {"t0", "r1"}
+        assert hits["t0"].replies is None
+        assert hits["r1"].top["id"] == "t1"
+        assert [reply["id"] for reply in hits["r1"].replies or []] == ["r0", "r1"]
+        assert index.get_parents("1", "t1") == {"r0": "0", "r1": "r0"}
+        assert video is not None
+        assert (video.cursor, video.has_more, video.pending) == (2, True, [])
+
+
+def test_expired_videos_are_not_read_and_pruned() -> None:
+    with TikTokCommentIndex(ttl=timedelta(seconds=-1)) as index:
+        _scan(index, "1", comments=2)
+
+        assert index.get_video("1") is None
+        assert index.lookup("1", ["1-t0"]) == []
+        assert index.prune() == 1
+
+
+def test_prune_keeps_most_recent_videos_within_limits() -> None:
+    with TikTokCommentIndex(max_videos=2, max_comments=5, prune_every=1_000) as index:
+        for aweme_id in ("1", "2", "3"):
+            _scan(index, aweme_id, comments=2)
+
+        assert index.prune() == 1
+        assert index.get_video("1") is None
+        assert index.get_video("3") is not None
+
+        # the newest video is kept even when it alone is over the comments limit
+        _scan(index, "4", comments=6)
+        index.prune()
+
+        assert [aweme_id for aweme_id in "1234" if index.get_video(aweme_id)] == ["4"]
+
+
+def test_started_scans_prune_periodically() -> None:
+    with TikTokCommentIndex(max_videos=2, prune_every=3) as index:
+        for aweme_id in ("1", "2", "3"):
+            _scan(index, aweme_id, comments=1)
+
+        assert index.get_video("1") is None
+        assert index.lookup("1", ["1-t0"]) == []
+
+
+def test_index_persists_between_reopens(tmp_path: Path) -> None:
+    with TikTokCommentIndex(path=tmp_path / "index.db") as index:
+        _scan(index, "1", comments=2)
+
+    with TikTokCommentIndex(path=tmp_path / "index.db") as index:
+        assert [hit.comment_id for hit in index.lookup("1", ["1-t1"])] == ["1-t1"]
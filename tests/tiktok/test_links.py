@@ -0,0 +1,54 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+from x_twitter_thread_dump._tiktok import SharedComment, ShareLinkCache
+
+pytestmark = pytest.mark.anyio
+
+
+def _shared(n: int, /) -> SharedComment:
+    return SharedComment(aweme_id=str(n), comment_id=f"c{n}", creator="creator")
+
+
+async def test_concurrent_lookups_share_one_resolution() -> None:
+    cache = ShareLinkCache()
+    resolved: list[str] = []
+
+    async def _resolve(url: str) -> SharedComment:
+        resolved.append(url)
+        await asyncio.sleep(0.01)
+        return _shared(1)
+
+    results = await asyncio.gather(*(cache.fetch("https://vt.tiktok.com/a", _resolve) for _ in range(5)))
+
+    assert results == [_shared(1)] * 5
+    assert resolved == ["https://vt.tiktok.com/a"]
+    assert await cache.fetch("https://vt.tiktok.com/a", _resolve) == _shared(1)
+    assert (cache.stats.misses, cache.stats.hits) == (1, 1)
+
+
+async def test_links_are_reloaded_from_disk(tmp_path: Path) -> None:
+    ShareLinkCache(path=tmp_path).put("https://vt.tiktok.com/a", _shared(1))
+
+    cache = ShareLinkCache(path=tmp_path)
+    assert cache.get("https://vt.tiktok.com/a") == _shared(1)
+    assert cache.stats.disk_hits == 1
+
+    expired = ShareLinkCache(path=tmp_path, ttl=timedelta(seconds=-1))
+    assert expired.get("https://vt.tiktok.com/a") is None
+
+
+def test_concurrent_puts_keep_disk_bounded(tmp_path: Path) -> None:
+    cache = ShareLinkCache(path=tmp_path, max_disk_bytes=2_000)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda n: cache.put(f"https://vt.tiktok.com/{n}", _shared(n)), range(200)))
+
+    files = [file for file in tmp_path.rglob("*") if file.is_file()]
+
+    assert files
+    assert sum(file.stat().st_size for file in files) <= 2_000
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+from x_twitter_thread_dump._tiktok import TikTokAsyncClient
+from x_twitter_thread_dump._tiktok.ratelimit import AdaptiveRateLimiter
+
+from .fakes import FakeTikTok, share_url
+
+pytestmark = pytest.mark.anyio
+
+
+def test_rate_is_halved_and_recovered() -> None:
+    limiter = AdaptiveRateLimiter(rate=8, min_rate=1, recovery=0.25)
+
+    limiter.on_rate_limited()
+    assert limiter.current_rate == 4
+
+    for _ in range(5):
+        limiter.on_rate_limited()
+    assert limiter.current_rate == 1
+
+    limiter.on_success()
+    assert limiter.current_rate == 3
+
+    for _ in range(5):
+        limiter.on_success()
+    assert limiter.current_rate == 8
+
+
+async def test_rate_limited_limiter_waits_longer() -> None:
+    limiter = AdaptiveRateLimiter(rate=50, burst=1, min_rate=1)
+    await limiter.acquire()
+
+    started = time.monotonic()
+    await limiter.acquire()
+    assert time.monotonic() - started >= 0.015
+
+    limiter.on_rate_limited()
+    started = time.monotonic()
+    await limiter.acquire()
+    assert time.monotonic() - started >= 0.035
+
+
+async def test_rate_limited_request_is_retried(fake_tiktok: FakeTikTok, tiktok_client: TikTokAsyncClient) -> None:
+    fake_tiktok.add_video("1", tops=1, replies={})
+    fake_tiktok.rate_limited = 1
+
+    (comment,) = await tiktok_client.resolve_comment(share_url("1", "1-t0"))
+
+    assert comment.id == "1-t0"
+    # halved by the rate-limited response, then recovered by the successful ones
+    limiter = tiktok_client.rate_limiter
+    assert limiter.rate / 2 < limiter.current_rate < limiter.rate
@@ -0,0 +1,58 @@
+from collections.abc import AsyncGenerator, Collection
+
+import httpx
+import pytest
+
+from x_twitter_thread_dump._tiktok import TikTokAsyncClient
+from x_twitter_thread_dump._tiktok.index import IndexedComment
+
+from .fakes import FakeTikTok, raw_comment, share_url
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_resolve_comments_skips_failed_videos(fake_tiktok: FakeTikTok, tiktok_client: TikTokAsyncClient) -> None:
+    fake_tiktok.add_video("1", tops=3, replies={"1-t1": [("1-r0", "0"), ("1-r1", "1-r0")]})
+    fake_tiktok.add_video("2", tops=3, replies={})
+    fake_tiktok.failing.add("2")
+
+    chains = {
+        url: [comment.id for comment in chain]
+        async for url, chain in tiktok_client.resolve_comments(
+            [share_url("1", "1-r1"), share_url("1", "1-t2"), share_url("2", "2-t0")],
+        )
+    }
+
+    assert chains == {
+        share_url("1", "1-r1"): ["1-t1", "1-r0", "1-r1"],
+        share_url("1", "1-t2"): ["1-t2"],
+    }
+
+
+async def test_resolve_comments_keeps_hits_found_before_scan_failure(
+    fake_tiktok: FakeTikTok,
+    tiktok_client: TikTokAsyncClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fake_tiktok.add_video("1", tops=3, replies={})
+
+    async def _scan_comments(_: str, __: Collection[str]) -> AsyncGenerator[IndexedComment]:
+        yield IndexedComment(comment_id="1-t0", top=raw_comment("1-t0"))
+        raise httpx.ConnectError("later page failed")
+
+    monkeypatch.setattr(tiktok_client, "_scan_comments", _scan_comments)
+
+    chains = {
+        url: [comment.id for comment in chain]
+        async for url, chain in tiktok_client.resolve_comments([share_url("1", "1-t0"), share_url("1", "1-t1")])
+    }
+
+    assert chains == {share_url("1", "1-t0"): ["1-t0"]}
+
+
+async def test_resolve_comment_raises_scan_failure(fake_tiktok: FakeTikTok, tiktok_client: TikTokAsyncClient) -> None:
+    fake_tiktok.add_video("1", tops=3, replies={})
+    fake_tiktok.failing.add("1")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await tiktok_client.resolve_comment(share_url("1", "1-t0"))
@@ -0,0 +1,137 @@
+import asyncio
+from collections.abc import AsyncIterator
+from dataclasses import replace
+
+import pytest
+
+from x_twitter_thread_dump._tiktok import TikTokAsyncClient, TikTokComment, TikTokCommentIndex
+from x_twitter_thread_dump._tiktok._async import _Prefetch, _walk_reply_path
+from x_twitter_thread_dump.types import AnyDict
+
+from .fakes import FakeTikTok, raw_comment, share_url
+
+pytestmark = pytest.mark.anyio
+
+
+def _ids(chain: list[TikTokComment], /) -> list[str]:
+    return [comment.id for comment in chain]
+
+
+def _video_with_replies(fake_tiktok: FakeTikTok, /, *, tops: int = 20) -> None:
+    fake_tiktok.add_video(
+        "1",
+        tops=tops,
+        replies={f"1-t{n}": [(f"1-t{n}-r0", "0"), (f"1-t{n}-r1", f"1-t{n}-r0")] for n in range(tops)},
+    )
+
+
+async def test_scan_stops_once_every_comment_is_found(
+    fake_tiktok: FakeTikTok,
+    tiktok_client: TikTokAsyncClient,
+) -> None:
+    _video_with_replies(fake_tiktok)
+    fake_tiktok.delay = 0.01
+
+    chain = await tiktok_client.resolve_comment(share_url("1", "1-t1-r1"))
+    calls = len(fake_tiktok.calls)
+    await asyncio.sleep(0.1)
+
+    assert _ids(chain) == ["1-t1", "1-t1-r0", "1-t1-r1"]
+    assert len(fake_tiktok.calls) == calls
+    assert len(fake_tiktok.endpoint_calls("comment/list")) < 10
+
+
+async def test_scan_is_bounded_by_scan_concurrency(
+    fake_tiktok: FakeTikTok,
+    tiktok_client: TikTokAsyncClient,
+) -> None:
+    _video_with_replies(fake_tiktok, tops=10)
+    fake_tiktok.delay = 0.01
+
+    with pytest.raises(LookupError):
+        await tiktok_client.resolve_comment(share_url("1", "missing"))
+
+    assert len(fake_tiktok.endpoint_calls("comment/reply")) == 10
+    # reply lists plus the next top-level page
+    assert fake_tiktok.peak_in_flight <= tiktok_client.scan_concurrency + 1
+
+
+async def test_scan_resumes_from_the_index(fake_tiktok: FakeTikTok, tiktok_client: TikTokAsyncClient) -> None:
+    _video_with_replies(fake_tiktok, tops=6)
+
+    with TikTokCommentIndex() as index:
+        client = replace(tiktok_client, comment_index=index)
+        await client.resolve_comment(share_url("1", "1-t1-r0"))
+
+        fake_tiktok.calls.clear()
+        assert _ids(await client.resolve_comment(share_url("1", "1-t1-r0"))) == ["1-t1", "1-t1-r0"]
+        assert fake_tiktok.calls == [("link", share_url("1", "1-t1-r0"), 0)]
+
+        fake_tiktok.calls.clear()
+        assert _ids(await client.resolve_comment(share_url("1", "1-t5"))) == ["1-t5"]
+        assert 0 not in [cursor for _, cursor in fake_tiktok.endpoint_calls("comment/list")]
+
+
+async def test_scan_starts_over_when_resumed_scan_misses(
+    fake_tiktok: FakeTikTok,
+    tiktok_client: TikTokAsyncClient,
+) -> None:
+    _video_with_replies(fake_tiktok, tops=6)
+
+    with TikTokCommentIndex() as index:
+        client = replace(tiktok_client, comment_index=index)
+        await client.resolve_comment(share_url("1", "1-t3"))
+
+        # posted after the first scan, lands on the already scanned first page
+        fake_tiktok.tops["1"].insert(0, raw_comment("1-new"))
+        fake_tiktok.calls.clear()
+
+        assert _ids(await client.resolve_comment(share_url("1", "1-new"))) == ["1-new"]
+
+        cursors = [cursor for _, cursor in fake_tiktok.endpoint_calls("comment/list")]
+        assert cursors[0] > 0
+        assert 0 in cursors
+
+
+async def _pages[V](*pages: dict[str, V]) -> AsyncIterator[dict[str, V]]:
+    for page in pages:
+        await asyncio.sleep(0.01)
+        yield page
+
+
+async def test_reply_path_ends_when_parents_stream_is_exhausted() -> None:
+    bodies: dict[str, AnyDict] = {"r1": raw_comment("r1"), "r2": raw_comment("r2")}
+    parents: dict[str, str] = {}
+
+    async with _Prefetch() as prefetch:
+        # the parent of r1 never arrives, so r1 is taken as a reply to the top comment
+        prefetch.add(parents, _pages({"r2": "r1"}))
+
+        path = await asyncio.wait_for(_walk_reply_path("r2", bodies, parents, prefetch.wait_for), timeout=1)
+
+    assert [reply["id"] for reply in path] == ["r1", "r2"]
+
+
+async def test_reply_path_ends_at_a_reply_whose_body_never_arrives() -> None:
+    bodies: dict[str, AnyDict] = {"r2": raw_comment("r2")}
+    parents: dict[str, str] = {}
+
+    async with _Prefetch() as prefetch:
+        prefetch.add(bodies, _pages({"r3": raw_comment("r3")}))
+        prefetch.add(parents, _pages({"r3": "r2"}, {"r2": "r1"}))
+
+        path = await asyncio.wait_for(_walk_reply_path("r3", bodies, parents, prefetch.wait_for), timeout=1)
+
+    assert [reply["id"] for reply in path] == ["r2", "r3"]
+
+
+async def test_prefetch_cancels_running_streams_on_exit() -> None:
+    async def _endless() -> AsyncIterator[dict[str, str]]:
+        while True:
+            await asyncio.sleep(0.01)
+            yield {}
+
+    async with _Prefetch() as prefetch:
+        prefetch.add({}, _endless())
+
+    assert all(task.cancelled() for _, task in prefetch._streams)  # noqa: SLF001
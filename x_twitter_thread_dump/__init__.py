@@ -1,13 +1,26 @@
-from ._async import XTwitterThreadDumpAsyncClient, x_twitter_thread_dump_async_client
+from ._async import (
+    XTwitterThreadDumpAsyncClient,
+    create_x_twitter_async_http_client,
+    x_twitter_thread_dump_async_client,
+)
+from ._bootstrap import XBootstrapCache
 from ._sync import XTwitterThreadDumpClient, x_twitter_thread_dump_client
+from .cache import MediaCache
 from .entities import Media, Thread, Tweet
+from .images import ImageEncoding
+from .store import TweetStore
 
 __all__ = [
+    "ImageEncoding",
     "Media",
+    "MediaCache",
     "Thread",
     "Tweet",
+    "TweetStore",
+    "XBootstrapCache",
     "XTwitterThreadDumpAsyncClient",
     "XTwitterThreadDumpClient",
+    "create_x_twitter_async_http_client",
     "x_twitter_thread_dump_async_client",
     "x_twitter_thread_dump_client",
 ]
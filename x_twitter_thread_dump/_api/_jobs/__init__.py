@@ -0,0 +1,6 @@
+from .router import router, submit_render_job
+
+__all__ = [
+    "router",
+    "submit_render_job",
+]
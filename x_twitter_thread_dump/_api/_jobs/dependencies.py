@@ -0,0 +1,45 @@
+from typing import Annotated, TypeAlias
+
+from fastapi import Depends, HTTPException, status
+
+from x_twitter_thread_dump._api.dependencies import CurrentRenderJobs
+from x_twitter_thread_dump._api.jobs import RenderJob
+
+
+async def current_render_job(
+    jobs: CurrentRenderJobs,
+    job_id: str,
+) -> RenderJob:
+    if (job := jobs.get(job_id)) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Render job {job_id} not found or expired")
+
+    return job
+
+
+CurrentRenderJob: TypeAlias = Annotated[
+    RenderJob,
+    Depends(current_render_job),
+]
+
+
+async def current_finished_render_job(
+    job: CurrentRenderJob,
+) -> RenderJob:
+    match job.status:
+        case "done":
+            return job
+        case "failed":
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Render job failed: {job.error}")
+        case _:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Render job is {job.status}")
+
+
+CurrentFinishedRenderJob: TypeAlias = Annotated[
+    RenderJob,
+    Depends(current_finished_render_job),
+]
+
+__all__ = [
+    "CurrentFinishedRenderJob",
+    "CurrentRenderJob",
+]
@@ -0,0 +1,71 @@
+from collections.abc import Awaitable, Callable
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Query, Response, status
+
+from x_twitter_thread_dump._api.dependencies import CurrentCPUExecutor
+from x_twitter_thread_dump._api.executor import images_to_base64
+from x_twitter_thread_dump._api.jobs import JobQueueFullError, RenderJobQueue
+from x_twitter_thread_dump._api.schemas import Base64ImageSchema, ImagesSchema, RenderJobSchema
+
+from .dependencies import CurrentFinishedRenderJob, CurrentRenderJob
+
+router = APIRouter(
+    prefix="/jobs",
+)
+
+
+def submit_render_job(
+    jobs: RenderJobQueue,
+    render: Callable[[], Awaitable[list[bytes]]],
+    /,
+    *,
+    media_type: str,
+) -> RenderJobSchema:
+    try:
+        job = jobs.submit(render, media_type=media_type)
+    except JobQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "30"},
+        ) from None
+
+    return RenderJobSchema.model_validate(job)
+
+
+@router.get("/{job_id}")
+async def get_render_job(
+    job: CurrentRenderJob,
+) -> RenderJobSchema:
+    return RenderJobSchema.model_validate(job)
+
+
+@router.get("/{job_id}/imgs")
+async def get_render_job_imgs(
+    job: CurrentFinishedRenderJob,
+    executor: CurrentCPUExecutor,
+) -> ImagesSchema:
+    images = await executor.run(images_to_base64, job.images or [])
+
+    return ImagesSchema(
+        images=[Base64ImageSchema(content=content, media_type=job.media_type) for content in images],
+    )
+
+
+@router.get("/{job_id}/raw-img")
+async def get_render_job_raw_img(
+    job: CurrentFinishedRenderJob,
+    index: Annotated[int, Query(ge=0)] = 0,
+) -> Response:
+    images = job.images or []
+    if index >= len(images):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Render job has {len(images)} images")
+
+    return Response(content=images[index], media_type=job.media_type)
+
+
+__all__ = [
+    "router",
+    "submit_render_job",
+]
@@ -3,12 +3,17 @@ from typing import Annotated, TypeAlias
 
 from fastapi import Depends
 
+from x_twitter_thread_dump._api.dependencies import CurrentHTTPClients, CurrentMediaCache
+from x_twitter_thread_dump._api.utils import single_flight
 from x_twitter_thread_dump._threads import ThreadsAsyncClient, threads_async_client
 from x_twitter_thread_dump._threads.entities import ThreadPost
 
 
-async def get_threads_async_client() -> AsyncIterator[ThreadsAsyncClient]:
-    async with threads_async_client() as client:
+async def get_threads_async_client(
+    http_clients: CurrentHTTPClients,
+    media_cache: CurrentMediaCache,
+) -> AsyncIterator[ThreadsAsyncClient]:
+    async with threads_async_client(client=http_clients.threads, media_cache=media_cache) as client:
         yield client
 
 
@@ -18,6 +23,7 @@ CurrentThreadsClient: TypeAlias = Annotated[
 ]
 
 
+@single_flight(key=lambda args: ("threads", args["post_id"]))
 async def current_thread(
     client: CurrentThreadsClient,
     post_id: str,
@@ -31,6 +37,7 @@ CurrentThread: TypeAlias = Annotated[
 ]
 
 
+@single_flight(key=lambda args: ("threads", id(args["thread"])))
 async def current_thread_with_previews(
     client: CurrentThreadsClient,
     thread: CurrentThread,
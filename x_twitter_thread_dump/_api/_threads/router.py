@@ -1,14 +1,36 @@
+from dataclasses import asdict
+from functools import partial
 from typing import Annotated
 
-from fastapi import APIRouter, Query, Response
+from fastapi import APIRouter, Query, Response, status
+from fastapi.responses import StreamingResponse
 from starlette.responses import HTMLResponse
 
-from x_twitter_thread_dump._api.dependencies import CurrentBrowserCtxConfig, CurrentSharableBrowserCtx
-from x_twitter_thread_dump._api.router import render_html
-from x_twitter_thread_dump._api.schemas import Base64ImageSchema, ImagesSchema, MediaSchema
-from x_twitter_thread_dump._base import BaseXTwitterThreadDumpClient
+from x_twitter_thread_dump._api._jobs import submit_render_job
+from x_twitter_thread_dump._api.dependencies import (
+    CurrentBrowserCtxConfig,
+    CurrentCPUExecutor,
+    CurrentHTTPCache,
+    CurrentImageEncoding,
+    CurrentRenderCache,
+    CurrentRenderJobs,
+    CurrentSharableBrowserCtx,
+)
+from x_twitter_thread_dump._api.executor import images_to_base64, result_to_bytes
+from x_twitter_thread_dump._api.http_cache import make_etag
+from x_twitter_thread_dump._api.render_cache import render_cache_key
+from x_twitter_thread_dump._api.router import render_html, render_images
+from x_twitter_thread_dump._api.schemas import (
+    Base64ImageSchema,
+    ImagesSchema,
+    MediaSchema,
+    RenderJobSchema,
+    StreamedThreadPostSchema,
+)
+from x_twitter_thread_dump._api.settings import settings
+from x_twitter_thread_dump._api.streaming import NDJSON_MEDIA_TYPE, ndjson_response
 from x_twitter_thread_dump._threads.render import render_thread_html
-from x_twitter_thread_dump.images import image_to_base64str, image_to_bytes
+from x_twitter_thread_dump.browser import media_routes
 
 from .dependencies import CurrentThread, CurrentThreadsClient, CurrentThreadWithPreviews
 
@@ -17,19 +39,39 @@ router = APIRouter(
 )
 
 
+@router.get(
+    "/stream/{post_id}",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {"schema": StreamedThreadPostSchema.model_json_schema()}}}},
+)
+async def stream_threads_post_json(
+    client: CurrentThreadsClient,
+    post_id: str,
+) -> StreamingResponse:
+    items = (
+        StreamedThreadPostSchema(position=position, post=post.raw_data)
+        async for position, post in client.iter_thread(post_id)
+    )
+
+    return await ndjson_response(items)
+
+
 @router.get("/html/{post_id}")
 async def get_threads_post_html(
     client: CurrentThreadsClient,
     thread: CurrentThread,
+    executor: CurrentCPUExecutor,
     *,
+    http_cache: CurrentHTTPCache,
     download_previews: Annotated[bool, Query()] = True,
 ) -> HTMLResponse:
     if download_previews:
         await client.download_previews(thread)
 
-    html = render_thread_html(thread)
+    html = await executor.run(render_thread_html, thread)
+    headers = http_cache.validate(make_etag(html), cache_control=settings.CACHE_CONTROL_HTML)
 
-    return HTMLResponse(content=html)
+    return HTMLResponse(content=html, headers=headers)
 
 
 @router.get("/imgs/{post_id}")
@@ -37,46 +79,125 @@ async def get_threads_imgs(  # noqa: PLR0913
     thread: CurrentThreadWithPreviews,
     browser_ctx: CurrentSharableBrowserCtx,
     config: CurrentBrowserCtxConfig,
+    executor: CurrentCPUExecutor,
     *,
+    encoding: CurrentImageEncoding,
+    render_cache: CurrentRenderCache,
+    http_cache: CurrentHTTPCache,
     include_media: Annotated[bool, Query()] = False,
     tweets_per_image: Annotated[int | None, Query(ge=1, le=10)] = None,
     max_tweet_height: Annotated[int | None, Query(ge=1, le=10_000)] = None,
 ) -> ImagesSchema:
-    html = render_thread_html(thread)
-    result = await render_html(browser_ctx, chunk=html, config=config)
+    html = await executor.run(render_thread_html, thread, inline_media=False)
 
-    imgs = BaseXTwitterThreadDumpClient.prepare_result_img(
-        result,
+    key = render_cache_key(
+        html,
+        config=config,
+        encoding=asdict(encoding),
         tweets_per_image=tweets_per_image,
         max_tweet_height=max_tweet_height,
     )
+    http_cache.validate(make_etag(key, str(include_media)), cache_control=settings.CACHE_CONTROL_IMAGES, vary="Accept")
+
+    render = partial(
+        render_images,
+        browser_ctx,
+        executor,
+        html=html,
+        config=config,
+        media=media_routes(media for post in thread for media in post.all_preview_media()),
+        encoding=encoding,
+        tweets_per_image=tweets_per_image,
+        max_tweet_height=max_tweet_height,
+    )
+    rendered = await render_cache.fetch(key, render, tags=[post.id for post in thread])
+    images = await executor.run(images_to_base64, rendered)
 
     media = None
     if include_media:
         media = [MediaSchema.model_validate(media) for tweet in thread for media in tweet.all_media()]
 
-    images = [Base64ImageSchema(content=image_to_base64str(img)) for img in imgs]
-
     return ImagesSchema(
-        images=images,
+        images=[Base64ImageSchema(content=content, media_type=encoding.codec.media_type) for content in images],
         media=media,
     )
 
 
+@router.post("/jobs/imgs/{post_id}", status_code=status.HTTP_202_ACCEPTED)
+async def submit_threads_imgs_job(  # noqa: PLR0913
+    thread: CurrentThreadWithPreviews,
+    browser_ctx: CurrentSharableBrowserCtx,
+    config: CurrentBrowserCtxConfig,
+    executor: CurrentCPUExecutor,
+    *,
+    encoding: CurrentImageEncoding,
+    render_cache: CurrentRenderCache,
+    jobs: CurrentRenderJobs,
+    tweets_per_image: Annotated[int | None, Query(ge=1, le=10)] = None,
+    max_tweet_height: Annotated[int | None, Query(ge=1, le=10_000)] = None,
+) -> RenderJobSchema:
+    html = await executor.run(render_thread_html, thread, inline_media=False)
+
+    key = render_cache_key(
+        html,
+        config=config,
+        encoding=asdict(encoding),
+        tweets_per_image=tweets_per_image,
+        max_tweet_height=max_tweet_height,
+    )
+    render = partial(
+        render_images,
+        browser_ctx,
+        executor,
+        html=html,
+        config=config,
+        media=media_routes(media for post in thread for media in post.all_preview_media()),
+        encoding=encoding,
+        tweets_per_image=tweets_per_image,
+        max_tweet_height=max_tweet_height,
+    )
+
+    return submit_render_job(
+        jobs,
+        partial(render_cache.fetch, key, render, tags=[post.id for post in thread]),
+        media_type=encoding.codec.media_type,
+    )
+
+
 @router.get("/raw-img/{post_id}")
-async def get_threads_raw_img(
+async def get_threads_raw_img(  # noqa: PLR0913
     thread: CurrentThreadWithPreviews,
     browser_ctx: CurrentSharableBrowserCtx,
     config: CurrentBrowserCtxConfig,
+    executor: CurrentCPUExecutor,
+    *,
+    encoding: CurrentImageEncoding,
+    render_cache: CurrentRenderCache,
+    http_cache: CurrentHTTPCache,
 ) -> Response:
-    html = render_thread_html(thread)
-    result = await render_html(browser_ctx, chunk=html, config=config)
+    html = await executor.run(render_thread_html, thread, inline_media=False)
+
+    async def _render() -> list[bytes]:
+        result = await render_html(
+            browser_ctx,
+            chunk=html,
+            config=config,
+            media=media_routes(media for post in thread for media in post.all_preview_media()),
+        )
+
+        return [await executor.run(result_to_bytes, result, encoding)]
+
+    key = render_cache_key(html, config=config, encoding=asdict(encoding))
+    headers = http_cache.validate(make_etag(key), cache_control=settings.CACHE_CONTROL_IMAGES, vary="Accept")
+
+    (content,) = await render_cache.fetch(key, _render, tags=[post.id for post in thread])
 
     return Response(
-        content=image_to_bytes(result.img),
-        media_type="image/png",
+        content=content,
+        media_type=encoding.codec.media_type,
         headers={
-            "Content-Disposition": "inline; filename=thread.png",
+            **headers,
+            "Content-Disposition": f"inline; filename=thread.{encoding.codec.extension}",
         },
     )
 
@@ -3,13 +3,39 @@ from typing import Annotated, TypeAlias
 
 from fastapi import Depends, Query
 
+from x_twitter_thread_dump._api.dependencies import (
+    CurrentHTTPClients,
+    CurrentMediaCache,
+    CurrentTikTokCommentIndex,
+    CurrentTikTokLinkCache,
+)
 from x_twitter_thread_dump._api.schemas import TikTokShareURL
-from x_twitter_thread_dump._tiktok import TikTokAsyncClient, tiktok_async_client
+from x_twitter_thread_dump._api.settings import settings
+from x_twitter_thread_dump._api.utils import single_flight
+from x_twitter_thread_dump._tiktok import AdaptiveRateLimiter, TikTokAsyncClient, tiktok_async_client
 from x_twitter_thread_dump._tiktok.entities import TikTokComment
 
+tikwm_rate_limiter = AdaptiveRateLimiter(
+    rate=settings.TIKWM_RATE,
+    min_rate=settings.TIKWM_MIN_RATE,
+    burst=settings.TIKWM_BURST,
+)
 
-async def get_tiktok_async_client() -> AsyncIterator[TikTokAsyncClient]:
-    async with tiktok_async_client() as client:
+
+async def get_tiktok_async_client(
+    http_clients: CurrentHTTPClients,
+    media_cache: CurrentMediaCache,
+    comment_index: CurrentTikTokCommentIndex,
+    link_cache: CurrentTikTokLinkCache,
+) -> AsyncIterator[TikTokAsyncClient]:
+    async with tiktok_async_client(
+        client=http_clients.tiktok,
+        media_cache=media_cache,
+        comment_index=comment_index,
+        link_cache=link_cache,
+        rate_limiter=tikwm_rate_limiter,
+        scan_concurrency=settings.TIKTOK_SCAN_CONCURRENCY,
+    ) as client:
         yield client
 
 
@@ -19,6 +45,7 @@ CurrentTikTokClient: TypeAlias = Annotated[
 ]
 
 
+@single_flight(key=lambda args: ("tiktok", str(args["url"])))
 async def current_comments(
     client: CurrentTikTokClient,
     url: Annotated[TikTokShareURL, Query()],
@@ -32,6 +59,7 @@ CurrentComments: TypeAlias = Annotated[
 ]
 
 
+@single_flight(key=lambda args: ("tiktok", id(args["comments"])))
 async def current_comments_with_previews(
     client: CurrentTikTokClient,
     comments: CurrentComments,
@@ -52,4 +80,5 @@ __all__ = [
     "current_comments",
     "current_comments_with_previews",
     "get_tiktok_async_client",
+    "tikwm_rate_limiter",
 ]
@@ -1,15 +1,40 @@
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from dataclasses import asdict
+from functools import partial
 from typing import Annotated
 
-from fastapi import APIRouter, Query, Response
+from fastapi import APIRouter, Query, Response, status
+from fastapi.responses import StreamingResponse
 from starlette.responses import HTMLResponse
 
-from x_twitter_thread_dump._api.dependencies import CurrentBrowserCtxConfig, CurrentSharableBrowserCtx
-from x_twitter_thread_dump._api.router import render_html
-from x_twitter_thread_dump._api.schemas import Base64ImageSchema, ImagesSchema, TikTokCommentSchema
-from x_twitter_thread_dump._base import BaseXTwitterThreadDumpClient
+from x_twitter_thread_dump._api._jobs import submit_render_job
+from x_twitter_thread_dump._api.dependencies import (
+    CurrentBrowserCtxConfig,
+    CurrentCPUExecutor,
+    CurrentHTTPCache,
+    CurrentImageEncoding,
+    CurrentRenderCache,
+    CurrentRenderJobs,
+    CurrentSharableBrowserCtx,
+)
+from x_twitter_thread_dump._api.executor import images_to_base64, result_to_bytes
+from x_twitter_thread_dump._api.http_cache import make_etag, raw_data_etag
+from x_twitter_thread_dump._api.render_cache import render_cache_key
+from x_twitter_thread_dump._api.router import render_html, render_images
+from x_twitter_thread_dump._api.schemas import (
+    Base64ImageSchema,
+    ImagesSchema,
+    RenderJobSchema,
+    StreamedTikTokCommentsSchema,
+    TikTokCommentSchema,
+    TikTokShareURL,
+)
+from x_twitter_thread_dump._api.settings import settings
+from x_twitter_thread_dump._api.streaming import NDJSON_MEDIA_TYPE, ndjson_response
 from x_twitter_thread_dump._tiktok.entities import TikTokComment
 from x_twitter_thread_dump._tiktok.render import render_comments_html
-from x_twitter_thread_dump.images import image_to_base64str, image_to_bytes
+from x_twitter_thread_dump.browser import media_routes
 
 from .dependencies import CurrentComments, CurrentCommentsWithPreviews, CurrentTikTokClient
 
@@ -24,64 +49,175 @@ router = APIRouter(
 )
 async def get_tiktok_comments_json(
     comments: CurrentComments,
+    http_cache: CurrentHTTPCache,
 ) -> list[TikTokComment]:
+    http_cache.validate(raw_data_etag(comments), cache_control=settings.CACHE_CONTROL_JSON)
     return comments
 
 
+@router.get(
+    "/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {"schema": StreamedTikTokCommentsSchema.model_json_schema()}}}},
+)
+async def stream_tiktok_comments_json(
+    client: CurrentTikTokClient,
+    url: Annotated[list[TikTokShareURL], Query(min_length=1, max_length=20)],
+) -> StreamingResponse:
+    async def _items() -> AsyncIterator[StreamedTikTokCommentsSchema]:
+        # links of the same video are resolved by a single scan, chains are sent in the order they are found
+        pending = dict.fromkeys(url)
+
+        async with aclosing(client.resolve_comments(list(pending))) as chains:
+            async for shared_url, comments in chains:
+                pending.pop(shared_url, None)
+                yield StreamedTikTokCommentsSchema(
+                    url=shared_url,
+                    comments=[TikTokCommentSchema.model_validate(comment) for comment in comments],
+                )
+
+        for shared_url in pending:
+            yield StreamedTikTokCommentsSchema(url=shared_url, error="Comment not found")
+
+    return await ndjson_response(_items())
+
+
 @router.get("/html")
 async def get_tiktok_comments_html(
     client: CurrentTikTokClient,
     comments: CurrentComments,
+    executor: CurrentCPUExecutor,
     *,
+    http_cache: CurrentHTTPCache,
     download_previews: Annotated[bool, Query()] = True,
 ) -> HTMLResponse:
     if download_previews:
         await client.download_previews(comments)
 
-    html = render_comments_html(comments)
+    html = await executor.run(render_comments_html, comments)
+    headers = http_cache.validate(make_etag(html), cache_control=settings.CACHE_CONTROL_HTML)
 
-    return HTMLResponse(content=html)
+    return HTMLResponse(content=html, headers=headers)
 
 
 @router.get("/imgs")
-async def get_tiktok_comments_imgs(
+async def get_tiktok_comments_imgs(  # noqa: PLR0913
     comments: CurrentCommentsWithPreviews,
     browser_ctx: CurrentSharableBrowserCtx,
     config: CurrentBrowserCtxConfig,
+    executor: CurrentCPUExecutor,
     *,
+    encoding: CurrentImageEncoding,
+    render_cache: CurrentRenderCache,
+    http_cache: CurrentHTTPCache,
     comments_per_image: Annotated[int | None, Query(ge=1, le=10)] = None,
     max_comment_height: Annotated[int | None, Query(ge=1, le=10_000)] = None,
 ) -> ImagesSchema:
-    html = render_comments_html(comments)
-    result = await render_html(browser_ctx, chunk=html, config=config)
+    html = await executor.run(render_comments_html, comments, inline_media=False)
 
-    imgs = BaseXTwitterThreadDumpClient.prepare_result_img(
-        result,
+    key = render_cache_key(
+        html,
+        config=config,
+        encoding=asdict(encoding),
         tweets_per_image=comments_per_image,
         max_tweet_height=max_comment_height,
     )
-
-    images = [Base64ImageSchema(content=image_to_base64str(img)) for img in imgs]
+    http_cache.validate(make_etag(key), cache_control=settings.CACHE_CONTROL_IMAGES, vary="Accept")
+
+    render = partial(
+        render_images,
+        browser_ctx,
+        executor,
+        html=html,
+        config=config,
+        media=media_routes(media for comment in comments for media in comment.all_preview_media()),
+        encoding=encoding,
+        tweets_per_image=comments_per_image,
+        max_tweet_height=max_comment_height,
+    )
+    rendered = await render_cache.fetch(key, render, tags=[comment.id for comment in comments])
+    images = await executor.run(images_to_base64, rendered)
 
     return ImagesSchema(
-        images=images,
+        images=[Base64ImageSchema(content=content, media_type=encoding.codec.media_type) for content in images],
+    )
+
+
+@router.post("/jobs/imgs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_tiktok_comments_imgs_job(  # noqa: PLR0913
+    comments: CurrentCommentsWithPreviews,
+    browser_ctx: CurrentSharableBrowserCtx,
+    config: CurrentBrowserCtxConfig,
+    executor: CurrentCPUExecutor,
+    *,
+    encoding: CurrentImageEncoding,
+    render_cache: CurrentRenderCache,
+    jobs: CurrentRenderJobs,
+    comments_per_image: Annotated[int | None, Query(ge=1, le=10)] = None,
+    max_comment_height: Annotated[int | None, Query(ge=1, le=10_000)] = None,
+) -> RenderJobSchema:
+    html = await executor.run(render_comments_html, comments, inline_media=False)
+
+    key = render_cache_key(
+        html,
+        config=config,
+        encoding=asdict(encoding),
+        tweets_per_image=comments_per_image,
+        max_tweet_height=max_comment_height,
+    )
+    render = partial(
+        render_images,
+        browser_ctx,
+        executor,
+        html=html,
+        config=config,
+        media=media_routes(media for comment in comments for media in comment.all_preview_media()),
+        encoding=encoding,
+        tweets_per_image=comments_per_image,
+        max_tweet_height=max_comment_height,
+    )
+
+    return submit_render_job(
+        jobs,
+        partial(render_cache.fetch, key, render, tags=[comment.id for comment in comments]),
+        media_type=encoding.codec.media_type,
     )
 
 
 @router.get("/raw-img")
-async def get_tiktok_comments_raw_img(
+async def get_tiktok_comments_raw_img(  # noqa: PLR0913
     comments: CurrentCommentsWithPreviews,
     browser_ctx: CurrentSharableBrowserCtx,
     config: CurrentBrowserCtxConfig,
+    executor: CurrentCPUExecutor,
+    *,
+    encoding: CurrentImageEncoding,
+    render_cache: CurrentRenderCache,
+    http_cache: CurrentHTTPCache,
 ) -> Response:
-    html = render_comments_html(comments)
-    result = await render_html(browser_ctx, chunk=html, config=config)
+    html = await executor.run(render_comments_html, comments, inline_media=False)
+
+    async def _render() -> list[bytes]:
+        result = await render_html(
+            browser_ctx,
+            chunk=html,
+            config=config,
+            media=media_routes(media for comment in comments for media in comment.all_preview_media()),
+        )
+
+        return [await executor.run(result_to_bytes, result, encoding)]
+
+    key = render_cache_key(html, config=config, encoding=asdict(encoding))
+    headers = http_cache.validate(make_etag(key), cache_control=settings.CACHE_CONTROL_IMAGES, vary="Accept")
+
+    (content,) = await render_cache.fetch(key, _render, tags=[comment.id for comment in comments])
 
     return Response(
-        content=image_to_bytes(result.img),
-        media_type="image/png",
+        content=content,
+        media_type=encoding.codec.media_type,
         headers={
-            "Content-Disposition": "inline; filename=tiktok_comment.png",
+            **headers,
+            "Content-Disposition": f"inline; filename=tiktok_comment.{encoding.codec.extension}",
         },
     )
 
@@ -1,17 +1,44 @@
 import logging
+import math
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
+from datetime import timedelta
 from typing import Any
 
 import logfire
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 
+from x_twitter_thread_dump import MediaCache, TweetStore, XBootstrapCache
+from x_twitter_thread_dump._tiktok import ShareLinkCache, TikTokCommentIndex
+from x_twitter_thread_dump.timing import add_stage_observer
+
+from ._jobs import router as jobs_router
 from ._threads import router as threads_router
 from ._tiktok import router as tiktok_router
-from .router import router
+from ._tiktok.dependencies import tikwm_rate_limiter
+from .dependencies import use_render_context
+from .disconnect import CancelOnDisconnectMiddleware
+from .executor import CPUExecutor
+from .http_clients import http_clients
+from .jobs import RenderJobQueue
+from .memory import MemoryWatchdog
+from .metrics import (
+    observe_media_cache,
+    observe_memory_watchdog,
+    observe_render_cache,
+    observe_render_scheduler,
+    observe_tiktok_link_cache,
+    observe_tikwm_rate_limiter,
+    record_stage_duration,
+)
+from .render_cache import RenderCache
+from .router import render_scheduler, router
+from .scheduler import RenderRejectedError
+from .server_timing import ServerTimingMiddleware
 from .settings import settings
 from .sharable_brower_ctx import SharableBrowserCtx
 
@@ -25,21 +52,124 @@ parent_package, _ = __name__.rsplit(".", 1)
 logger = logging.getLogger(parent_package)
 logger.setLevel(logging.INFO)
 
+add_stage_observer(record_stage_duration)
+
+
+@asynccontextmanager
+async def tweet_store() -> AsyncIterator[TweetStore | None]:
+    if settings.TWEET_STORE_PATH is None:
+        yield None
+        return
+
+    with TweetStore(
+        path=settings.TWEET_STORE_PATH,
+        content_ttl=timedelta(seconds=settings.TWEET_STORE_CONTENT_TTL),
+        counters_ttl=timedelta(seconds=settings.TWEET_STORE_COUNTERS_TTL),
+    ) as store:
+        yield store
+
+
+@asynccontextmanager
+async def tiktok_comment_index() -> AsyncIterator[TikTokCommentIndex]:
+    with TikTokCommentIndex(
+        path=settings.TIKTOK_COMMENT_INDEX_PATH or ":memory:",
+        ttl=timedelta(seconds=settings.TIKTOK_COMMENT_INDEX_TTL),
+        max_videos=settings.TIKTOK_COMMENT_INDEX_MAX_VIDEOS,
+        max_comments=settings.TIKTOK_COMMENT_INDEX_MAX_COMMENTS,
+    ) as index:
+        yield index
+
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncIterator[Any]:
-    async with SharableBrowserCtx() as browser_ctx:
-        yield {"browser_ctx": browser_ctx}
+    media_cache = MediaCache(
+        max_bytes=settings.MEDIA_CACHE_MAX_BYTES,
+        path=settings.MEDIA_CACHE_PATH,
+        max_disk_bytes=settings.MEDIA_CACHE_MAX_DISK_BYTES,
+    )
+    observe_media_cache(media_cache)
+
+    render_cache = RenderCache(
+        max_bytes=settings.RENDER_CACHE_MAX_BYTES,
+        path=settings.RENDER_CACHE_PATH,
+        max_disk_bytes=settings.RENDER_CACHE_MAX_DISK_BYTES,
+    )
+    observe_render_cache(render_cache)
+    observe_render_scheduler(render_scheduler)
+
+    tiktok_link_cache = ShareLinkCache(
+        max_size=settings.TIKTOK_LINK_CACHE_SIZE,
+        ttl=timedelta(seconds=settings.TIKTOK_LINK_CACHE_TTL),
+        path=settings.TIKTOK_LINK_CACHE_PATH,
+    )
+    observe_tiktok_link_cache(tiktok_link_cache)
+    observe_tikwm_rate_limiter(tikwm_rate_limiter)
+
+    async with (
+        SharableBrowserCtx(
+            size=settings.BROWSER_POOL_SIZE or settings.IMAGE_RENDERING_CONCURRENCY,
+            pages_per_browser=settings.BROWSER_PAGE_CACHE_SIZE,
+            lifetime=timedelta(seconds=settings.BROWSER_MAX_AGE),
+            max_renders=settings.BROWSER_MAX_RENDERS,
+            probe_interval=timedelta(seconds=settings.BROWSER_PROBE_INTERVAL),
+            probe_timeout=settings.BROWSER_PROBE_TIMEOUT,
+        ) as browser_ctx,
+        XBootstrapCache(
+            ttl=timedelta(seconds=settings.X_BOOTSTRAP_TTL),
+            refresh_before=timedelta(seconds=settings.X_BOOTSTRAP_REFRESH_BEFORE),
+            path=settings.X_BOOTSTRAP_CACHE_PATH,
+        ) as x_bootstrap,
+        http_clients() as clients,
+        tweet_store() as store,
+        tiktok_comment_index() as comment_index,
+        CPUExecutor(
+            kind=settings.CPU_EXECUTOR,
+            max_workers=settings.CPU_EXECUTOR_WORKERS,
+            max_concurrency=settings.CPU_EXECUTOR_CONCURRENCY,
+        ) as cpu_executor,
+        RenderJobQueue(
+            max_size=settings.RENDER_JOB_QUEUE_SIZE,
+            workers=settings.RENDER_JOB_WORKERS,
+            ttl=timedelta(seconds=settings.RENDER_JOB_RESULT_TTL),
+            max_bytes=settings.RENDER_JOB_MAX_BYTES,
+        ) as render_jobs,
+        MemoryWatchdog(
+            browser_ctx=browser_ctx,
+            scheduler=render_scheduler,
+            soft_limit=settings.MEMORY_SOFT_LIMIT,
+            hard_limit=settings.MEMORY_HARD_LIMIT,
+            interval=timedelta(seconds=settings.MEMORY_CHECK_INTERVAL),
+            soft_concurrency=settings.MEMORY_SOFT_RENDER_CONCURRENCY,
+            soft_device_scale_factor=settings.MEMORY_SOFT_DEVICE_SCALE_FACTOR,
+        ) as memory_watchdog,
+    ):
+        observe_memory_watchdog(memory_watchdog)
+
+        yield {
+            "browser_ctx": browser_ctx,
+            "x_bootstrap": x_bootstrap,
+            "http_clients": clients,
+            "tweet_store": store,
+            "tiktok_comment_index": comment_index,
+            "tiktok_link_cache": tiktok_link_cache,
+            "media_cache": media_cache,
+            "render_cache": render_cache,
+            "cpu_executor": cpu_executor,
+            "render_jobs": render_jobs,
+            "memory_watchdog": memory_watchdog,
+        }
 
 
 app = FastAPI(
     title="X Twitter Thread Dump Debugger",
     description="A simple API to for x-twitter-thread-dump library",
     lifespan=lifespan,
+    dependencies=[Depends(use_render_context)],
     version="0.1.0",
     redoc_url=None,
     docs_url=None,
     middleware=[
+        Middleware(ServerTimingMiddleware),
         Middleware(GZipMiddleware),
         Middleware(
             CORSMiddleware,
@@ -48,11 +178,24 @@ app = FastAPI(
             allow_methods=["*"],
             allow_headers=["*"],
         ),
+        Middleware(CancelOnDisconnectMiddleware),
     ],
 )
+
+
+@app.exception_handler(RenderRejectedError)
+async def render_rejected_handler(_: Request, exc: RenderRejectedError) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
 app.include_router(router)
 app.include_router(threads_router)
 app.include_router(tiktok_router)
+app.include_router(jobs_router)
 
 if settings.LOGFIRE_TOKEN:
     logfire.instrument_fastapi(app)
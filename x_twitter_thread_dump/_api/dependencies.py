@@ -1,18 +1,32 @@
 from collections.abc import AsyncIterator
 from typing import Annotated, Literal, TypeAlias, cast
 
-from fastapi import Depends, Query, Request
+from fastapi import Depends, Header, HTTPException, Query, Request, Response, status
 
 from x_twitter_thread_dump import (
+    MediaCache,
     Thread,
+    TweetStore,
+    XBootstrapCache,
     XTwitterThreadDumpAsyncClient,
     x_twitter_thread_dump_async_client,
 )
+from x_twitter_thread_dump._tiktok import ShareLinkCache, TikTokCommentIndex
 from x_twitter_thread_dump.browser import get_browser_ctx_config
-from x_twitter_thread_dump.types import BrowserCtxConfig
+from x_twitter_thread_dump.images import ImageEncoding, get_image_codec, negotiate_image_format
+from x_twitter_thread_dump.types import BrowserCtxConfig, ImageFormat
 
+from .executor import CPUExecutor
+from .http_cache import HTTPCache
+from .http_clients import HTTPClients
+from .jobs import RenderJobQueue
+from .memory import MemoryWatchdog
+from .render_cache import RenderCache
+from .scheduler import RenderPriority, classify_user_agent, render_context
 from .schemas import TweetID
+from .settings import settings
 from .sharable_brower_ctx import SharableBrowserCtx
+from .utils import single_flight
 
 
 async def get_current_browser_ctx(
@@ -27,8 +41,151 @@ CurrentSharableBrowserCtx: TypeAlias = Annotated[
 ]
 
 
-async def get_x_twitter_thread_dump_async_client() -> AsyncIterator[XTwitterThreadDumpAsyncClient]:
-    async with x_twitter_thread_dump_async_client() as client:
+async def get_current_cpu_executor(
+    request: Request,
+) -> CPUExecutor:
+    return cast(CPUExecutor, request.state.cpu_executor)
+
+
+CurrentCPUExecutor: TypeAlias = Annotated[
+    CPUExecutor,
+    Depends(get_current_cpu_executor),
+]
+
+
+async def get_current_http_clients(
+    request: Request,
+) -> HTTPClients:
+    return cast(HTTPClients, request.state.http_clients)
+
+
+CurrentHTTPClients: TypeAlias = Annotated[
+    HTTPClients,
+    Depends(get_current_http_clients),
+]
+
+
+async def get_current_http_cache(
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> HTTPCache:
+    return HTTPCache(if_none_match=if_none_match, response=response)
+
+
+CurrentHTTPCache: TypeAlias = Annotated[
+    HTTPCache,
+    Depends(get_current_http_cache),
+]
+
+
+async def get_current_render_jobs(
+    request: Request,
+) -> RenderJobQueue:
+    return cast(RenderJobQueue, request.state.render_jobs)
+
+
+CurrentRenderJobs: TypeAlias = Annotated[
+    RenderJobQueue,
+    Depends(get_current_render_jobs),
+]
+
+
+async def get_current_memory_watchdog(
+    request: Request,
+) -> MemoryWatchdog:
+    return cast(MemoryWatchdog, request.state.memory_watchdog)
+
+
+CurrentMemoryWatchdog: TypeAlias = Annotated[
+    MemoryWatchdog,
+    Depends(get_current_memory_watchdog),
+]
+
+
+async def get_current_media_cache(
+    request: Request,
+) -> MediaCache:
+    return cast(MediaCache, request.state.media_cache)
+
+
+CurrentMediaCache: TypeAlias = Annotated[
+    MediaCache,
+    Depends(get_current_media_cache),
+]
+
+
+async def get_current_render_cache(
+    request: Request,
+) -> RenderCache:
+    return cast(RenderCache, request.state.render_cache)
+
+
+CurrentRenderCache: TypeAlias = Annotated[
+    RenderCache,
+    Depends(get_current_render_cache),
+]
+
+
+async def get_current_x_bootstrap(
+    request: Request,
+) -> XBootstrapCache:
+    return cast(XBootstrapCache, request.state.x_bootstrap)
+
+
+CurrentXBootstrap: TypeAlias = Annotated[
+    XBootstrapCache,
+    Depends(get_current_x_bootstrap),
+]
+
+
+async def get_current_tweet_store(
+    request: Request,
+) -> TweetStore | None:
+    return cast(TweetStore | None, request.state.tweet_store)
+
+
+CurrentTweetStore: TypeAlias = Annotated[
+    TweetStore | None,
+    Depends(get_current_tweet_store),
+]
+
+
+async def get_current_tiktok_comment_index(
+    request: Request,
+) -> TikTokCommentIndex:
+    return cast(TikTokCommentIndex, request.state.tiktok_comment_index)
+
+
+CurrentTikTokCommentIndex: TypeAlias = Annotated[
+    TikTokCommentIndex,
+    Depends(get_current_tiktok_comment_index),
+]
+
+
+async def get_current_tiktok_link_cache(
+    request: Request,
+) -> ShareLinkCache:
+    return cast(ShareLinkCache, request.state.tiktok_link_cache)
+
+
+CurrentTikTokLinkCache: TypeAlias = Annotated[
+    ShareLinkCache,
+    Depends(get_current_tiktok_link_cache),
+]
+
+
+async def get_x_twitter_thread_dump_async_client(
+    http_clients: CurrentHTTPClients,
+    x_bootstrap: CurrentXBootstrap,
+    store: CurrentTweetStore,
+    media_cache: CurrentMediaCache,
+) -> AsyncIterator[XTwitterThreadDumpAsyncClient]:
+    async with x_twitter_thread_dump_async_client(
+        client=http_clients.x,
+        bootstrap=x_bootstrap,
+        store=store,
+        media_cache=media_cache,
+    ) as client:
         yield client
 
 
@@ -38,6 +195,7 @@ CurrentThreadClient: TypeAlias = Annotated[
 ]
 
 
+@single_flight(key=lambda args: ("x", args["tweet_id"], args["limit"]))
 async def current_thread(
     client: CurrentThreadClient,
     tweet_id: TweetID,
@@ -53,6 +211,7 @@ CurrentThread: TypeAlias = Annotated[
 ]
 
 
+@single_flight(key=lambda args: ("x", id(args["thread"])))
 async def current_thread_with_previews(
     client: CurrentThreadClient,
     thread: CurrentThread,
@@ -68,6 +227,7 @@ CurrentThreadWithPreviews: TypeAlias = Annotated[
 
 
 async def get_current_browser_ctx_config(  # noqa: PLR0913
+    memory_watchdog: CurrentMemoryWatchdog,
     is_mobile: Annotated[bool | None, Query()] = None,
     viewport_height: Annotated[int | None, Query(ge=1, le=2_000)] = None,
     viewport_width: Annotated[int | None, Query(ge=1, le=2_000)] = None,
@@ -80,7 +240,7 @@ async def get_current_browser_ctx_config(  # noqa: PLR0913
     locale: Annotated[str | None, Query()] = None,
     timezone_id: Annotated[str | None, Query()] = None,
 ) -> BrowserCtxConfig:
-    return get_browser_ctx_config(
+    config = get_browser_ctx_config(
         is_mobile=is_mobile,
         viewport_height=viewport_height,
         viewport_width=viewport_width,
@@ -94,16 +254,74 @@ async def get_current_browser_ctx_config(  # noqa: PLR0913
         timezone_id=timezone_id,
     )
 
+    # downscaled under memory pressure, the config is a part of render cache keys so outputs do not mix
+    return memory_watchdog.apply(config)
+
 
 CurrentBrowserCtxConfig: TypeAlias = Annotated[
     BrowserCtxConfig,
     Depends(get_current_browser_ctx_config),
 ]
 
+
+async def get_current_image_encoding(
+    image_format: Annotated[ImageFormat | None, Query(alias="format")] = None,
+    quality: Annotated[int | None, Query(ge=1, le=100)] = None,
+    effort: Annotated[int | None, Query(ge=0, le=10)] = None,
+    accept: Annotated[str | None, Header()] = None,
+) -> ImageEncoding:
+    encoding = ImageEncoding(
+        format=image_format or negotiate_image_format(accept),
+        quality=quality,
+        effort=effort,
+    )
+
+    try:
+        get_image_codec(encoding.format)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from None
+
+    return encoding
+
+
+CurrentImageEncoding: TypeAlias = Annotated[
+    ImageEncoding,
+    Depends(get_current_image_encoding),
+]
+
+_RENDER_DEADLINES: dict[RenderPriority, float | None] = {
+    "interactive": settings.RENDER_DEADLINE_INTERACTIVE,
+    "crawler": settings.RENDER_DEADLINE_CRAWLER,
+    "batch": settings.RENDER_DEADLINE_BATCH,
+}
+
+
+async def use_render_context(
+    user_agent: Annotated[str | None, Header()] = None,
+) -> AsyncIterator[None]:
+    priority = classify_user_agent(user_agent)
+
+    with render_context(priority=priority, deadline=_RENDER_DEADLINES[priority]):
+        yield
+
+
 __all__ = [
     "CurrentBrowserCtxConfig",
+    "CurrentCPUExecutor",
+    "CurrentHTTPCache",
+    "CurrentHTTPClients",
+    "CurrentImageEncoding",
+    "CurrentMediaCache",
+    "CurrentMemoryWatchdog",
+    "CurrentRenderCache",
+    "CurrentRenderJobs",
     "CurrentSharableBrowserCtx",
     "CurrentThread",
     "CurrentThreadClient",
     "CurrentThreadWithPreviews",
+    "CurrentTikTokCommentIndex",
+    "CurrentTikTokLinkCache",
+    "CurrentTweetStore",
+    "CurrentXBootstrap",
+    "use_render_context",
 ]
@@ -0,0 +1,59 @@
+import asyncio
+from contextlib import suppress
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class CancelOnDisconnectMiddleware:
+    """Cancels request handling once the client disconnects, so queued renders nobody waits for are dropped.
+
+    Work shared with other requests (coalesced calls, cached renders) keeps running while someone still waits.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        messages: asyncio.Queue[Message] = asyncio.Queue()
+        response_started = False
+
+        async def _send(message: Message) -> None:
+            nonlocal response_started
+            response_started = True
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, messages.get, _send))
+
+        async def _listen() -> None:
+            while True:
+                message = await receive()
+                await messages.put(message)
+
+                if message["type"] == "http.disconnect":
+                    # a started response (streaming, background tasks) handles the disconnect itself
+                    if not response_started:
+                        handler.cancel()
+
+                    return
+
+        listener = asyncio.ensure_future(_listen())
+
+        try:
+            await handler
+        except asyncio.CancelledError:
+            # the client is gone, there is nobody to send a response to
+            if not listener.done():
+                raise
+        finally:
+            listener.cancel()
+            with suppress(asyncio.CancelledError):
+                await listener
+
+
+__all__ = [
+    "CancelOnDisconnectMiddleware",
+]
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import contextvars
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Literal, Self
+
+from x_twitter_thread_dump.browser import HTMLToImageResult
+from x_twitter_thread_dump.images import ImageEncoding, encode_screenshot, image_to_bytes
+
+from .metrics import cpu_executor_queue_depth, cpu_executor_run_duration, cpu_executor_wait_duration
+
+type CPUExecutorKind = Literal["thread", "process"]
+
+
+@dataclass(kw_only=True)
+class CPUExecutor:
+    """Runs CPU-bound work (templating, image encoding) away from the event loop.
+
+    Pillow releases the GIL while encoding, so threads are enough when image work dominates.
+    Jinja rendering is pure Python and holds the GIL, so threads only keep it off the loop;
+    when templating dominates use ``kind="process"`` (``CPU_EXECUTOR=process``) to run it in
+    parallel. With ``kind="process"`` functions and arguments must be picklable.
+    """
+
+    kind: CPUExecutorKind = "thread"
+    max_workers: int = 2
+    max_concurrency: int | None = None  # defaults to max_workers
+
+    _executor: Executor | None = field(init=False, default=None)
+    _semaphore: asyncio.Semaphore = field(init=False)
+
+    def __post_init__(self) -> None:
+        self._semaphore = asyncio.Semaphore(self.max_concurrency or self.max_workers)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            match self.kind:
+                case "thread":
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="cpu-executor")
+                case "process":
+                    self._executor = ProcessPoolExecutor(self.max_workers)
+
+        return self._executor
+
+    async def run[**P, R](self, func: Callable[P, R], /, *args: P.args, **kwargs: P.kwargs) -> R:
+        attrs = {"func": getattr(func, "__name__", repr(func))}
+
+        queued_at = time.perf_counter()
+        cpu_executor_queue_depth.add(1, attrs)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            cpu_executor_queue_depth.add(-1, attrs)
+
+        started_at = time.perf_counter()
+        cpu_executor_wait_duration.record((started_at - queued_at) * 1_000, attrs)
+
+        call = partial(func, *args, **kwargs)
+        if self.kind == "thread":
+            # so stages measured in the worker thread are reported to the current request
+            call = partial(contextvars.copy_context().run, call)
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), call)
+        finally:
+            self._semaphore.release()
+            cpu_executor_run_duration.record((time.perf_counter() - started_at) * 1_000, attrs)
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+
+def encode_screenshots(screenshots: list[bytes], /, encoding: ImageEncoding | None = None) -> list[bytes]:
+    return [encode_screenshot(screenshot, encoding) for screenshot in screenshots]
+
+
+def images_to_base64(images: list[bytes], /) -> list[str]:
+    return [base64.b64encode(image).decode() for image in images]
+
+
+def result_to_bytes(result: HTMLToImageResult, /, encoding: ImageEncoding | None = None) -> bytes:
+    if result.screenshot is None:
+        return image_to_bytes(result.img, encoding)
+
+    # png screenshots pass through untouched, same as the chunked renders of the /imgs routes
+    return encode_screenshot(result.screenshot, encoding)
+
+
+__all__ = [
+    "CPUExecutor",
+    "CPUExecutorKind",
+    "encode_screenshots",
+    "images_to_base64",
+    "result_to_bytes",
+]
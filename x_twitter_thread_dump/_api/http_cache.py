@@ -0,0 +1,63 @@
+import hashlib
+import json
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Response, status
+
+from x_twitter_thread_dump.types import AnyDict
+
+
+def make_etag(*parts: str | bytes) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode() if isinstance(part, str) else part)
+
+    return f'"{digest.hexdigest()}"'
+
+
+def raw_data_etag(items: Iterable[object], /, **params: object) -> str:
+    raw_data: list[AnyDict | None] = [getattr(item, "raw_data", None) for item in items]
+    return make_etag(json.dumps([raw_data, params], sort_keys=True, default=str))
+
+
+def etag_matches(if_none_match: str | None, etag: str, /) -> bool:
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    # If-None-Match uses weak comparison
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+@dataclass(kw_only=True)
+class HTTPCache:
+    if_none_match: str | None
+    response: Response
+
+    def validate(self, etag: str, *, cache_control: str, vary: str | None = None) -> dict[str, str]:
+        """Set validators of the response, raise 304 when the client already has this representation.
+
+        Returned headers have to be passed explicitly when the endpoint returns its own ``Response``.
+        """
+        headers = {"ETag": etag, "Cache-Control": cache_control}
+        if vary is not None:
+            headers["Vary"] = vary
+
+        self.response.headers.update(headers)
+
+        if etag_matches(self.if_none_match, etag):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return headers
+
+
+__all__ = [
+    "HTTPCache",
+    "etag_matches",
+    "make_etag",
+    "raw_data_etag",
+]
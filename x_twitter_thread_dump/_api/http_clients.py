@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import defaultdict
+from collections.abc import AsyncIterator, Callable
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+
+from httpx import AsyncBaseTransport, AsyncByteStream, AsyncClient, AsyncHTTPTransport, Limits, Request, Response
+
+from x_twitter_thread_dump import create_x_twitter_async_http_client
+from x_twitter_thread_dump._threads import create_threads_async_http_client
+from x_twitter_thread_dump._tiktok import create_tiktok_async_http_client
+from x_twitter_thread_dump.consts import DEFAULT_RETRIES
+from x_twitter_thread_dump.timing import record_stage
+
+from .settings import settings
+
+
+class _ReleasingStream(AsyncByteStream):
+    def __init__(self, stream: AsyncByteStream, release: Callable[[], None]) -> None:
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+@dataclass
+class HostLimitedTransport(AsyncBaseTransport):
+    transport: AsyncBaseTransport
+    max_connections_per_host: int
+
+    _semaphores: defaultdict[str, asyncio.Semaphore] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self._semaphores = defaultdict(lambda: asyncio.Semaphore(self.max_connections_per_host))
+
+    async def handle_async_request(self, request: Request) -> Response:
+        semaphore = self._semaphores[request.url.host]
+
+        await semaphore.acquire()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        # the connection stays busy until the body is consumed, so release the slot on close
+        return Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, semaphore.release),  # type: ignore[arg-type]
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+@dataclass
+class TimedTransport(AsyncBaseTransport):
+    transport: AsyncBaseTransport
+
+    async def handle_async_request(self, request: Request) -> Response:
+        # time to response headers, body streaming is not included
+        started_at = time.perf_counter()
+        try:
+            return await self.transport.handle_async_request(request)
+        finally:
+            record_stage("upstream", (time.perf_counter() - started_at) * 1_000)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def _create_transport() -> AsyncBaseTransport:
+    transport: AsyncBaseTransport = AsyncHTTPTransport(
+        retries=DEFAULT_RETRIES,
+        http2=settings.HTTP2,
+        limits=Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+    if settings.HTTP_MAX_CONNECTIONS_PER_HOST:
+        transport = HostLimitedTransport(
+            transport=transport,
+            max_connections_per_host=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+        )
+
+    return TimedTransport(transport=transport)
+
+
+@dataclass(kw_only=True)
+class HTTPClients:
+    x: AsyncClient
+    threads: AsyncClient
+    tiktok: AsyncClient
+
+
+@asynccontextmanager
+async def http_clients() -> AsyncIterator[HTTPClients]:
+    async with AsyncExitStack() as stack:
+        yield HTTPClients(
+            x=await stack.enter_async_context(
+                create_x_twitter_async_http_client(transport=_create_transport()),
+            ),
+            threads=await stack.enter_async_context(
+                create_threads_async_http_client(transport=_create_transport()),
+            ),
+            tiktok=await stack.enter_async_context(
+                create_tiktok_async_http_client(transport=_create_transport()),
+            ),
+        )
+
+
+__all__ = [
+    "HTTPClients",
+    "HostLimitedTransport",
+    "TimedTransport",
+    "http_clients",
+]
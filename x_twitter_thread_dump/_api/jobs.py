@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from operator import itemgetter
+from typing import Literal, Self
+from uuid import uuid4
+
+from .metrics import render_job_queue_depth, render_jobs
+from .scheduler import render_context
+
+logger = logging.getLogger(__name__)
+
+type RenderJobStatus = Literal["pending", "running", "done", "failed"]
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+@dataclass(kw_only=True)
+class RenderJob:
+    id: str = field(default_factory=lambda: uuid4().hex)
+    status: RenderJobStatus = "pending"
+    media_type: str
+
+    created_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    images: list[bytes] | None = field(default=None, repr=False)
+    error: str | None = None
+
+    # dropped once the job is finished, so the thread it renders can be garbage collected
+    render: Callable[[], Awaitable[list[bytes]]] | None = field(default=None, repr=False)
+
+
+@dataclass(kw_only=True)
+class RenderJobQueue:
+    """Bounded in-process queue of render jobs processed by a fixed number of worker tasks.
+
+    Finished jobs, including their images, are kept for ``ttl`` and then forgotten. Once images of
+    finished jobs take more than ``max_bytes``, the oldest finished jobs are forgotten earlier.
+    """
+
+    max_size: int = 100
+    workers: int = 2
+    ttl: timedelta = timedelta(minutes=10)
+    max_bytes: int = 64 * 1024 * 1024
+
+    _jobs: dict[str, RenderJob] = field(init=False, default_factory=dict)
+    _queue: asyncio.Queue[RenderJob] = field(init=False)
+    _tasks: list[asyncio.Task[None]] = field(init=False, default_factory=list)
+
+    def __post_init__(self) -> None:
+        self._queue = asyncio.Queue(self.max_size)
+
+    def _prune(self) -> None:
+        expired_before = datetime.now(UTC) - self.ttl
+        finished = sorted(
+            ((job.finished_at, job) for job in self._jobs.values() if job.finished_at is not None),
+            key=itemgetter(0),
+            reverse=True,
+        )
+
+        # newest first, jobs over the byte budget are dropped together with the expired ones
+        kept_bytes = 0
+        for finished_at, job in finished:
+            kept_bytes += sum(len(image) for image in job.images or [])
+
+            if finished_at < expired_before or kept_bytes > self.max_bytes:
+                del self._jobs[job.id]
+
+    def submit(self, render: Callable[[], Awaitable[list[bytes]]], /, *, media_type: str) -> RenderJob:
+        self._prune()
+
+        job = RenderJob(render=render, media_type=media_type)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFullError(f"Render job queue is full ({self.max_size} jobs)") from None
+
+        self._jobs[job.id] = job
+        render_job_queue_depth.add(1)
+
+        return job
+
+    def get(self, job_id: str, /) -> RenderJob | None:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: RenderJob, /) -> None:
+        render, job.render = job.render, None
+        if render is None:
+            return
+
+        job.status = "running"
+        job.started_at = datetime.now(UTC)
+
+        try:
+            with render_context(priority="batch"):
+                job.images = await render()
+        except Exception as e:
+            logger.exception("Render job %s failed", job.id)
+
+            job.status = "failed"
+            job.error = str(e) or type(e).__name__
+        else:
+            job.status = "done"
+        finally:
+            job.finished_at = datetime.now(UTC)
+            render_jobs.add(1, {"status": job.status})
+
+            self._prune()
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            render_job_queue_depth.add(-1)
+
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def __aenter__(self) -> Self:
+        self._tasks = [asyncio.create_task(self._worker(), name=f"render-job-worker-{i}") for i in range(self.workers)]
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+__all__ = [
+    "JobQueueFullError",
+    "RenderJob",
+    "RenderJobQueue",
+    "RenderJobStatus",
+]
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Literal, Self
+
+from x_twitter_thread_dump.browser import DEFAULT_CONFIG
+from x_twitter_thread_dump.types import BrowserCtxConfig
+
+from .scheduler import RenderScheduler
+from .sharable_brower_ctx import SharableBrowserCtx, process_tree_rss
+
+logger = logging.getLogger(__name__)
+
+type MemoryPressure = Literal["normal", "soft", "hard"]
+
+
+@dataclass(kw_only=True)
+class MemoryWatchdog:
+    """Samples RSS of this process and its children (playwright drivers, chromium) every ``interval``.
+
+    Above ``soft_limit`` the scheduler runs at most ``soft_concurrency`` renders and new renders use at most
+    ``soft_device_scale_factor``. Above ``hard_limit`` the pooled browser using the most memory is killed,
+    it is replaced on its next checkout.
+    """
+
+    browser_ctx: SharableBrowserCtx
+    scheduler: RenderScheduler
+    soft_limit: int | None = None
+    hard_limit: int | None = None
+    interval: timedelta = timedelta(seconds=2)
+    soft_concurrency: int = 1
+    soft_device_scale_factor: float = 1.0
+
+    rss: int = field(init=False, default=0)
+    pressure: MemoryPressure = field(init=False, default="normal")
+
+    _task: asyncio.Task[None] | None = field(init=False, default=None)
+
+    def _get_pressure(self, rss: int, /) -> MemoryPressure:
+        if self.hard_limit is not None and rss >= self.hard_limit:
+            return "hard"
+        if self.soft_limit is not None and rss >= self.soft_limit:
+            return "soft"
+
+        return "normal"
+
+    async def check(self) -> MemoryPressure:
+        self.rss = await asyncio.to_thread(process_tree_rss, os.getpid())
+        pressure = self._get_pressure(self.rss)
+
+        if pressure != self.pressure:
+            logger.warning("Memory pressure changed from %s to %s (rss=%s)", self.pressure, pressure, self.rss)
+
+            self.pressure = pressure
+            self.scheduler.set_limit(None if pressure == "normal" else self.soft_concurrency)
+
+        if pressure == "hard" and (browser_rss := self.browser_ctx.kill_largest()) is not None:
+            self.rss -= browser_rss
+
+        return pressure
+
+    def apply(self, config: BrowserCtxConfig, /) -> BrowserCtxConfig:
+        if self.pressure == "normal":
+            return config
+
+        scale = config.get("device_scale_factor", DEFAULT_CONFIG["device_scale_factor"])
+        return config | {"device_scale_factor": min(scale, self.soft_device_scale_factor)}
+
+    async def _watch(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("Memory check failed")
+
+            await asyncio.sleep(self.interval.total_seconds())
+
+    async def __aenter__(self) -> Self:
+        if self.soft_limit is not None or self.hard_limit is not None:
+            self._task = asyncio.create_task(self._watch(), name="memory-watchdog")
+
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+
+            with suppress(asyncio.CancelledError):
+                await task
+
+
+__all__ = [
+    "MemoryPressure",
+    "MemoryWatchdog",
+]
@@ -1,11 +1,21 @@
 import time
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator
 from contextlib import contextmanager
 from functools import partial
-from typing import Literal, assert_never
+from typing import TYPE_CHECKING, Literal, assert_never
 
 import logfire
-from opentelemetry.metrics import Histogram
+from opentelemetry.metrics import CallbackOptions, Histogram, Observation
+
+from x_twitter_thread_dump._tiktok import AdaptiveRateLimiter, ShareLinkCache
+from x_twitter_thread_dump.cache import MediaCache
+
+from .render_cache import RenderCache
+from .scheduler import RENDER_PRIORITIES, RenderScheduler
+
+if TYPE_CHECKING:
+    # memory watchdog depends on the browser pool, which records metrics defined here
+    from .memory import MemoryWatchdog
 
 html_render_duration = logfire.metric_histogram(
     "html_render_duration",
@@ -19,6 +29,191 @@ shared_browser_age = logfire.metric_histogram(
     unit="s",
 )
 
+shared_browser_recycles = logfire.metric_counter(
+    "shared_browser_recycles",
+    description="Number of pooled browsers recycled, by reason",
+)
+
+coalesced_requests = logfire.metric_counter(
+    "coalesced_requests",
+    description="Number of calls that joined an identical in-flight call instead of running their own",
+)
+
+cpu_executor_queue_depth = logfire.metric_up_down_counter(
+    "cpu_executor_queue_depth",
+    description="Number of CPU-bound calls waiting for a free executor slot",
+)
+
+cpu_executor_wait_duration = logfire.metric_histogram(
+    "cpu_executor_wait_duration",
+    description="Time CPU-bound calls spent waiting for a free executor slot in milliseconds",
+    unit="ms",
+)
+
+cpu_executor_run_duration = logfire.metric_histogram(
+    "cpu_executor_run_duration",
+    description="Duration of CPU-bound calls in the executor in milliseconds",
+    unit="ms",
+)
+
+render_job_queue_depth = logfire.metric_up_down_counter(
+    "render_job_queue_depth",
+    description="Number of submitted render jobs waiting for a worker",
+)
+
+render_jobs = logfire.metric_counter(
+    "render_jobs",
+    description="Number of finished render jobs, by status",
+)
+
+stage_duration = logfire.metric_histogram(
+    "stage_duration",
+    description="Duration of a request processing stage (fetch, template, screenshot, ...) in milliseconds",
+    unit="ms",
+)
+
+
+def record_stage_duration(stage: str, duration: float, /) -> None:
+    stage_duration.record(duration, {"stage": stage})
+
+
+def observe_media_cache(cache: MediaCache, /) -> None:
+    def _requests(_: CallbackOptions) -> Iterable[Observation]:
+        yield Observation(cache.stats.hits, {"result": "hit"})
+        yield Observation(cache.stats.disk_hits, {"result": "disk_hit"})
+        yield Observation(cache.stats.misses, {"result": "miss"})
+
+    def _evictions(_: CallbackOptions) -> Iterable[Observation]:
+        yield Observation(cache.stats.evictions)
+
+    def _size(_: CallbackOptions) -> Iterable[Observation]:
+        yield Observation(cache.size)
+
+    logfire.metric_counter_callback(
+        "media_cache_requests",
+        callbacks=[_requests],
+        description="Number of preview media lookups in the shared media cache, by result",
+    )
+    logfire.metric_counter_callback(
+        "media_cache_evictions",
+        callbacks=[_evictions],
+        description="Number of media evicted from memory of the shared media cache",
+    )
+    logfire.metric_gauge_callback(
+        "media_cache_size",
+        callbacks=[_size],
+        unit="By",
+        description="Size of media kept in memory of the shared media cache",
+    )
+
+
+def observe_render_cache(cache: RenderCache, /) -> None:
+    def _requests(_: CallbackOptions) -> Iterable[Observation]:
+        yield Observation(cache.stats.hits, {"result": "hit"})
+        yield Observation(cache.stats.disk_hits, {"result": "disk_hit"})
+        yield Observation(cache.stats.misses, {"result": "miss"})
+
+    def _evictions(_: CallbackOptions) -> Iterable[Observation]:
+        yield Observation(cache.stats.evictions)
+
+    def _size(_: CallbackOptions) -> Iterable[Observation]:
+        yield Observation(cache.size)
+
+    logfire.metric_counter_callback(
+        "render_cache_requests",
+        callbacks=[_requests],
+        description="Number of rendered image lookups in the render cache, by result",
+    )
+    logfire.metric_counter_callback(
+        "render_cache_evictions",
+        callbacks=[_evictions],
+        description="Number of rendered images evicted from memory of the render cache",
+    )
+    logfire.metric_gauge_callback(
+        "render_cache_size",
+        callbacks=[_size],
+        unit="By",
+        description="Size of rendered images kept in memory of the render cache",
+    )
+
+
+def observe_memory_watchdog(watchdog: "MemoryWatchdog", /) -> None:
+    def _rss(_: CallbackOptions) -> Iterable[Observation]:
+        yield Observation(watchdog.rss)
+
+    def _pressure(_: CallbackOptions) -> Iterable[Observation]:
+        for pressure in ("normal", "soft", "hard"):
+            yield Observation(int(watchdog.pressure == pressure), {"pressure": pressure})
+
+    logfire.metric_gauge_callback(
+        "process_tree_rss",
+        callbacks=[_rss],
+        unit="By",
+        description="Resident memory of the api process and its children (browsers) at the last watchdog check",
+    )
+    logfire.metric_gauge_callback(
+        "memory_pressure",
+        callbacks=[_pressure],
+        description="Current memory pressure level, 1 for the active level",
+    )
+
+
+def observe_render_scheduler(scheduler: RenderScheduler, /) -> None:
+    def _queue_depth(_: CallbackOptions) -> Iterable[Observation]:
+        for priority in RENDER_PRIORITIES:
+            yield Observation(scheduler.queue_depth(priority), {"priority": priority})
+
+    def _estimated_wait(_: CallbackOptions) -> Iterable[Observation]:
+        for priority in RENDER_PRIORITIES:
+            yield Observation(scheduler.estimated_wait(priority), {"priority": priority})
+
+    def _renders(_: CallbackOptions) -> Iterable[Observation]:
+        yield Observation(scheduler.stats.admitted, {"result": "admitted"})
+        yield Observation(scheduler.stats.rejected, {"result": "rejected"})
+        yield Observation(scheduler.stats.cancelled, {"result": "cancelled"})
+
+    logfire.metric_gauge_callback(
+        "render_queue_depth",
+        callbacks=[_queue_depth],
+        description="Number of renders waiting for a render slot, by priority",
+    )
+    logfire.metric_gauge_callback(
+        "render_queue_estimated_wait",
+        callbacks=[_estimated_wait],
+        unit="s",
+        description="Projected wait for a render slot of a new request, by priority",
+    )
+    logfire.metric_counter_callback(
+        "render_scheduler_requests",
+        callbacks=[_renders],
+        description="Number of render requests handled by the render scheduler, by result",
+    )
+
+
+def observe_tiktok_link_cache(cache: ShareLinkCache, /) -> None:
+    def _requests(_: CallbackOptions) -> Iterable[Observation]:
+        yield Observation(cache.stats.hits, {"result": "hit"})
+        yield Observation(cache.stats.disk_hits, {"result": "disk_hit"})
+        yield Observation(cache.stats.misses, {"result": "miss"})
+
+    logfire.metric_counter_callback(
+        "tiktok_link_cache_requests",
+        callbacks=[_requests],
+        description="Number of TikTok share link lookups in the shared link cache, by result",
+    )
+
+
+def observe_tikwm_rate_limiter(rate_limiter: AdaptiveRateLimiter, /) -> None:
+    def _rate(_: CallbackOptions) -> Iterable[Observation]:
+        yield Observation(rate_limiter.current_rate)
+
+    logfire.metric_gauge_callback(
+        "tikwm_request_rate",
+        callbacks=[_rate],
+        unit="1/s",
+        description="Current rate limit of tikwm requests, lowered while tikwm rejects requests",
+    )
+
 
 @contextmanager
 def measure_duration(
@@ -31,23 +226,35 @@ def measure_duration(
     try:
         yield
     finally:
-        end = time.perf_counter_ns()
-        duration_ns = end - start
+        duration = time.perf_counter() - start
 
         match unit:
             case "ms":
-                duration = duration_ns / 1_000_000
+                metric.record(duration * 1_000)
             case "s":
-                duration = duration_ns / 1_000_000_000
+                metric.record(duration)
             case _:
                 assert_never(unit)
 
-        metric.record(duration)
-
 
 measure_html_render_duration = partial(measure_duration, html_render_duration, unit="ms")
 
 __all__ = [
+    "coalesced_requests",
+    "cpu_executor_queue_depth",
+    "cpu_executor_run_duration",
+    "cpu_executor_wait_duration",
     "measure_html_render_duration",
+    "observe_media_cache",
+    "observe_memory_watchdog",
+    "observe_render_cache",
+    "observe_render_scheduler",
+    "observe_tiktok_link_cache",
+    "observe_tikwm_rate_limiter",
+    "record_stage_duration",
+    "render_job_queue_depth",
+    "render_jobs",
     "shared_browser_age",
+    "shared_browser_recycles",
+    "stage_duration",
 ]
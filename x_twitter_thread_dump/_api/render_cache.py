@@ -0,0 +1,147 @@
+import hashlib
+import json
+import struct
+import threading
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from x_twitter_thread_dump.cache import CacheStats, TieredCache
+
+_SIZE = struct.Struct(">Q")
+
+
+def render_cache_key(html: str, /, **params: object) -> str:
+    # html already contains tweets content and counters, so a changed thread gets a new key
+    digest = hashlib.sha256(html.encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+
+    return digest.hexdigest()
+
+
+def _pack(images: list[bytes], /) -> bytes:
+    return b"".join(_SIZE.pack(len(image)) + image for image in images)
+
+
+def _unpack(data: bytes, /) -> list[bytes]:
+    images, offset = [], 0
+    while offset < len(data):
+        if offset + _SIZE.size > len(data):
+            raise ValueError("Truncated render cache entry")
+
+        (size,) = _SIZE.unpack_from(data, offset)
+        offset += _SIZE.size
+
+        if offset + size > len(data):
+            raise ValueError("Truncated render cache entry")
+
+        images.append(data[offset : offset + size])
+        offset += size
+
+    return images
+
+
+@dataclass(kw_only=True)
+class RenderCache:
+    """Cache of encoded render outputs (one or more images per entry).
+
+    Keys are produced by :func:`render_cache_key` from the rendered html and every parameter that changes
+    the output. Memory is bounded by ``max_bytes``, with ``path`` set entries are also written to disk,
+    bounded by ``max_disk_bytes``.
+
+    Entries can be tagged (e.g. by tweet ids) to be dropped with :meth:`invalidate`. Tags are tracked only
+    for entries added by this process while they are cached, use :meth:`clear` to drop everything.
+    """
+
+    max_bytes: int = 32 * 1024 * 1024
+    path: Path | None = None
+    max_disk_bytes: int = 256 * 1024 * 1024
+
+    _entries: TieredCache[list[bytes]] = field(init=False, repr=False)
+    _tags: defaultdict[str, set[str]] = field(init=False, repr=False, default_factory=lambda: defaultdict(set))
+    _key_tags: dict[str, set[str]] = field(init=False, repr=False, default_factory=dict)
+    _lock: threading.Lock = field(init=False, repr=False, default_factory=threading.Lock)
+
+    def __post_init__(self) -> None:
+        self._entries = TieredCache(
+            max_size=self.max_bytes,
+            path=self.path,
+            max_disk_bytes=self.max_disk_bytes,
+            weigh=lambda images: sum(len(image) for image in images),
+            dump=_pack,
+            load=lambda _, data: _unpack(data),
+            on_drop=self._untag,
+        )
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._entries.stats
+
+    @property
+    def size(self) -> int:
+        return self._entries.size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _tag(self, key: str, tags: Iterable[str], /) -> None:
+        with self._lock:
+            for tag in tags:
+                self._tags[tag].add(key)
+                self._key_tags.setdefault(key, set()).add(tag)
+
+    def _untag(self, keys: Iterable[str], /) -> None:
+        with self._lock:
+            for key in keys:
+                for tag in self._key_tags.pop(key, ()):
+                    if (tagged := self._tags.get(tag)) is not None:
+                        tagged.discard(key)
+                        if not tagged:
+                            del self._tags[tag]
+
+    def get(self, key: str, /) -> list[bytes] | None:
+        return self._entries.get(key)
+
+    def put(self, key: str, images: list[bytes], /, *, tags: Iterable[str] = ()) -> None:
+        # tagged before it is stored, so an immediate eviction drops its tags too
+        self._tag(key, tags)
+        self._entries.put(key, images)
+
+    async def fetch(
+        self,
+        key: str,
+        render: Callable[[], Awaitable[list[bytes]]],
+        /,
+        *,
+        tags: Iterable[str] = (),
+    ) -> list[bytes]:
+        tags = [*tags]
+
+        async def _render() -> list[bytes]:
+            images = await render()
+            self._tag(key, tags)
+            return images
+
+        # concurrent requests for the same output share one render
+        return await self._entries.fetch(key, _render)
+
+    def invalidate(self, *tags: str) -> int:
+        with self._lock:
+            keys = {key for tag in tags for key in self._tags.get(tag, ())}
+
+        self._entries.discard(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+        with self._lock:
+            self._tags.clear()
+            self._key_tags.clear()
+
+
+__all__ = [
+    "RenderCache",
+    "render_cache_key",
+]
@@ -1,33 +1,63 @@
+import json
 from asyncio import timeout
+from collections.abc import Mapping
+from dataclasses import asdict
+from functools import partial
 from typing import Annotated, Any
 
 import logfire
-from fastapi import APIRouter, Query
-from fastapi.responses import HTMLResponse, Response
+from fastapi import APIRouter, Query, status
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from playwright._impl._errors import TargetClosedError
 
 from x_twitter_thread_dump import Tweet
-from x_twitter_thread_dump.browser import HTMLToImageResult, html_to_image_async
-from x_twitter_thread_dump.images import image_to_base64str, image_to_bytes
+from x_twitter_thread_dump.browser import HTMLToImageResult, html_to_image_async, html_to_images_async, media_routes
+from x_twitter_thread_dump.images import ImageEncoding
 from x_twitter_thread_dump.render import render_thread_html
 from x_twitter_thread_dump.types import BrowserCtxConfig
 
+from ._jobs import submit_render_job
 from .dependencies import (
     CurrentBrowserCtxConfig,
+    CurrentCPUExecutor,
+    CurrentHTTPCache,
+    CurrentImageEncoding,
+    CurrentRenderCache,
+    CurrentRenderJobs,
     CurrentSharableBrowserCtx,
     CurrentThread,
     CurrentThreadClient,
     CurrentThreadWithPreviews,
 )
+from .executor import CPUExecutor, encode_screenshots, images_to_base64, result_to_bytes
+from .http_cache import make_etag, raw_data_etag
 from .metrics import measure_html_render_duration
-from .schemas import Base64ImageSchema, ImagesSchema, MediaSchema, TweetID, TweetSchema
+from .render_cache import render_cache_key
+from .scheduler import RenderScheduler, scheduled
+from .schemas import (
+    Base64ImageSchema,
+    ImagesSchema,
+    MediaSchema,
+    RenderJobSchema,
+    StreamedTweetSchema,
+    TweetID,
+    TweetSchema,
+)
 from .settings import settings
-from .utils import limit_concurrency, retry, shielded
+from .sharable_brower_ctx import SharableBrowserCtx
+from .streaming import NDJSON_MEDIA_TYPE, ndjson_response
+from .utils import retry, single_flight
 
 router = APIRouter(
     prefix="/twitter",
 )
 
+# shared by every provider, renders of all routers compete for the same browsers
+render_scheduler = RenderScheduler(
+    concurrency=settings.IMAGE_RENDERING_CONCURRENCY,
+    initial_duration=settings.RENDER_DURATION_ESTIMATE,
+)
+
 
 @router.get("/")
 def main_route() -> dict[str, str]:
@@ -42,22 +72,47 @@ def main_route() -> dict[str, str]:
 )
 async def get_tweet_json(
     thread: CurrentThread,
+    http_cache: CurrentHTTPCache,
 ) -> list[Tweet]:
+    http_cache.validate(raw_data_etag(thread), cache_control=settings.CACHE_CONTROL_JSON)
     return thread
 
 
+@router.get(
+    "/stream/{tweet_id}",
+    response_class=StreamingResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {"schema": StreamedTweetSchema.model_json_schema()}}}},
+)
+async def stream_tweet_json(
+    client: CurrentThreadClient,
+    tweet_id: TweetID,
+    *,
+    limit: Annotated[int, Query(ge=1, le=40)] = 20,
+) -> StreamingResponse:
+    items = (
+        StreamedTweetSchema(position=position, tweet=TweetSchema.model_validate(tweet))
+        async for position, tweet in client.iter_thread(tweet_id, limit=limit)
+    )
+
+    return await ndjson_response(items)
+
+
 @router.get("/raw-json/{tweet_id}")
 async def get_tweet_raw_json(
     thread: CurrentThread,
+    http_cache: CurrentHTTPCache,
 ) -> list[dict[str, Any] | None]:
+    http_cache.validate(raw_data_etag(thread), cache_control=settings.CACHE_CONTROL_JSON)
     return [tweet.raw_data for tweet in thread]
 
 
 @router.get("/html/{tweet_id}")
-async def get_tweet_html(
+async def get_tweet_html(  # noqa: PLR0913
     client: CurrentThreadClient,
     thread: CurrentThread,
+    executor: CurrentCPUExecutor,
     *,
+    http_cache: CurrentHTTPCache,
     download_previews: Annotated[bool, Query()] = True,
     show_connector_on_last: Annotated[bool, Query()] = False,
     is_single_tweet: Annotated[bool, Query()] = False,
@@ -65,82 +120,224 @@ async def get_tweet_html(
     if download_previews:
         await client.download_previews(thread)
 
-    html = render_thread_html(
+    html = await executor.run(
+        render_thread_html,
         thread,
         show_connector_on_last=show_connector_on_last,
         is_single_tweet=is_single_tweet,
     )
 
-    return HTMLResponse(content=html)
+    # html has relative timestamps, so the validator is derived from the html itself
+    headers = http_cache.validate(make_etag(html), cache_control=settings.CACHE_CONTROL_HTML)
 
+    return HTMLResponse(content=html, headers=headers)
 
+
+@single_flight(key=lambda args: (args["chunk"], json.dumps(args["config"], sort_keys=True)))
 @retry(
     retries=settings.IMAGE_RENDERING_RETRIES,
     excs=(TargetClosedError,),
 )
-@limit_concurrency(settings.IMAGE_RENDERING_CONCURRENCY)
-@shielded
+@scheduled(render_scheduler)
 @logfire.instrument()
 async def render_html(
     browser_ctx: CurrentSharableBrowserCtx,
     chunk: str,
     config: BrowserCtxConfig | None = None,
+    media: Mapping[str, bytes] | None = None,
 ) -> HTMLToImageResult:
-    async with timeout(settings.IMAGE_RENDERING_TIMEOUT), browser_ctx.acquire() as browser:
+    async with timeout(settings.IMAGE_RENDERING_TIMEOUT), browser_ctx.acquire() as pages:
         with measure_html_render_duration():
             return await html_to_image_async(
                 chunk,
-                browser=browser,
+                pages=pages,
+                config=config,
+                media=media,
+            )
+
+
+@single_flight(
+    key=lambda args: (
+        args["chunk"],
+        json.dumps(args["config"], sort_keys=True),
+        args["tweets_per_image"],
+        args["max_tweet_height"],
+    ),
+)
+@retry(
+    retries=settings.IMAGE_RENDERING_RETRIES,
+    excs=(TargetClosedError,),
+)
+@scheduled(render_scheduler)
+@logfire.instrument()
+async def render_html_chunks(  # noqa: PLR0913
+    browser_ctx: CurrentSharableBrowserCtx,
+    chunk: str,
+    config: BrowserCtxConfig | None = None,
+    media: Mapping[str, bytes] | None = None,
+    *,
+    tweets_per_image: int | None = None,
+    max_tweet_height: int | None = None,
+) -> list[bytes]:
+    async with timeout(settings.IMAGE_RENDERING_TIMEOUT), browser_ctx.acquire() as pages:
+        with measure_html_render_duration():
+            return await html_to_images_async(
+                chunk,
+                pages=pages,
                 config=config,
+                media=media,
+                tweets_per_image=tweets_per_image,
+                max_tweet_height=max_tweet_height,
             )
 
 
+async def render_images(  # noqa: PLR0913
+    browser_ctx: SharableBrowserCtx,
+    executor: CPUExecutor,
+    *,
+    html: str,
+    config: BrowserCtxConfig | None,
+    media: Mapping[str, bytes] | None,
+    encoding: ImageEncoding,
+    tweets_per_image: int | None = None,
+    max_tweet_height: int | None = None,
+) -> list[bytes]:
+    screenshots = await render_html_chunks(
+        browser_ctx,
+        chunk=html,
+        config=config,
+        media=media,
+        tweets_per_image=tweets_per_image,
+        max_tweet_height=max_tweet_height,
+    )
+
+    return await executor.run(encode_screenshots, screenshots, encoding)
+
+
 @router.get("/imgs/{tweet_id}")
 async def get_tweet_imgs(  # noqa: PLR0913
     thread: CurrentThreadWithPreviews,
-    client: CurrentThreadClient,
     browser_ctx: CurrentSharableBrowserCtx,
     config: CurrentBrowserCtxConfig,
+    executor: CurrentCPUExecutor,
     *,
+    encoding: CurrentImageEncoding,
+    render_cache: CurrentRenderCache,
+    http_cache: CurrentHTTPCache,
     include_media: Annotated[bool, Query()] = False,
     tweets_per_image: Annotated[int | None, Query(ge=1, le=10)] = None,
     max_tweet_height: Annotated[int | None, Query(ge=1, le=10_000)] = None,
 ) -> ImagesSchema:
-    html = render_thread_html(thread)
-    result = await render_html(browser_ctx, chunk=html, config=config)
+    html = await executor.run(render_thread_html, thread, inline_media=False)
 
-    imgs = client.prepare_result_img(
-        result,
+    key = render_cache_key(
+        html,
+        config=config,
+        encoding=asdict(encoding),
+        tweets_per_image=tweets_per_image,
+        max_tweet_height=max_tweet_height,
+    )
+    http_cache.validate(make_etag(key, str(include_media)), cache_control=settings.CACHE_CONTROL_IMAGES, vary="Accept")
+
+    render = partial(
+        render_images,
+        browser_ctx,
+        executor,
+        html=html,
+        config=config,
+        media=media_routes(media for tweet in thread for media in tweet.all_preview_media()),
+        encoding=encoding,
         tweets_per_image=tweets_per_image,
         max_tweet_height=max_tweet_height,
     )
+    rendered = await render_cache.fetch(key, render, tags=[tweet.id for tweet in thread])
+    images = await executor.run(images_to_base64, rendered)
 
     media = None
     if include_media:
         media = [MediaSchema.model_validate(media) for tweet in thread for media in tweet.all_media()]
 
-    images = [Base64ImageSchema(content=image_to_base64str(img)) for img in imgs]
-
     return ImagesSchema(
-        images=images,
+        images=[Base64ImageSchema(content=content, media_type=encoding.codec.media_type) for content in images],
         media=media,
     )
 
 
+@router.post("/jobs/imgs/{tweet_id}", status_code=status.HTTP_202_ACCEPTED)
+async def submit_tweet_imgs_job(  # noqa: PLR0913
+    thread: CurrentThreadWithPreviews,
+    browser_ctx: CurrentSharableBrowserCtx,
+    config: CurrentBrowserCtxConfig,
+    executor: CurrentCPUExecutor,
+    *,
+    encoding: CurrentImageEncoding,
+    render_cache: CurrentRenderCache,
+    jobs: CurrentRenderJobs,
+    tweets_per_image: Annotated[int | None, Query(ge=1, le=10)] = None,
+    max_tweet_height: Annotated[int | None, Query(ge=1, le=10_000)] = None,
+) -> RenderJobSchema:
+    html = await executor.run(render_thread_html, thread, inline_media=False)
+
+    key = render_cache_key(
+        html,
+        config=config,
+        encoding=asdict(encoding),
+        tweets_per_image=tweets_per_image,
+        max_tweet_height=max_tweet_height,
+    )
+    render = partial(
+        render_images,
+        browser_ctx,
+        executor,
+        html=html,
+        config=config,
+        media=media_routes(media for tweet in thread for media in tweet.all_preview_media()),
+        encoding=encoding,
+        tweets_per_image=tweets_per_image,
+        max_tweet_height=max_tweet_height,
+    )
+
+    return submit_render_job(
+        jobs,
+        partial(render_cache.fetch, key, render, tags=[tweet.id for tweet in thread]),
+        media_type=encoding.codec.media_type,
+    )
+
+
 @router.get("/raw-img/{tweet_id}")
-async def get_tweet_raw_img(
+async def get_tweet_raw_img(  # noqa: PLR0913
     thread: CurrentThreadWithPreviews,
     browser_ctx: CurrentSharableBrowserCtx,
     config: CurrentBrowserCtxConfig,
+    executor: CurrentCPUExecutor,
+    *,
+    encoding: CurrentImageEncoding,
+    render_cache: CurrentRenderCache,
+    http_cache: CurrentHTTPCache,
 ) -> Response:
-    html = render_thread_html(thread)
-    result = await render_html(browser_ctx, chunk=html, config=config)
+    html = await executor.run(render_thread_html, thread, inline_media=False)
+
+    async def _render() -> list[bytes]:
+        result = await render_html(
+            browser_ctx,
+            chunk=html,
+            config=config,
+            media=media_routes(media for tweet in thread for media in tweet.all_preview_media()),
+        )
+
+        return [await executor.run(result_to_bytes, result, encoding)]
+
+    key = render_cache_key(html, config=config, encoding=asdict(encoding))
+    headers = http_cache.validate(make_etag(key), cache_control=settings.CACHE_CONTROL_IMAGES, vary="Accept")
+
+    (content,) = await render_cache.fetch(key, _render, tags=[tweet.id for tweet in thread])
 
     return Response(
-        content=image_to_bytes(result.img),
-        media_type="image/png",
+        content=content,
+        media_type=encoding.codec.media_type,
         headers={
-            "Content-Disposition": "inline; filename=thread.png",
+            **headers,
+            "Content-Disposition": f"inline; filename=thread.{encoding.codec.extension}",
         },
     )
 
@@ -206,5 +403,9 @@ async def get_preview(
 
 
 __all__ = [
+    "render_html",
+    "render_html_chunks",
+    "render_images",
+    "render_scheduler",
     "router",
 ]
@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import itertools
+import re
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import partial, wraps
+from typing import Literal
+
+from x_twitter_thread_dump.timing import record_stage
+
+type RenderPriority = Literal["interactive", "crawler", "batch"]
+
+RENDER_PRIORITIES: tuple[RenderPriority, ...] = ("interactive", "crawler", "batch")
+
+_CRAWLER_USER_AGENT_RE = re.compile(
+    r"bot|crawl|spider|slurp|facebookexternalhit|embedly|preview|whatsapp|telegram|skype",
+    re.IGNORECASE,
+)
+
+
+def classify_user_agent(user_agent: str | None, /) -> RenderPriority:
+    # link unfurlers fetch og:image of /preview pages, nobody is actively waiting for them
+    if user_agent and _CRAWLER_USER_AGENT_RE.search(user_agent):
+        return "crawler"
+
+    return "interactive"
+
+
+class RenderRejectedError(Exception):
+    def __init__(self, *, priority: RenderPriority, retry_after: float) -> None:
+        super().__init__(f"Projected render wait for {priority} request exceeds its deadline")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True, kw_only=True)
+class RenderContext:
+    priority: RenderPriority = "interactive"
+    deadline: float | None = None  # max seconds the caller is willing to wait for a render slot
+
+
+_current_render_context: ContextVar[RenderContext | None] = ContextVar("current_render_context", default=None)
+
+
+def get_render_context() -> RenderContext:
+    return _current_render_context.get() or RenderContext()
+
+
+@contextmanager
+def render_context(*, priority: RenderPriority, deadline: float | None = None) -> Iterator[RenderContext]:
+    context = RenderContext(priority=priority, deadline=deadline)
+    token = _current_render_context.set(context)
+
+    try:
+        yield context
+    finally:
+        _current_render_context.reset(token)
+
+
+@dataclass(kw_only=True)
+class RenderSchedulerStats:
+    admitted: int = 0
+    rejected: int = 0
+    cancelled: int = 0
+
+
+@dataclass(kw_only=True)
+class RenderScheduler:
+    """Runs at most ``concurrency`` renders at once, waiting renders are started in priority order.
+
+    Priority and deadline are taken from the current :func:`render_context`. A render is rejected upfront
+    when its projected wait exceeds the deadline. The projection uses the number of renders queued ahead
+    and an exponentially weighted average of render durations.
+
+    A queued render whose caller is cancelled (e.g. client disconnected) leaves the queue, a started one
+    keeps its slot until it is done.
+    """
+
+    concurrency: int = 1
+    initial_duration: float = 5.0  # seconds, used as the average until renders are measured
+    smoothing: float = 0.2
+
+    stats: RenderSchedulerStats = field(init=False, default_factory=RenderSchedulerStats)
+
+    _running: int = field(init=False, default=0)
+    _limit: int | None = field(init=False, default=None)
+    _avg_duration: float = field(init=False)
+    _waiters: list[tuple[int, int, RenderPriority, asyncio.Future[None]]] = field(init=False, default_factory=list)
+    _seq: Iterator[int] = field(init=False, default_factory=itertools.count)
+
+    def __post_init__(self) -> None:
+        self._avg_duration = self.initial_duration
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def capacity(self) -> int:
+        return self.concurrency if self._limit is None else max(1, min(self.concurrency, self._limit))
+
+    def set_limit(self, limit: int | None, /) -> None:
+        """Temporarily run fewer renders than ``concurrency`` (e.g. under memory pressure), ``None`` lifts it."""
+        self._limit = limit
+
+        while self._waiters and self._running < self.capacity:
+            self._running += 1
+            self._release()
+
+    @property
+    def avg_duration(self) -> float:
+        return self._avg_duration
+
+    def queue_depth(self, priority: RenderPriority | None = None) -> int:
+        return sum(1 for _, _, waiter_priority, _ in self._waiters if priority is None or waiter_priority == priority)
+
+    def estimated_wait(self, priority: RenderPriority = "batch") -> float:
+        if self._running < self.capacity:
+            return 0.0
+
+        rank = RENDER_PRIORITIES.index(priority)
+        ahead = sum(1 for waiter_rank, *_ in self._waiters if waiter_rank <= rank)
+
+        return (ahead // self.capacity + 1) * self._avg_duration
+
+    def _release(self) -> None:
+        # the slot is handed over to the next waiter, so a newcomer can not overtake the queue
+        while self._waiters and self._running <= self.capacity:
+            *_, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self._running -= 1
+
+    async def _acquire(self, priority: RenderPriority, /) -> None:
+        if self._running < self.capacity and not self._waiters:
+            self._running += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (RENDER_PRIORITIES.index(priority), next(self._seq), priority, waiter)
+        heapq.heappush(self._waiters, entry)
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                # a release in the same loop tick may have popped the cancelled entry already
+                with suppress(ValueError):
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+
+            self.stats.cancelled += 1
+            raise
+
+    def _finish(self, started_at: float, /) -> None:
+        self._avg_duration += self.smoothing * (time.perf_counter() - started_at - self._avg_duration)
+        self._release()
+
+    async def run[R](self, func: Callable[[], Awaitable[R]], /) -> R:
+        context = get_render_context()
+
+        if context.deadline is not None and (wait := self.estimated_wait(context.priority)) > context.deadline:
+            self.stats.rejected += 1
+            raise RenderRejectedError(priority=context.priority, retry_after=wait)
+
+        queued_at = time.perf_counter()
+        await self._acquire(context.priority)
+
+        started_at = time.perf_counter()
+        record_stage("render_queue", (started_at - queued_at) * 1_000)
+        self.stats.admitted += 1
+
+        task = asyncio.ensure_future(func())
+        task.add_done_callback(lambda _: self._finish(started_at))
+
+        return await asyncio.shield(task)
+
+
+def scheduled[**P, R](
+    scheduler: RenderScheduler,
+) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            return await scheduler.run(partial(func, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+__all__ = [
+    "RENDER_PRIORITIES",
+    "RenderContext",
+    "RenderPriority",
+    "RenderRejectedError",
+    "RenderScheduler",
+    "RenderSchedulerStats",
+    "classify_user_agent",
+    "get_render_context",
+    "render_context",
+    "scheduled",
+]
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Annotated, Literal
+from typing import Annotated, Any, Literal
 
 from pydantic import AnyHttpUrl, BaseModel, Field
 from pydantic.types import PositiveInt
@@ -15,6 +15,17 @@ class BaseSchema(BaseModel):
 
 class Base64ImageSchema(BaseSchema):
     content: str
+    media_type: str = "image/png"
+
+
+class RenderJobSchema(BaseSchema):
+    id: str
+    status: Literal["pending", "running", "done", "failed"]
+    media_type: str
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    error: str | None = None
 
 
 class MediaSchema(BaseSchema):
@@ -72,6 +83,22 @@ class TweetSchema(BaseSchema):
     media: list[TweetMediaSchema] = Field(default_factory=list)
 
 
+_POSITION_DESCRIPTION = (
+    "Distance from the requested post: 0 for the post itself, the root has the highest position, "
+    "replies after it are negative"
+)
+
+
+class StreamedTweetSchema(BaseSchema):
+    position: int = Field(description=_POSITION_DESCRIPTION)
+    tweet: TweetSchema
+
+
+class StreamedThreadPostSchema(BaseSchema):
+    position: int = Field(description=_POSITION_DESCRIPTION)
+    post: dict[str, Any] | None
+
+
 type TikTokShareURL = Annotated[
     str,
     Field(
@@ -107,10 +134,20 @@ class TikTokCommentSchema(BaseSchema):
     is_creator: bool = False
 
 
+class StreamedTikTokCommentsSchema(BaseSchema):
+    url: str = Field(description="The shared-comment link as requested")
+    comments: list[TikTokCommentSchema] | None = None
+    error: str | None = None
+
+
 __all__ = [
     "Base64ImageSchema",
     "ImagesSchema",
     "MediaSchema",
+    "RenderJobSchema",
+    "StreamedThreadPostSchema",
+    "StreamedTikTokCommentsSchema",
+    "StreamedTweetSchema",
     "TikTokCommentSchema",
     "TikTokMediaSchema",
     "TikTokShareURL",
@@ -0,0 +1,54 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from x_twitter_thread_dump.timing import StageTimings, collect_stage_timings
+
+
+def format_server_timing(timings: StageTimings, /, *, total: float | None = None) -> str:
+    metrics = [
+        f'{stage};dur={timing.duration:.1f};desc="{timing.count} calls"'
+        if timing.count > 1
+        else f"{stage};dur={timing.duration:.1f}"
+        for stage, timing in timings.stages.items()
+    ]
+    if total is not None:
+        metrics.append(f"total;dur={total:.1f}")
+
+    return ", ".join(metrics)
+
+
+class ServerTimingMiddleware:
+    """Collects stages measured while handling a request and reports them in the ``Server-Timing`` header.
+
+    Only stages finished before the response starts are reported.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+
+        with collect_stage_timings() as timings:
+
+            async def _send(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    total = (time.perf_counter() - started_at) * 1_000
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", format_server_timing(timings, total=total))
+
+                await send(message)
+
+            await self.app(scope, receive, _send)
+
+
+__all__ = [
+    "ServerTimingMiddleware",
+    "format_server_timing",
+]
@@ -1,4 +1,6 @@
 import subprocess
+from pathlib import Path
+from typing import Literal
 
 import logfire
 from pydantic_settings import BaseSettings
@@ -15,6 +17,75 @@ class Settings(BaseSettings):
     IMAGE_RENDERING_RETRIES: int = 3
     IMAGE_RENDERING_TIMEOUT: float = 60.0
 
+    # max seconds a request waits for a render slot, it is rejected with 429 when the projected wait is longer
+    RENDER_DEADLINE_INTERACTIVE: float | None = 30.0
+    RENDER_DEADLINE_CRAWLER: float | None = 10.0
+    RENDER_DEADLINE_BATCH: float | None = None
+    RENDER_DURATION_ESTIMATE: float = 5.0  # seconds, until render durations are measured
+
+    BROWSER_POOL_SIZE: int | None = None  # defaults to IMAGE_RENDERING_CONCURRENCY
+    BROWSER_PAGE_CACHE_SIZE: int = 2  # pages kept warm per pooled browser
+    BROWSER_MAX_RENDERS: int | None = 100
+    BROWSER_MAX_AGE: float = 30 * 60.0  # seconds
+    BROWSER_PROBE_INTERVAL: float = 60.0  # seconds
+    BROWSER_PROBE_TIMEOUT: float = 5.0  # seconds
+
+    # RSS of the whole process tree (api, playwright drivers, chromium), watchdog is disabled when not set
+    MEMORY_SOFT_LIMIT: int | None = None  # bytes, renders are throttled and downscaled above it
+    MEMORY_HARD_LIMIT: int | None = None  # bytes, the largest browser is killed above it
+    MEMORY_CHECK_INTERVAL: float = 2.0  # seconds
+    MEMORY_SOFT_RENDER_CONCURRENCY: int = 1
+    MEMORY_SOFT_DEVICE_SCALE_FACTOR: float = 1.0
+
+    HTTP_MAX_CONNECTIONS: int = 20  # per upstream client
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0  # seconds
+    HTTP_MAX_CONNECTIONS_PER_HOST: int | None = 8
+    HTTP2: bool = False  # requires the h2 package
+
+    # tikwm requests of all TikTok lookups share one rate limit, it is lowered while tikwm rejects requests
+    TIKWM_RATE: float = 2.0  # requests per second
+    TIKWM_MIN_RATE: float = 0.25  # requests per second
+    TIKWM_BURST: int = 2
+    TIKTOK_SCAN_CONCURRENCY: int = 4  # reply lists scanned at once per lookup
+    TIKTOK_COMMENT_INDEX_PATH: Path | None = None  # sqlite database, kept in memory when not set
+    TIKTOK_COMMENT_INDEX_TTL: float = 30 * 60.0  # seconds
+    TIKTOK_COMMENT_INDEX_MAX_VIDEOS: int = 500  # most recently scanned videos kept in the index
+    TIKTOK_COMMENT_INDEX_MAX_COMMENTS: int = 50_000  # comments kept in the index across all videos
+    TIKTOK_LINK_CACHE_SIZE: int = 10_000  # resolved share links kept in memory
+    TIKTOK_LINK_CACHE_TTL: float = 24 * 60 * 60.0  # seconds
+    TIKTOK_LINK_CACHE_PATH: Path | None = None  # resolved share links are also kept on disk when set
+
+    X_BOOTSTRAP_TTL: float = 60 * 60.0  # seconds
+    X_BOOTSTRAP_REFRESH_BEFORE: float = 10 * 60.0  # seconds
+    X_BOOTSTRAP_CACHE_PATH: Path | None = None
+
+    TWEET_STORE_PATH: Path | None = None  # sqlite database, disabled when not set
+    TWEET_STORE_CONTENT_TTL: float = 7 * 24 * 60 * 60.0  # seconds
+    TWEET_STORE_COUNTERS_TTL: float = 15 * 60.0  # seconds
+
+    MEDIA_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    MEDIA_CACHE_PATH: Path | None = None  # evicted media are spilled here when set
+    MEDIA_CACHE_MAX_DISK_BYTES: int = 512 * 1024 * 1024
+
+    RENDER_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    RENDER_CACHE_PATH: Path | None = None  # rendered images are also kept on disk when set
+    RENDER_CACHE_MAX_DISK_BYTES: int = 256 * 1024 * 1024
+
+    # Cache-Control policies of API responses, validators (ETag) are always sent
+    CACHE_CONTROL_JSON: str = "public, max-age=60, stale-while-revalidate=300"
+    CACHE_CONTROL_HTML: str = "public, max-age=60, stale-while-revalidate=300"
+    CACHE_CONTROL_IMAGES: str = "public, max-age=300, stale-while-revalidate=3600"
+
+    RENDER_JOB_QUEUE_SIZE: int = 100
+    RENDER_JOB_WORKERS: int = 2
+    RENDER_JOB_RESULT_TTL: float = 10 * 60.0  # seconds
+    RENDER_JOB_MAX_BYTES: int = 64 * 1024 * 1024  # images of finished jobs, oldest jobs are dropped first
+
+    CPU_EXECUTOR: Literal["thread", "process"] = "thread"  # "process" when jinja templating dominates
+    CPU_EXECUTOR_WORKERS: int = 2
+    CPU_EXECUTOR_CONCURRENCY: int | None = None  # defaults to CPU_EXECUTOR_WORKERS
+
     LOGFIRE_TOKEN: str | None = None
 
 
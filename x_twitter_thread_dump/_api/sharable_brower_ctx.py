@@ -2,196 +2,288 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from collections.abc import AsyncIterator
-from contextlib import AsyncExitStack, asynccontextmanager
-from dataclasses import dataclass
+from contextlib import AsyncExitStack, asynccontextmanager, suppress
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from functools import cached_property
-from typing import Any, Self
+from typing import Literal, Self
 
 import logfire
 import psutil
-from aiorwlock import RWLock
 from playwright._impl._errors import TargetClosedError
+from playwright.async_api import Error as PlaywrightError
 
-from x_twitter_thread_dump._api.metrics import shared_browser_age
-from x_twitter_thread_dump.browser import AsyncBrowser, async_browser
+from x_twitter_thread_dump._api.metrics import shared_browser_age, shared_browser_recycles
+from x_twitter_thread_dump.browser import AsyncBrowser, AsyncPageCache, async_browser
+from x_twitter_thread_dump.timing import record_stage
 
 logger = logging.getLogger(__name__)
 
+type _RecycleReason = Literal["renders", "age", "unhealthy", "memory"]
 
-def _kill_browser_process(browser: AsyncBrowser | None) -> None:
-    if browser is not None:
-        try:
-            proc = browser._impl_obj._connection._transport._proc  # noqa: SLF001
-            if proc and proc.pid:
-                process = psutil.Process(proc.pid)
-                process.kill()
-        except (psutil.NoSuchProcess, AttributeError):
-            pass
-
-    for process in psutil.process_iter(["pid", "name", "cmdline"]):
-        try:
-            name = (process.info.get("name") or "").lower()
-            cmdline = " ".join(process.info.get("cmdline") or []).lower()
 
-            if "chromium" in name or "chrome" in name or "playwright" in cmdline:
-                process.kill()
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            pass
+def _get_browser_pid(browser: AsyncBrowser) -> int | None:
+    # pid of the playwright driver, chromium processes are its children
+    try:
+        proc = browser._impl_obj._connection._transport._proc  # type: ignore[attr-defined] # noqa: SLF001
+    except AttributeError:
+        return None
+
+    return proc.pid if proc else None
+
+
+def process_tree_rss(pid: int | None, /) -> int:
+    # memory shared between chromium processes is counted more than once, so this is an upper bound
+    try:
+        process = psutil.Process(pid)
+        processes = [process, *process.children(recursive=True)]
+    except psutil.NoSuchProcess:
+        return 0
+
+    rss = 0
+    for proc in processes:
+        with suppress(psutil.NoSuchProcess, psutil.AccessDenied):
+            rss += proc.memory_info().rss
+
+    return rss
+
+
+def _kill_process_tree(pid: int | None) -> None:
+    if pid is None:
+        return
+
+    try:
+        process = psutil.Process(pid)
+        processes = [*process.children(recursive=True), process]
+    except psutil.NoSuchProcess:
+        return
+
+    for proc in processes:
+        with suppress(psutil.NoSuchProcess, psutil.AccessDenied):
+            proc.kill()
 
 
-@dataclass
-class _CurrentBrowserContext:
+@dataclass(kw_only=True, eq=False)
+class _PooledBrowser:
     stack: AsyncExitStack
     browser: AsyncBrowser
-    lifetime: timedelta
-    expired_at: datetime
-    rw_lock: RWLock
-    close_task: asyncio.Task[Any] | None = None
+    pages: AsyncPageCache
+    pid: int | None = None
+    created_at: datetime = field(default_factory=datetime.now)
+    last_used_at: datetime = field(default_factory=datetime.now)
+    renders: int = 0
+    healthy: bool = True
+    recycle_reason: _RecycleReason | None = None  # set when the browser was killed on purpose
 
     @property
     def age(self) -> timedelta:
-        return datetime.now() - (self.expired_at - self.lifetime)
+        return datetime.now() - self.created_at
 
     @property
-    def is_expired(self) -> bool:
-        return datetime.now() >= self.expired_at
+    def idle(self) -> timedelta:
+        return datetime.now() - self.last_used_at
+
+    def is_alive(self) -> bool:
+        if not self.healthy or not self.browser.is_connected():
+            return False
+
+        if self.pid is None:
+            return True
+
+        try:
+            return psutil.Process(self.pid).status() != psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            return False
+
+    async def probe(self, *, timeout: float) -> bool:
+        try:
+            async with asyncio.timeout(timeout):
+                ctx = await self.browser.new_context()
+                await ctx.close()
+        except (TimeoutError, PlaywrightError):
+            return False
+
+        return True
 
     async def aclose(self) -> None:
-        await self.stack.aclose()
-
-    async def safe_aclose(
-        self,
-        *,
-        posponed: bool = False,
-    ) -> None:
-        if posponed:
-            initial_delay = (self.expired_at - datetime.now()).total_seconds()
-            await asyncio.sleep(initial_delay)
-
-        async with self.rw_lock.writer:
-            logger.info("Closing browser context")
-            await self.aclose()
-            logger.info("Browser context closed")
-
-    def schedule_close(self) -> None:
-        if self.close_task is not None:
-            self.close_task.cancel()
-            self.close_task = None
-
-        self.close_task = asyncio.create_task(
-            self.safe_aclose(posponed=True),
-            name="browser-context-close-task",
-        )
+        if not self.healthy:
+            # do not wait for graceful shutdown of a browser that is already broken
+            _kill_process_tree(self.pid)
+
+        try:
+            await self.stack.aclose()
+        except Exception:
+            logger.exception("Failed to close browser gracefully, killing it")
+            _kill_process_tree(self.pid)
 
 
 @dataclass(kw_only=True)
 class SharableBrowserCtx:
+    size: int = 1
+    pages_per_browser: int = 2
     lifetime: timedelta = timedelta(minutes=30)
+    max_renders: int | None = 100
+    probe_interval: timedelta = timedelta(minutes=1)
+    probe_timeout: float = 5.0
     headless: bool = True
 
-    ctx: _CurrentBrowserContext | None = None
-
-    @cached_property
-    def _rw_lock(self) -> RWLock:
-        return RWLock()
+    _slots: asyncio.Queue[_PooledBrowser | None] = field(init=False)
+    _browsers: list[_PooledBrowser] = field(init=False, default_factory=list)
 
-    def _get_expired_at(self) -> datetime:
-        return datetime.now() + self.lifetime
+    def __post_init__(self) -> None:
+        self._slots = asyncio.Queue()
 
-    @logfire.instrument("create new browser ctx")
-    async def _create_new_ctx(self) -> _CurrentBrowserContext:
-        async with self._rw_lock.writer:
-            if self.ctx and not self.ctx.is_expired:
-                logger.info("New context creation skipped, other task already created it")
-                return self.ctx
+        # empty slots are lazily filled with a browser on first acquire
+        for _ in range(self.size):
+            self._slots.put_nowait(None)
 
-            logger.info("Creating new browser context")
+    @logfire.instrument("create new pooled browser")
+    async def _launch(self) -> _PooledBrowser:
+        logger.info("Launching new pooled browser")
 
-            stack = AsyncExitStack()
+        stack = AsyncExitStack()
+        try:
             browser = await stack.enter_async_context(async_browser(headless=self.headless))
+        except BaseException:
+            await stack.aclose()
+            raise
 
-            self.ctx = _CurrentBrowserContext(
-                stack=stack,
-                browser=browser,
-                lifetime=self.lifetime,
-                expired_at=self._get_expired_at(),
-                rw_lock=self._rw_lock,
-            )
+        pooled = _PooledBrowser(
+            stack=stack,
+            browser=browser,
+            pages=AsyncPageCache(browser=browser, max_size=self.pages_per_browser),
+            pid=_get_browser_pid(browser),
+        )
+        self._browsers.append(pooled)
+
+        logger.info("Pooled browser launched (pid=%s)", pooled.pid)
+        return pooled
+
+    async def _recycle(self, pooled: _PooledBrowser, *, reason: _RecycleReason) -> None:
+        logger.info(
+            "Recycling pooled browser (pid=%s, reason=%s, renders=%s, age=%s)",
+            pooled.pid,
+            reason,
+            pooled.renders,
+            pooled.age,
+        )
+        shared_browser_recycles.add(1, {"reason": reason})
 
-            logger.info("New browser context created")
-            return self.ctx
+        if pooled in self._browsers:
+            self._browsers.remove(pooled)
 
-    @asynccontextmanager
-    async def _acquire(self, *, _final: bool = False) -> AsyncIterator[AsyncBrowser]:
-        if self.ctx is None or self.ctx.is_expired:
-            await self._create_new_ctx()
-        else:
-            logger.info("Reusing existing browser context")
-
-        cell_empty = False
-
-        async with self._rw_lock.reader:
-            if self.ctx is None and not _final:
-                cell_empty = True
-            elif self.ctx:
-                shared_browser_age.record(
-                    max(0, int(self.ctx.age.total_seconds())),
-                )
-
-                yield self.ctx.browser
-                return
-
-        if not cell_empty:
-            return
+        await pooled.aclose()
 
-        logger.info("Browser context is empty, try to call resolver again (final call)")
+    async def _get_recycle_reason(self, pooled: _PooledBrowser) -> _RecycleReason | None:
+        if pooled.recycle_reason is not None:
+            return pooled.recycle_reason
+        if self.max_renders is not None and pooled.renders >= self.max_renders:
+            return "renders"
+        if pooled.age >= self.lifetime:
+            return "age"
+        if not pooled.is_alive():
+            return "unhealthy"
+        if pooled.idle >= self.probe_interval and not await pooled.probe(timeout=self.probe_timeout):
+            return "unhealthy"
 
-        async with self._acquire(_final=True) as browser:
-            yield browser
+        return None
 
-    @asynccontextmanager
-    async def acquire(self) -> AsyncIterator[AsyncBrowser]:
-        browser = None
-        try:
-            async with self._rw_lock.writer, async_browser(headless=self.headless) as browser:
-                yield browser
-        finally:
-            _kill_browser_process(browser)
+    async def _checkout(self, pooled: _PooledBrowser | None) -> _PooledBrowser:
+        if pooled is not None and (reason := await self._get_recycle_reason(pooled)):
+            if reason == "unhealthy":
+                pooled.healthy = False
+
+            await self._recycle(pooled, reason=reason)
+            pooled = None
+
+        if pooled is None:
+            return await self._launch()
+
+        logger.info("Reusing pooled browser (pid=%s, renders=%s)", pooled.pid, pooled.renders)
+        return pooled
+
+    async def _return_slot(self, slot: _PooledBrowser | None) -> _PooledBrowser | None:
+        # a browser recycled by the failed checkout is already out of the pool
+        if slot is None or slot not in self._browsers:
+            return None
+
+        if not slot.healthy:
+            await self._recycle(slot, reason=slot.recycle_reason or "unhealthy")
+            return None
+
+        return slot
 
     @asynccontextmanager
-    async def _old_acquire(self) -> AsyncIterator[AsyncBrowser]:
+    async def acquire(self) -> AsyncIterator[AsyncPageCache]:
+        started_at = time.perf_counter()
+        slot = await self._slots.get()
+        # the slot browser goes back to the pool unless the checkout replaces or drops it
+        pooled: _PooledBrowser | None = slot
+
         try:
-            async with self._acquire() as browser:
-                yield browser
+            try:
+                pooled = await self._checkout(slot)
+            except BaseException:
+                pooled = None  # stays empty if recycling the slot browser fails too
+                pooled = await self._return_slot(slot)
+                raise
+
+            shared_browser_age.record(max(0, int(pooled.age.total_seconds())))
+            record_stage("browser_acquire", (time.perf_counter() - started_at) * 1_000)
+
+            try:
+                yield pooled.pages
+            finally:
+                pooled.renders += 1
+                pooled.last_used_at = datetime.now()
         except TargetClosedError:
-            if self.ctx:
-                logfire.info("Target closed error, closing browser context")
-                logger.warning("Target closed error, force closing browser context")
+            if pooled is not None:
+                logfire.info("Target closed error, recycling pooled browser")
+                logger.warning("Target closed error, recycling pooled browser (pid=%s)", pooled.pid)
 
-                await self.ctx.safe_aclose()
-                self.ctx = None
+                pooled.healthy = False
+                await self._recycle(pooled, reason=pooled.recycle_reason or "unhealthy")
+                pooled = None
 
             raise
+        finally:
+            # a failed launch leaves an empty slot, it will be filled on the next acquire
+            self._slots.put_nowait(pooled)
+
+    def kill_largest(self) -> int | None:
+        """Kill the pooled browser using the most memory, return its RSS in bytes.
+
+        A render running in it fails with ``TargetClosedError`` and is retried in a fresh browser.
+        """
+        candidates = [(process_tree_rss(pooled.pid), pooled) for pooled in self._browsers if pooled.healthy]
+        if not candidates:
+            return None
+
+        rss, pooled = max(candidates, key=lambda candidate: candidate[0])
+        logger.warning("Killing pooled browser over memory limit (pid=%s, rss=%s)", pooled.pid, rss)
+
+        pooled.healthy = False
+        pooled.recycle_reason = "memory"
+        _kill_process_tree(pooled.pid)
+
+        return rss
 
     async def __aenter__(self) -> Self:
         return self
 
     async def __aexit__(self, *_: object) -> None:
-        if self.ctx is None:
-            logger.warning("Browser context is not initialized, nothing to close")
+        if not self._browsers:
+            logger.warning("Browser pool is empty, nothing to close")
             return
 
-        if self.ctx.close_task is not None:
-            logger.info("Cancelling browser context close task")
-            self.ctx.close_task.cancel()
-            self.ctx.close_task = None
+        logger.info("Closing %s pooled browsers", len(self._browsers))
 
-        await self.ctx.safe_aclose()
-        self.ctx = None
+        browsers, self._browsers = self._browsers, []
+        await asyncio.gather(*[pooled.aclose() for pooled in browsers])
 
 
 __all__ = [
     "SharableBrowserCtx",
+    "process_tree_rss",
 ]
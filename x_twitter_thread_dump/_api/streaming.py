@@ -0,0 +1,55 @@
+import logging
+from collections.abc import AsyncIterable, AsyncIterator
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class StreamErrorSchema(BaseModel):
+    error: str
+
+
+async def _iter_ndjson(first: BaseModel | None, items: AsyncIterator[BaseModel], /) -> AsyncIterator[bytes]:
+    if first is None:
+        return
+
+    yield first.model_dump_json().encode() + b"\n"
+
+    try:
+        async for item in items:
+            yield item.model_dump_json().encode() + b"\n"
+    except Exception as e:
+        # status is already sent, the failure is reported as the last line instead
+        logger.exception("NDJSON stream failed")
+        yield StreamErrorSchema(error=str(e) or type(e).__name__).model_dump_json().encode() + b"\n"
+
+
+async def ndjson_response(items: AsyncIterable[BaseModel], /) -> StreamingResponse:
+    """Stream items as newline delimited json, one line per item as soon as it is available.
+
+    The first item is awaited before the response starts, so upstream failures still get a proper status.
+    """
+    iterator = aiter(items)
+    first = await anext(iterator, None)
+
+    return StreamingResponse(
+        _iter_ndjson(first, iterator),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={
+            "Cache-Control": "no-store",
+            # compression middleware would buffer lines until the stream ends
+            "Content-Encoding": "identity",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+__all__ = [
+    "NDJSON_MEDIA_TYPE",
+    "StreamErrorSchema",
+    "ndjson_response",
+]
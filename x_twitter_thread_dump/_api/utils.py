@@ -1,23 +1,13 @@
 import asyncio
-from collections.abc import Awaitable, Callable
+import inspect
+from collections.abc import Awaitable, Callable, Hashable
 from contextlib import suppress
-from functools import cache, wraps
+from functools import partial, wraps
+from typing import Any
 
+from x_twitter_thread_dump.utils import SingleFlight
 
-def limit_concurrency[**P, R](limit: int) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
-    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
-        @cache
-        def _get_semaphore() -> asyncio.Semaphore:
-            return asyncio.Semaphore(limit)
-
-        @wraps(func)
-        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
-            async with _get_semaphore():
-                return await func(*args, **kwargs)
-
-        return wrapper
-
-    return decorator
+from .metrics import coalesced_requests
 
 
 def retry[**P, R](
@@ -50,8 +40,38 @@ def shielded[**P, R](func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R
     return wrapper
 
 
+def single_flight[**P, R](
+    *,
+    key: Callable[[dict[str, Any]], Hashable],
+) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    """Concurrent calls with the same key await a single in-flight call instead of running their own.
+
+    ``key`` receives call arguments by name (defaults applied). The in-flight call is cancelled once
+    every caller awaiting it has been cancelled.
+    """
+
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        signature = inspect.signature(func)
+        flights: SingleFlight[Hashable, R] = SingleFlight()
+
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            call_key = key(bound.arguments)
+
+            if call_key in flights:
+                coalesced_requests.add(1, {"func": func.__name__})
+
+            return await flights.run(call_key, partial(func, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
 __all__ = [
-    "limit_concurrency",
     "retry",
     "shielded",
+    "single_flight",
 ]
@@ -1,54 +1,28 @@
-from asyncio import Semaphore, gather
+import logging
+from asyncio import Semaphore, gather, to_thread
 from collections import defaultdict
-from collections.abc import AsyncIterator
-from contextlib import AbstractAsyncContextManager, asynccontextmanager, nullcontext
+from collections.abc import AsyncIterator, Iterable
+from contextlib import AbstractAsyncContextManager, AsyncExitStack, asynccontextmanager, nullcontext
 from dataclasses import InitVar, dataclass, field
 from typing import Any
 
-from httpx import AsyncClient, AsyncHTTPTransport
-from x_client_transaction import ClientTransaction
-from x_client_transaction.utils import generate_headers, get_ondemand_file_url
+from httpx import AsyncBaseTransport, AsyncClient, AsyncHTTPTransport, HTTPError, HTTPStatusError
+from x_client_transaction.utils import generate_headers
 
 from ._base import BaseXTwitterThreadDumpClient
-from .browser import AsyncBrowser, html_to_image_async
-from .consts import DEFAULT_BEARER_TOKEN, DEFAULT_RETRIES, DEFAULT_TIMEOUT
+from ._bootstrap import XBootstrapCache, fetch_x_bootstrap_state
+from .browser import AsyncBrowser, html_to_images_async, media_routes
+from .cache import MediaCache
+from .consts import DEFAULT_BEARER_TOKEN, DEFAULT_RETRIES, DEFAULT_TIMEOUT, GUEST_TOKEN_REJECTED_STATUSES
 from .entities import Thread, Tweet
+from .images import ImageEncoding, bytes_to_image, encode_screenshot
 from .render import render_thread_html
+from .store import TweetStore
+from .timing import timed_stage
 from .types import BrowserCtxConfig, Img
-from .utils import alimited, parse_guest_token, response_to_bs4
+from .utils import alimited
 
-
-async def _get_client_transaction_client(
-    *,
-    timeout: float | None = None,
-    retries: int | None = None,
-) -> ClientTransaction:
-    async with AsyncClient(
-        headers=generate_headers(),
-        timeout=timeout or DEFAULT_TIMEOUT,
-        transport=AsyncHTTPTransport(
-            retries=retries or DEFAULT_RETRIES,
-        ),
-    ) as client:
-        home_page = await client.get(url="https://x.com")
-        home_page_response = response_to_bs4(home_page)
-
-        ondemand_file_url = get_ondemand_file_url(home_page_response)
-        ondemand_file = await client.get(url=ondemand_file_url)
-        ondemand_file_response = response_to_bs4(ondemand_file)
-
-        return ClientTransaction(home_page_response, ondemand_file_response)
-
-
-async def _get_guest_token(client: AsyncClient) -> str:
-    response = await client.post(
-        "https://api.twitter.com/1.1/guest/activate.json",
-        headers={
-            "Authorization": f"Bearer {DEFAULT_BEARER_TOKEN}",
-        },
-    )
-
-    return parse_guest_token(response)
+logger = logging.getLogger(__name__)
 
 
 @dataclass(kw_only=True)
@@ -66,29 +40,103 @@ class XTwitterThreadDumpAsyncClient(BaseXTwitterThreadDumpClient):
         else:
             self._limit_ctx = Semaphore(download_concurrency)
 
+    @timed_stage("thread_fetch")
     async def get_thread(
         self,
         tweet_id: str,
         *,
         limit: int | None = None,
     ) -> Thread:
-        thread = [tweet async for tweet in alimited(self._iter_thread(tweet_id), limit=limit)]
+        thread = [tweet async for _, tweet in self.iter_thread(tweet_id, limit=limit)]
         thread.reverse()
 
         return thread
 
+    async def iter_thread(
+        self,
+        tweet_id: str,
+        *,
+        limit: int | None = None,
+    ) -> AsyncIterator[tuple[int, Tweet]]:
+        """Yield tweets of the thread as soon as they are fetched, from ``tweet_id`` up to the root.
+
+        Each tweet comes with its position counted from ``tweet_id`` (0 for the tweet itself),
+        so the thread in reading order is sorted by descending position.
+        """
+        position = 0
+        async for tweet in alimited(self._iter_thread(tweet_id), limit=limit):
+            yield position, tweet
+            position += 1
+
     async def _get_tweet(self, tweet_id: str, /) -> Tweet:
         response = await self.client.get(**self._prepare_get_tweet_request(tweet_id))
         response.raise_for_status()
 
         return Tweet.from_raw_response(response.json())
 
+    async def get_tweets(self, tweet_ids: Iterable[str], /) -> dict[str, Tweet]:
+        async def _get_chunk(chunk: list[str], /) -> list[Tweet]:
+            response = await self.client.get(**self._prepare_get_tweets_request(chunk))
+            response.raise_for_status()
+
+            return Tweet.many_from_raw_response(response.json())
+
+        chunks = await gather(*[_get_chunk(chunk) for chunk in self._chunk_tweet_ids(tweet_ids)])
+        return {tweet.id: tweet for chunk in chunks for tweet in chunk}
+
+    async def _get_conversation_chain(self, tweet_id: str, /) -> list[Tweet]:
+        response = await self.client.get(**self._prepare_get_tweet_detail_request(tweet_id))
+        response.raise_for_status()
+
+        return self._parse_conversation_chain(response.json(), tweet_id)
+
+    async def _get_stored_chain(self, store: TweetStore, tweet_id: str, /) -> list[Tweet]:
+        stored = await to_thread(store.get_chain, tweet_id)
+        if not stored.stale_ids:
+            return stored.tweets
+
+        try:
+            refreshed = await self.get_tweets(stored.stale_ids)
+        except (HTTPError, ValueError, KeyError):
+            logger.warning(
+                "Failed to refresh counters of %s stored tweets, serving stale ones",
+                len(stored.stale_ids),
+                exc_info=True,
+            )
+            return stored.tweets
+
+        await to_thread(store.update_counters, refreshed.values())
+        return self._replace_tweets(stored.tweets, refreshed)
+
+    async def _fetch_chain(self, tweet_id: str, /) -> list[Tweet]:
+        if self.store is not None and (chain := await self._get_stored_chain(self.store, tweet_id)):
+            return chain
+
+        chain = await self._fetch_remote_chain(tweet_id)
+        if self.store is not None:
+            await to_thread(self.store.put, chain)
+
+        return chain
+
+    async def _fetch_remote_chain(self, tweet_id: str, /) -> list[Tweet]:
+        if self._use_conversation:
+            try:
+                return await self._get_conversation_chain(tweet_id)
+            except (HTTPStatusError, ValueError):
+                logger.warning("Failed to fetch conversation of %s, falling back to walking parents", tweet_id)
+                self._conversation_failed = True
+
+        return [await self._get_tweet(tweet_id)]
+
     async def _iter_thread(self, tweet_id: str, /) -> AsyncIterator[Tweet]:
         node: str | None = tweet_id
         while node:
-            tweet = await self._get_tweet(node)
-            yield tweet
-            node = tweet.parent_id
+            chain = await self._fetch_chain(node)
+            for tweet in chain:
+                yield tweet
+
+            # long threads are truncated by X, continue from the first missing ancestor
+            node = chain[-1].parent_id
 
     async def thread_to_image(
         self,
@@ -99,21 +147,41 @@ class XTwitterThreadDumpAsyncClient(BaseXTwitterThreadDumpClient):
         config: BrowserCtxConfig | None = None,
         browser: AsyncBrowser | None = None,
     ) -> list[Img]:
+        screenshots = await self.thread_to_image_bytes(
+            thread,
+            tweets_per_image=tweets_per_image,
+            max_tweet_height=max_tweet_height,
+            config=config,
+            browser=browser,
+        )
+
+        return [bytes_to_image(screenshot) for screenshot in screenshots]
+
+    async def thread_to_image_bytes(  # noqa: PLR0913
+        self,
+        thread: list[Tweet],
+        *,
+        encoding: ImageEncoding | None = None,
+        tweets_per_image: int | None = None,
+        max_tweet_height: int | None = None,
+        config: BrowserCtxConfig | None = None,
+        browser: AsyncBrowser | None = None,
+    ) -> list[bytes]:
         await self.download_previews(thread)
 
-        html = render_thread_html(thread)
-        result = await html_to_image_async(
+        html = render_thread_html(thread, inline_media=False)
+        screenshots = await html_to_images_async(
             html,
             browser=browser,
             config=config,
-        )
-
-        return self.prepare_result_img(
-            result,
+            media=media_routes(media for tweet in thread for media in tweet.all_preview_media()),
             tweets_per_image=tweets_per_image,
             max_tweet_height=max_tweet_height,
         )
 
+        return [encode_screenshot(screenshot, encoding) for screenshot in screenshots]
+
+    @timed_stage("preview_download")
     async def download_previews(self, thread: Thread, /) -> None:
         medias = [media for tweet in thread for media in tweet.all_preview_media() if not media.raw_preview_bytes]
 
@@ -121,24 +189,35 @@ class XTwitterThreadDumpAsyncClient(BaseXTwitterThreadDumpClient):
         for media in medias:
             urls[media.preview_url].append(media)
 
-        async def _worker(url: str, /) -> None:
+        async def _download(url: str, /) -> bytes:
             async with self._limit_ctx, self.client.stream("GET", url, timeout=self.download_timeout) as response:
                 response.raise_for_status()
-                content = await response.aread()
+                return await response.aread()
+
+        async def _worker(url: str, /) -> None:
+            if self.media_cache is not None:
+                content = await self.media_cache.fetch(url, _download)
+            else:
+                content = await _download(url)
 
-                for media in urls[url]:
-                    media.raw_preview_bytes = content
+            for media in urls[url]:
+                media.raw_preview_bytes = content
 
         await gather(*[_worker(url) for url in urls])
 
 
-@asynccontextmanager
-async def x_twitter_thread_dump_async_client(
+def create_x_twitter_async_http_client(
     *,
     timeout: float | None = None,
     retries: int | None = None,
-) -> AsyncIterator[XTwitterThreadDumpAsyncClient]:
-    async with AsyncClient(
+    transport: AsyncBaseTransport | None = None,
+) -> AsyncClient:
+    if transport is None:
+        transport = AsyncHTTPTransport(
+            retries=retries or DEFAULT_RETRIES,
+        )
+
+    return AsyncClient(
         base_url="https://x.com/",
         follow_redirects=True,
         headers={
@@ -146,25 +225,49 @@ async def x_twitter_thread_dump_async_client(
             "Authorization": f"Bearer {DEFAULT_BEARER_TOKEN}",
         },
         timeout=timeout or DEFAULT_TIMEOUT,
-        transport=AsyncHTTPTransport(
-            retries=retries or DEFAULT_RETRIES,
-        ),
-    ) as client:
-        transaction_client = await _get_client_transaction_client(
-            timeout=timeout,
-            retries=retries,
-        )
+        transport=transport,
+    )
 
-        guest_token = await _get_guest_token(client)
-        client.headers["x-guest-token"] = guest_token
 
-        yield XTwitterThreadDumpAsyncClient(
-            client=client,
-            transaction_client=transaction_client,
-        )
+@asynccontextmanager
+async def x_twitter_thread_dump_async_client(  # noqa: PLR0913
+    *,
+    timeout: float | None = None,
+    retries: int | None = None,
+    bootstrap: XBootstrapCache | None = None,
+    client: AsyncClient | None = None,
+    store: TweetStore | None = None,
+    media_cache: MediaCache | None = None,
+) -> AsyncIterator[XTwitterThreadDumpAsyncClient]:
+    async with AsyncExitStack() as stack:
+        if client is None:
+            client = await stack.enter_async_context(
+                create_x_twitter_async_http_client(timeout=timeout, retries=retries),
+            )
+
+        if bootstrap is not None:
+            state = await bootstrap.get()
+        else:
+            state = await fetch_x_bootstrap_state(timeout=timeout, retries=retries)
+
+        try:
+            yield XTwitterThreadDumpAsyncClient(
+                client=client,
+                transaction_client=state.transaction_client,
+                guest_token=state.guest_token,
+                store=store,
+                media_cache=media_cache,
+            )
+        except HTTPStatusError as exc:
+            # most likely the guest token was revoked or rate-limited, next client will get a new one
+            if bootstrap is not None and exc.response.status_code in GUEST_TOKEN_REJECTED_STATUSES:
+                bootstrap.invalidate()
+
+            raise
 
 
 __all__ = [
     "XTwitterThreadDumpAsyncClient",
+    "create_x_twitter_async_http_client",
     "x_twitter_thread_dump_async_client",
 ]
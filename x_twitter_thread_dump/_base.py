@@ -1,38 +1,114 @@
 from __future__ import annotations
 
 import json
+from collections.abc import Iterable, Iterator, Sequence
 from copy import deepcopy
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
+from more_itertools import chunked, unique_everseen
 from x_client_transaction import ClientTransaction
 from x_client_transaction.utils import generate_headers
 
 from .browser import HTMLToImageResult
-from .consts import TWEET_RESULT_BY_REST_ID_PARAMS, TWEET_RESULT_BY_REST_ID_PATH
-from .images import divide_images
-from .types import AnyDict, Img
+from .cache import MediaCache
+from .consts import (
+    TWEET_DETAIL_PARAMS,
+    TWEET_DETAIL_PATH,
+    TWEET_RESULT_BY_REST_ID_PARAMS,
+    TWEET_RESULT_BY_REST_ID_PATH,
+    TWEET_RESULTS_BY_REST_IDS_CHUNK_SIZE,
+    TWEET_RESULTS_BY_REST_IDS_PARAMS,
+    TWEET_RESULTS_BY_REST_IDS_PATH,
+)
+from .entities import Tweet
+from .images import divide_images, get_max_chunk_height
+from .store import TweetStore
+from .timing import measure_stage
+from .types import AnyDict, Img, ThreadFetchStrategy
 
 
 @dataclass(kw_only=True)
 class BaseXTwitterThreadDumpClient:
     transaction_client: ClientTransaction
+    guest_token: str | None = None
+    thread_strategy: ThreadFetchStrategy = "conversation"
+    store: TweetStore | None = None
+    media_cache: MediaCache | None = None
+
+    # set once the conversation endpoint fails, the client then sticks to walking parents one by one
+    _conversation_failed: bool = field(init=False, default=False)
+
+    @property
+    def _use_conversation(self) -> bool:
+        return self.thread_strategy == "conversation" and not self._conversation_failed
+
+    def _prepare_headers(self, path: str, /) -> dict[str, str]:
+        headers = {
+            **generate_headers(),
+            "x-client-transaction-id": self.transaction_client.generate_transaction_id(
+                path=path,
+                method="GET",
+            ),
+        }
+
+        if self.guest_token:
+            headers["x-guest-token"] = self.guest_token
+
+        return headers
+
+    def _prepare_graphql_request(self, path: str, params: AnyDict, /) -> AnyDict:
+        return {
+            "url": f"https://api.x.com/{path.removeprefix('/')}",
+            "params": {k: json.dumps(v) for k, v in params.items()},
+            "headers": self._prepare_headers(path),
+        }
 
     def _prepare_get_tweet_request(self, tweet_id: str, /) -> AnyDict:
         params = deepcopy(TWEET_RESULT_BY_REST_ID_PARAMS)
         params["variables"]["tweetId"] = str(tweet_id)  # type: ignore[index]
-        params = {k: json.dumps(v) for k, v in params.items()}
 
-        return {
-            "url": f"https://api.x.com/{TWEET_RESULT_BY_REST_ID_PATH.removeprefix('/')}",
-            "params": params,
-            "headers": {
-                **generate_headers(),
-                "x-client-transaction-id": self.transaction_client.generate_transaction_id(
-                    path=TWEET_RESULT_BY_REST_ID_PATH,
-                    method="GET",
-                ),
-            },
-        }
+        return self._prepare_graphql_request(TWEET_RESULT_BY_REST_ID_PATH, params)
+
+    def _prepare_get_tweets_request(self, tweet_ids: Sequence[str], /) -> AnyDict:
+        params = deepcopy(TWEET_RESULTS_BY_REST_IDS_PARAMS)
+        params["variables"]["tweetIds"] = [str(tweet_id) for tweet_id in tweet_ids]  # type: ignore[index]
+
+        return self._prepare_graphql_request(TWEET_RESULTS_BY_REST_IDS_PATH, params)
+
+    @staticmethod
+    def _chunk_tweet_ids(tweet_ids: Iterable[str], /) -> Iterator[list[str]]:
+        return chunked(unique_everseen(str(tweet_id) for tweet_id in tweet_ids), TWEET_RESULTS_BY_REST_IDS_CHUNK_SIZE)
+
+    def _prepare_get_tweet_detail_request(self, tweet_id: str, /) -> AnyDict:
+        params = deepcopy(TWEET_DETAIL_PARAMS)
+        params["variables"]["focalTweetId"] = str(tweet_id)  # type: ignore[index]
+
+        return self._prepare_graphql_request(TWEET_DETAIL_PATH, params)
+
+    @staticmethod
+    def _follow_parents(tweets: Iterable[Tweet], tweet_id: str, /) -> list[Tweet]:
+        by_id = {tweet.id: tweet for tweet in tweets}
+
+        chain: list[Tweet] = []
+        node: str | None = tweet_id
+        while node and node in by_id and len(chain) < len(by_id):
+            tweet = by_id[node]
+            chain.append(tweet)
+            node = tweet.parent_id
+
+        return chain
+
+    @staticmethod
+    def _replace_tweets(tweets: Iterable[Tweet], replacements: dict[str, Tweet], /) -> list[Tweet]:
+        return [replacements.get(tweet.id, tweet) for tweet in tweets]
+
+    @classmethod
+    def _parse_conversation_chain(cls, raw_data: AnyDict, tweet_id: str, /) -> list[Tweet]:
+        chain = cls._follow_parents(Tweet.from_raw_conversation_response(raw_data), tweet_id)
+        if not chain:
+            raise ValueError(f"Conversation response does not contain tweet {tweet_id}")
+
+        return chain
 
     @classmethod
     def prepare_result_img(
@@ -46,20 +122,17 @@ class BaseXTwitterThreadDumpClient:
             # If there is only one rectangle, return the image as is
             return [res.img]
 
-        img, rects = res.img, res.rects
-
-        match (tweets_per_image, max_tweet_height):
-            case (tweets_per_image, None) if tweets_per_image:
-                average_height = sum(rect["height"] for rect in rects) // len(rects)
-
-                return [*divide_images(img, rects, max_chunk_height=average_height * tweets_per_image)]
-            case (None, max_tweet_height) if max_tweet_height:
-                # we need to adjust the height to the scale of the image
-                max_tweet_height = int(max_tweet_height * res.scale)
+        max_chunk_height = get_max_chunk_height(
+            res.rects,
+            tweets_per_image=tweets_per_image,
+            max_tweet_height=max_tweet_height,
+            scale=res.scale,
+        )
+        if max_chunk_height is None:
+            return [res.img]
 
-                return [*divide_images(img, rects, max_chunk_height=max_tweet_height)]
-            case _:
-                return [img]
+        with measure_stage("split"):
+            return [*divide_images(res.img, res.rects, max_chunk_height=max_chunk_height)]
 
 
 __all__ = [
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import cached_property
+from pathlib import Path
+from typing import Self
+
+from bs4 import BeautifulSoup
+from httpx import AsyncClient, AsyncHTTPTransport
+from x_client_transaction import ClientTransaction
+from x_client_transaction.utils import generate_headers, get_ondemand_file_url
+
+from .consts import DEFAULT_BEARER_TOKEN, DEFAULT_RETRIES, DEFAULT_TIMEOUT
+from .timing import timed_stage
+from .utils import parse_guest_token, response_to_bs4
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(kw_only=True)
+class XBootstrapState:
+    home_page: str = field(repr=False)
+    ondemand_file: str = field(repr=False)
+    guest_token: str
+    created_at: datetime = field(default_factory=datetime.now)
+
+    @property
+    def age(self) -> timedelta:
+        return datetime.now() - self.created_at
+
+    @cached_property
+    def transaction_client(self) -> ClientTransaction:
+        return ClientTransaction(BeautifulSoup(self.home_page, "html.parser"), self.ondemand_file)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "home_page": self.home_page,
+                "ondemand_file": self.ondemand_file,
+                "guest_token": self.guest_token,
+                "created_at": self.created_at.isoformat(),
+            }
+        )
+
+    @classmethod
+    def from_json(cls, raw: str, /) -> Self:
+        match json.loads(raw):
+            case {
+                "home_page": str(home_page),
+                "ondemand_file": str(ondemand_file),
+                "guest_token": str(guest_token),
+                "created_at": str(created_at),
+            }:
+                return cls(
+                    home_page=home_page,
+                    ondemand_file=ondemand_file,
+                    guest_token=guest_token,
+                    created_at=datetime.fromisoformat(created_at),
+                )
+            case _:
+                raise ValueError("Invalid raw data format for XBootstrapState")
+
+
+@timed_stage("bootstrap")
+async def fetch_x_bootstrap_state(
+    *,
+    timeout: float | None = None,
+    retries: int | None = None,
+) -> XBootstrapState:
+    async with AsyncClient(
+        headers=generate_headers(),
+        timeout=timeout or DEFAULT_TIMEOUT,
+        transport=AsyncHTTPTransport(
+            retries=retries or DEFAULT_RETRIES,
+        ),
+    ) as client:
+        home_page = await client.get(url="https://x.com")
+        home_page.raise_for_status()
+
+        ondemand_file_url = get_ondemand_file_url(response_to_bs4(home_page))
+        ondemand_file = await client.get(url=ondemand_file_url)
+        ondemand_file.raise_for_status()
+
+        guest_token = await client.post(
+            "https://api.twitter.com/1.1/guest/activate.json",
+            headers={
+                "Authorization": f"Bearer {DEFAULT_BEARER_TOKEN}",
+            },
+        )
+
+        return XBootstrapState(
+            home_page=home_page.text,
+            ondemand_file=ondemand_file.text,
+            guest_token=parse_guest_token(guest_token),
+        )
+
+
+@dataclass(kw_only=True)
+class XBootstrapCache:
+    """Process-wide cache of the state needed to talk to X (transaction client and guest token).
+
+    A state older than ``ttl - refresh_before`` is still served while a background refresh runs,
+    an expired one blocks callers until a fresh state arrives. Concurrent refreshes are coalesced
+    into a single upstream fetch. With ``path`` set the state is persisted so a restarted process
+    starts warm.
+    """
+
+    ttl: timedelta = timedelta(hours=1)
+    refresh_before: timedelta = timedelta(minutes=10)
+    path: Path | None = None
+
+    timeout: float | None = None
+    retries: int | None = None
+
+    _state: XBootstrapState | None = field(init=False, default=None)
+    _loaded: bool = field(init=False, default=False)
+    _refresh_task: asyncio.Task[XBootstrapState] | None = field(init=False, default=None)
+
+    def _load(self) -> XBootstrapState | None:
+        if self.path is None or not self.path.exists():
+            return None
+
+        try:
+            state = XBootstrapState.from_json(self.path.read_text())
+            if state.age >= self.ttl:
+                return None
+
+            _ = state.transaction_client
+        except Exception:
+            logger.warning("Failed to load X bootstrap state from %s", self.path, exc_info=True)
+            return None
+
+        logger.info("Loaded X bootstrap state from %s (age=%s)", self.path, state.age)
+        return state
+
+    def _dump(self, state: XBootstrapState) -> None:
+        if self.path is None:
+            return
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(state.to_json())
+            tmp_path.replace(self.path)
+        except OSError:
+            logger.warning("Failed to persist X bootstrap state to %s", self.path, exc_info=True)
+
+    def _discard(self) -> None:
+        if self.path is None:
+            return
+
+        try:
+            self.path.unlink(missing_ok=True)
+        except OSError:
+            logger.warning("Failed to remove persisted X bootstrap state %s", self.path, exc_info=True)
+
+    async def _fetch(self) -> XBootstrapState:
+        logger.info("Refreshing X bootstrap state")
+
+        state = await fetch_x_bootstrap_state(timeout=self.timeout, retries=self.retries)
+        # parsing the home page is CPU heavy, keep it away from the event loop
+        await asyncio.to_thread(lambda: state.transaction_client)
+
+        self._state = state
+        await asyncio.to_thread(self._dump, state)
+
+        logger.info("X bootstrap state refreshed")
+        return state
+
+    def _on_refresh_done(self, task: asyncio.Task[XBootstrapState]) -> None:
+        self._refresh_task = None
+
+        if not task.cancelled() and (exc := task.exception()):
+            logger.warning("Failed to refresh X bootstrap state", exc_info=exc)
+
+    def _start_refresh(self) -> asyncio.Task[XBootstrapState]:
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._fetch(), name="x-bootstrap-refresh")
+            self._refresh_task.add_done_callback(self._on_refresh_done)
+
+        return self._refresh_task
+
+    async def _get_state(self) -> XBootstrapState | None:
+        if not self._loaded:
+            self._loaded = True
+            self._state = self._state or await asyncio.to_thread(self._load)
+
+        return self._state
+
+    async def get(self) -> XBootstrapState:
+        state = await self._get_state()
+
+        if state is None or state.age >= self.ttl:
+            return await asyncio.shield(self._start_refresh())
+
+        if state.age >= self.ttl - self.refresh_before:
+            self._start_refresh()
+
+        return state
+
+    def invalidate(self) -> None:
+        logger.info("Invalidating X bootstrap state")
+        self._state = None
+        # the persisted state is rejected as well, so a restart does not load it back
+        self._loaded = True
+        self._discard()
+
+    async def __aenter__(self) -> Self:
+        # warm up in background, so the first request does not pay for it
+        if await self._get_state() is None:
+            self._start_refresh()
+
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+
+
+__all__ = [
+    "XBootstrapCache",
+    "XBootstrapState",
+    "fetch_x_bootstrap_state",
+]
@@ -1,20 +1,27 @@
+import logging
 from collections import defaultdict
-from collections.abc import Iterator
+from collections.abc import Iterable, Iterator
 from contextlib import contextmanager
 from dataclasses import dataclass
 
-from httpx import Client, HTTPTransport
+from httpx import Client, HTTPError, HTTPStatusError, HTTPTransport
 from x_client_transaction import ClientTransaction
 from x_client_transaction.utils import generate_headers, get_ondemand_file_url
 
 from ._base import BaseXTwitterThreadDumpClient
-from .browser import html_to_image
+from .browser import html_to_images, media_routes
+from .cache import MediaCache
 from .consts import DEFAULT_BEARER_TOKEN, DEFAULT_RETRIES, DEFAULT_TIMEOUT
 from .entities import Thread, Tweet
+from .images import ImageEncoding, bytes_to_image, encode_screenshot
 from .render import render_thread_html
+from .store import TweetStore
+from .timing import measure_stage
 from .types import BrowserCtxConfig, Img
 from .utils import limited, parse_guest_token, response_to_bs4
 
+logger = logging.getLogger(__name__)
+
 
 def _get_client_transaction_client(
     *,
@@ -59,23 +66,94 @@ class XTwitterThreadDumpClient(BaseXTwitterThreadDumpClient):
         *,
         limit: int | None = None,
     ) -> list[Tweet]:
-        thread = [*limited(self._iter_thread(tweet_id), limit=limit)]
+        with measure_stage("thread_fetch"):
+            thread = [tweet for _, tweet in self.iter_thread(tweet_id, limit=limit)]
+
         thread.reverse()
 
         return thread
 
+    def iter_thread(
+        self,
+        tweet_id: str,
+        *,
+        limit: int | None = None,
+    ) -> Iterator[tuple[int, Tweet]]:
+        """Yield tweets of the thread as soon as they are fetched, from ``tweet_id`` up to the root.
+
+        Each tweet comes with its position counted from ``tweet_id`` (0 for the tweet itself),
+        so the thread in reading order is sorted by descending position.
+        """
+        yield from enumerate(limited(self._iter_thread(tweet_id), limit=limit))
+
     def _get_tweet(self, tweet_id: str, /) -> Tweet:
         response = self.client.get(**self._prepare_get_tweet_request(tweet_id))
         response.raise_for_status()
 
         return Tweet.from_raw_response(response.json())
 
+    def get_tweets(self, tweet_ids: Iterable[str], /) -> dict[str, Tweet]:
+        tweets: dict[str, Tweet] = {}
+        for chunk in self._chunk_tweet_ids(tweet_ids):
+            response = self.client.get(**self._prepare_get_tweets_request(chunk))
+            response.raise_for_status()
+
+            tweets.update((tweet.id, tweet) for tweet in Tweet.many_from_raw_response(response.json()))
+
+        return tweets
+
+    def _get_conversation_chain(self, tweet_id: str, /) -> list[Tweet]:
+        response = self.client.get(**self._prepare_get_tweet_detail_request(tweet_id))
+        response.raise_for_status()
+
+        return self._parse_conversation_chain(response.json(), tweet_id)
+
+    def _get_stored_chain(self, store: TweetStore, tweet_id: str, /) -> list[Tweet]:
+        stored = store.get_chain(tweet_id)
+        if not stored.stale_ids:
+            return stored.tweets
+
+        try:
+            refreshed = self.get_tweets(stored.stale_ids)
+        except (HTTPError, ValueError, KeyError):
+            logger.warning(
+                "Failed to refresh counters of %s stored tweets, serving stale ones",
+                len(stored.stale_ids),
+                exc_info=True,
+            )
+            return stored.tweets
+
+        store.update_counters(refreshed.values())
+        return self._replace_tweets(stored.tweets, refreshed)
+
+    def _fetch_chain(self, tweet_id: str, /) -> list[Tweet]:
+        if self.store is not None and (chain := self._get_stored_chain(self.store, tweet_id)):
+            return chain
+
+        chain = self._fetch_remote_chain(tweet_id)
+        if self.store is not None:
+            self.store.put(chain)
+
+        return chain
+
+    def _fetch_remote_chain(self, tweet_id: str, /) -> list[Tweet]:
+        if self._use_conversation:
+            try:
+                return self._get_conversation_chain(tweet_id)
+            except (HTTPStatusError, ValueError):
+                logger.warning("Failed to fetch conversation of %s, falling back to walking parents", tweet_id)
+                self._conversation_failed = True
+
+        return [self._get_tweet(tweet_id)]
+
     def _iter_thread(self, tweet_id: str, /) -> Iterator[Tweet]:
         node: str | None = tweet_id
         while node:
-            tweet = self._get_tweet(node)
-            yield tweet
-            node = tweet.parent_id
+            chain = self._fetch_chain(node)
+            yield from chain
+
+            # long threads are truncated by X, continue from the first missing ancestor
+            node = chain[-1].parent_id
 
     def thread_to_image(
         self,
@@ -85,17 +163,37 @@ class XTwitterThreadDumpClient(BaseXTwitterThreadDumpClient):
         max_tweet_height: int | None = None,
         config: BrowserCtxConfig | None = None,
     ) -> list[Img]:
-        self.download_previews(thread)
+        screenshots = self.thread_to_image_bytes(
+            thread,
+            tweets_per_image=tweets_per_image,
+            max_tweet_height=max_tweet_height,
+            config=config,
+        )
+
+        return [bytes_to_image(screenshot) for screenshot in screenshots]
 
-        html = render_thread_html(thread)
-        res = html_to_image(html, config=config)
+    def thread_to_image_bytes(
+        self,
+        thread: list[Tweet],
+        *,
+        encoding: ImageEncoding | None = None,
+        tweets_per_image: int | None = None,
+        max_tweet_height: int | None = None,
+        config: BrowserCtxConfig | None = None,
+    ) -> list[bytes]:
+        self.download_previews(thread)
 
-        return self.prepare_result_img(
-            res,
+        html = render_thread_html(thread, inline_media=False)
+        screenshots = html_to_images(
+            html,
+            config=config,
+            media=media_routes(media for tweet in thread for media in tweet.all_preview_media()),
             tweets_per_image=tweets_per_image,
             max_tweet_height=max_tweet_height,
         )
 
+        return [encode_screenshot(screenshot, encoding) for screenshot in screenshots]
+
     def download_previews(self, thread: Thread, /) -> None:
         medias = [media for tweet in thread for media in tweet.all_preview_media() if not media.raw_preview_bytes]
 
@@ -103,16 +201,25 @@ class XTwitterThreadDumpClient(BaseXTwitterThreadDumpClient):
         for media in medias:
             urls[media.preview_url].append(media)
 
-        def _worker(url: str, /) -> None:
+        def _download(url: str, /) -> bytes:
             with self.client.stream("GET", url) as response:
                 response.raise_for_status()
-                content = response.read()
+                return response.read()
+
+        def _worker(url: str, /) -> None:
+            content = self.media_cache.get(url) if self.media_cache is not None else None
+            if content is None:
+                content = _download(url)
+
+                if self.media_cache is not None:
+                    self.media_cache.put(url, content)
 
-                for media in urls[url]:
-                    media.raw_preview_bytes = content
+            for media in urls[url]:
+                media.raw_preview_bytes = content
 
-        for _url in urls:
-            _worker(_url)
+        with measure_stage("preview_download"):
+            for _url in urls:
+                _worker(_url)
 
 
 @contextmanager
@@ -120,6 +227,8 @@ def x_twitter_thread_dump_client(
     *,
     timeout: float | None = None,
     retries: int | None = None,
+    store: TweetStore | None = None,
+    media_cache: MediaCache | None = None,
 ) -> Iterator[XTwitterThreadDumpClient]:
     with Client(
         base_url="https://x.com/",
@@ -144,6 +253,8 @@ def x_twitter_thread_dump_client(
         yield XTwitterThreadDumpClient(
             client=client,
             transaction_client=transaction_client,
+            store=store,
+            media_cache=media_cache,
         )
 
 
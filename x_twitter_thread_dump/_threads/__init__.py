@@ -1,6 +1,7 @@
-from ._async import ThreadsAsyncClient, threads_async_client
+from ._async import ThreadsAsyncClient, create_threads_async_http_client, threads_async_client
 
 __all__ = [
     "ThreadsAsyncClient",
+    "create_threads_async_http_client",
     "threads_async_client",
 ]
@@ -3,15 +3,17 @@ import re
 from asyncio import gather
 from collections import defaultdict
 from collections.abc import AsyncIterator
-from contextlib import asynccontextmanager, suppress
+from contextlib import AsyncExitStack, asynccontextmanager, suppress
 from dataclasses import dataclass
 from typing import Any
 
-from httpx import AsyncClient, AsyncHTTPTransport
+from httpx import AsyncBaseTransport, AsyncClient, AsyncHTTPTransport
 
-from x_twitter_thread_dump._base import BaseXTwitterThreadDumpClient
-from x_twitter_thread_dump.browser import AsyncBrowser, html_to_image_async
+from x_twitter_thread_dump.browser import AsyncBrowser, html_to_images_async, media_routes
+from x_twitter_thread_dump.cache import MediaCache
 from x_twitter_thread_dump.consts import DEFAULT_RETRIES, DEFAULT_TIMEOUT
+from x_twitter_thread_dump.images import ImageEncoding, bytes_to_image, encode_screenshot
+from x_twitter_thread_dump.timing import timed_stage
 from x_twitter_thread_dump.types import BrowserCtxConfig, Img
 
 from .consts import IG_APP_ID, QUERY_VARS
@@ -54,7 +56,9 @@ def _extract_ssr_data(html: str) -> dict[Any, Any] | None:
 @dataclass
 class ThreadsAsyncClient:
     client: AsyncClient
+    media_cache: MediaCache | None = None
 
+    @timed_stage("thread_fetch")
     async def get_thread(
         self,
         post_id: str,
@@ -103,6 +107,24 @@ class ThreadsAsyncClient:
         data = response.json()
         return ThreadPost.thread_from_raw_response(data)
 
+    async def iter_thread(
+        self,
+        post_id: str,
+    ) -> AsyncIterator[tuple[int, ThreadPost]]:
+        """Yield posts of the thread in reading order with their positions counted from ``post_id``.
+
+        Positions match ``XTwitterThreadDumpAsyncClient.iter_thread``: 0 for the post itself,
+        growing toward the root; posts after it (the author's continuation) get negative positions.
+        Threads returns the whole thread in a single response, so posts become available all at once.
+        """
+        thread = await self.get_thread(post_id)
+
+        pk = _shortcode_to_pk(post_id)
+        target = next((i for i, post in enumerate(thread) if post.id.partition("_")[0] == pk), len(thread) - 1)
+
+        for index, post in enumerate(thread):
+            yield target - index, post
+
     async def thread_to_image(
         self,
         thread: list[ThreadPost],
@@ -112,21 +134,41 @@ class ThreadsAsyncClient:
         config: BrowserCtxConfig | None = None,
         browser: AsyncBrowser | None = None,
     ) -> list[Img]:
+        screenshots = await self.thread_to_image_bytes(
+            thread,
+            tweets_per_image=tweets_per_image,
+            max_tweet_height=max_tweet_height,
+            config=config,
+            browser=browser,
+        )
+
+        return [bytes_to_image(screenshot) for screenshot in screenshots]
+
+    async def thread_to_image_bytes(  # noqa: PLR0913
+        self,
+        thread: list[ThreadPost],
+        *,
+        encoding: ImageEncoding | None = None,
+        tweets_per_image: int | None = None,
+        max_tweet_height: int | None = None,
+        config: BrowserCtxConfig | None = None,
+        browser: AsyncBrowser | None = None,
+    ) -> list[bytes]:
         await self.download_previews(thread)
 
-        html = render_thread_html(thread)
-        result = await html_to_image_async(
+        html = render_thread_html(thread, inline_media=False)
+        screenshots = await html_to_images_async(
             html,
             browser=browser,
             config=config,
-        )
-
-        return BaseXTwitterThreadDumpClient.prepare_result_img(
-            result,
+            media=media_routes(media for post in thread for media in post.all_preview_media()),
             tweets_per_image=tweets_per_image,
             max_tweet_height=max_tweet_height,
         )
 
+        return [encode_screenshot(screenshot, encoding) for screenshot in screenshots]
+
+    @timed_stage("preview_download")
     async def download_previews(self, thread: list[ThreadPost], /) -> None:
         medias = [media for tweet in thread for media in tweet.all_preview_media() if not media.raw_preview_bytes]
 
@@ -134,37 +176,64 @@ class ThreadsAsyncClient:
         for media in medias:
             urls[media.preview_url].append(media)
 
-        async def _worker(url: str, /) -> None:
+        async def _download(url: str, /) -> bytes:
             async with self.client.stream("GET", url) as response:
                 response.raise_for_status()
-                content = await response.aread()
+                return await response.aread()
 
-                for media in urls[url]:
-                    media.raw_preview_bytes = content
+        async def _worker(url: str, /) -> None:
+            if self.media_cache is not None:
+                content = await self.media_cache.fetch(url, _download)
+            else:
+                content = await _download(url)
+
+            for media in urls[url]:
+                media.raw_preview_bytes = content
 
         await gather(*[_worker(url) for url in urls])
 
 
-@asynccontextmanager
-async def threads_async_client(
+def create_threads_async_http_client(
     *,
     timeout: float | None = None,
     retries: int | None = None,
     cookies: dict[str, Any] | None = None,
-) -> AsyncIterator[ThreadsAsyncClient]:
-    async with AsyncClient(
+    transport: AsyncBaseTransport | None = None,
+) -> AsyncClient:
+    if transport is None:
+        transport = AsyncHTTPTransport(
+            retries=retries or DEFAULT_RETRIES,
+        )
+
+    return AsyncClient(
         base_url="https://www.threads.com/",
         follow_redirects=True,
         timeout=timeout or DEFAULT_TIMEOUT,
-        transport=AsyncHTTPTransport(
-            retries=retries or DEFAULT_RETRIES,
-        ),
+        transport=transport,
         cookies=cookies,
-    ) as client:
-        yield ThreadsAsyncClient(client=client)
+    )
+
+
+@asynccontextmanager
+async def threads_async_client(
+    *,
+    timeout: float | None = None,
+    retries: int | None = None,
+    cookies: dict[str, Any] | None = None,
+    client: AsyncClient | None = None,
+    media_cache: MediaCache | None = None,
+) -> AsyncIterator[ThreadsAsyncClient]:
+    async with AsyncExitStack() as stack:
+        if client is None:
+            client = await stack.enter_async_context(
+                create_threads_async_http_client(timeout=timeout, retries=retries, cookies=cookies),
+            )
+
+        yield ThreadsAsyncClient(client=client, media_cache=media_cache)
 
 
 __all__ = [
     "ThreadsAsyncClient",
+    "create_threads_async_http_client",
     "threads_async_client",
 ]
@@ -5,6 +5,9 @@ from datetime import datetime
 
 import jinja2
 
+from x_twitter_thread_dump.browser import media_route_url
+from x_twitter_thread_dump.timing import measure_stage
+
 from .entities import ThreadPost
 
 jinja2_env = jinja2.Environment(
@@ -14,6 +17,7 @@ jinja2_env = jinja2.Environment(
     autoescape=jinja2.select_autoescape(["html", "xml"]),
 )
 jinja2_env.filters["b64encode"] = lambda x: base64.b64encode(x).decode("utf-8")
+jinja2_env.filters["media_url"] = media_route_url
 jinja2_env.filters["regex_replace"] = lambda s, pattern, replacement: re.sub(pattern, replacement, s)
 
 
@@ -42,12 +46,16 @@ jinja2_env.filters["timeago"] = _timeago
 
 def render_thread_html(
     thread: list[ThreadPost],
+    *,
+    inline_media: bool = True,
 ) -> str:
     template = jinja2_env.get_template("threads_template.html")
 
-    return template.render(
-        thread=thread,
-    )
+    with measure_stage("template"):
+        return template.render(
+            thread=thread,
+            inline_media=inline_media,
+        )
 
 
 __all__ = [
@@ -1,10 +1,18 @@
-from ._async import TikTokAsyncClient, tiktok_async_client
+from ._async import TikTokAsyncClient, create_tiktok_async_http_client, tiktok_async_client
 from .entities import TikTokComment, TikTokMedia, TikTokUser
+from .index import TikTokCommentIndex
+from .links import SharedComment, ShareLinkCache
+from .ratelimit import AdaptiveRateLimiter
 
 __all__ = [
+    "AdaptiveRateLimiter",
+    "ShareLinkCache",
+    "SharedComment",
     "TikTokAsyncClient",
     "TikTokComment",
+    "TikTokCommentIndex",
     "TikTokMedia",
     "TikTokUser",
+    "create_tiktok_async_http_client",
     "tiktok_async_client",
 ]
@@ -1,53 +1,175 @@
 import asyncio
+import logging
 import re
 from collections import defaultdict
-from collections.abc import AsyncIterator
-from contextlib import asynccontextmanager
-from dataclasses import dataclass
-from typing import Any, cast
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable, Collection, Coroutine, Iterable, Mapping
+from contextlib import AsyncExitStack, aclosing, asynccontextmanager, suppress
+from dataclasses import dataclass, field
+from typing import Any, Self, cast
 from urllib.parse import parse_qs, urlparse
 
-from httpx import AsyncClient, AsyncHTTPTransport, HTTPError
+from httpx import AsyncBaseTransport, AsyncClient, AsyncHTTPTransport, HTTPError
 
-from x_twitter_thread_dump._base import BaseXTwitterThreadDumpClient
-from x_twitter_thread_dump.browser import AsyncBrowser, html_to_image_async
+from x_twitter_thread_dump.browser import AsyncBrowser, html_to_images_async, media_routes
+from x_twitter_thread_dump.cache import MediaCache
 from x_twitter_thread_dump.consts import DEFAULT_RETRIES, DEFAULT_TIMEOUT
+from x_twitter_thread_dump.images import ImageEncoding, bytes_to_image, encode_screenshot
+from x_twitter_thread_dump.timing import timed_stage
 from x_twitter_thread_dump.types import AnyDict, BrowserCtxConfig, Img
 
 from .consts import (
     DEFAULT_USER_AGENT,
     PAGE_SIZE,
+    SCAN_CONCURRENCY,
     SCAN_DELAY,
     TIKTOK_API_PREFIX,
     TIKTOK_WEB_AID,
     TIKWM_API_PREFIX,
-    TIKWM_BACKOFF,
     TIKWM_BASE_URL,
     TIKWM_RETRIES,
 )
 from .entities import TikTokComment
+from .index import IndexedComment, IndexedVideo, TikTokCommentIndex
+from .links import SharedComment, ShareLinkCache
+from .ratelimit import AdaptiveRateLimiter
 from .render import render_comments_html
 
+logger = logging.getLogger(__name__)
+
+
+async def _stream[T](
+    produce: Callable[[Callable[[T], None]], Coroutine[Any, Any, None]],
+    /,
+    *,
+    until: Callable[[], bool] = lambda: False,
+) -> AsyncGenerator[T]:
+    """Run ``produce`` in background and yield every item it emits as soon as it is emitted.
+
+    Stops once ``produce`` is done or ``until()`` holds after all emitted items are yielded,
+    ``produce`` is cancelled when the generator is closed and its failure is raised here.
+    """
+    items: asyncio.Queue[tuple[T] | None] = asyncio.Queue()
+
+    task = asyncio.create_task(produce(lambda item: items.put_nowait((item,))))
+    task.add_done_callback(lambda _: items.put_nowait(None))
+
+    try:
+        while not until() or not items.empty():
+            if (item := await items.get()) is None:
+                break
+
+            yield item[0]
+
+        if task.done() and not task.cancelled() and (exc := task.exception()) is not None:
+            # task groups of ``produce`` may nest, raise the first actual failure
+            while isinstance(exc, BaseExceptionGroup):
+                exc = exc.exceptions[0]
+
+            raise exc
+    finally:
+        task.cancel()
+
+        with suppress(asyncio.CancelledError, Exception):
+            await task
+
+
+@dataclass
+class _Prefetch:
+    """Fills mappings from streams of pages in background, readers wait for the keys they need.
+
+    Streams still running on exit are cancelled.
+    """
+
+    _progress: asyncio.Event = field(init=False, default_factory=asyncio.Event)
+    _streams: list[tuple[Mapping[str, object], asyncio.Task[None]]] = field(init=False, default_factory=list)
+
+    def add[V](self, into: dict[str, V], pages: AsyncIterator[dict[str, V]], /) -> None:
+        async def _fill() -> None:
+            async for page in pages:
+                into.update(page)
+                self._progress.set()
+
+        task = asyncio.create_task(_fill())
+        task.add_done_callback(lambda _: self._progress.set())
+        self._streams.append((into, task))
+
+    async def wait_for(self, key: str, /) -> None:
+        # until every stream either delivered the key or is exhausted
+        while any(key not in known and not task.done() for known, task in self._streams):
+            self._progress.clear()
+            await self._progress.wait()
+
+    def failures(self) -> list[BaseException]:
+        return [exc for _, task in self._streams if not task.cancelled() and (exc := task.exception()) is not None]
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        tasks = [task for _, task in self._streams]
+        for task in tasks:
+            task.cancel()
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _walk_reply_path(
+    comment_id: str,
+    bodies: Mapping[str, AnyDict],
+    parents: Mapping[str, str],
+    wait_for: Callable[[str], Awaitable[None]],
+) -> list[AnyDict]:
+    """Follow ``parents`` from the reply ``comment_id`` up to the top comment, returns replies oldest-first.
+
+    ``wait_for`` is awaited before every step, until the body and the parent of that reply are known.
+    A reply without a known parent answers the top comment, the path ends at a reply without a body.
+    """
+    path: list[AnyDict] = []
+    seen: set[str] = set()
+    current = comment_id
+
+    while current and current != "0" and current not in seen:
+        await wait_for(current)
+        if current not in bodies:
+            break
+
+        seen.add(current)
+        path.append(bodies[current])
+        current = parents.get(current, "0")
+
+    path.reverse()
+    return path
+
 
 @dataclass
 class TikTokAsyncClient:
     client: AsyncClient
+    media_cache: MediaCache | None = None
+    comment_index: TikTokCommentIndex | None = None
+    link_cache: ShareLinkCache | None = None
+    rate_limiter: AdaptiveRateLimiter = field(default_factory=AdaptiveRateLimiter)
+    scan_concurrency: int = SCAN_CONCURRENCY
 
     async def _tikwm(self, path: str, /, **params: str | int) -> AnyDict:
         data: AnyDict = {}
 
-        for attempt in range(TIKWM_RETRIES):
+        for _ in range(TIKWM_RETRIES):
+            await self.rate_limiter.acquire()
+
             response = await self.client.get(f"{TIKWM_API_PREFIX}/{path}/", params=params)
             response.raise_for_status()
 
             data = response.json()
             if data.get("code") == 0:
+                self.rate_limiter.on_success()
                 return cast(AnyDict, data["data"])
 
-            await asyncio.sleep(TIKWM_BACKOFF * (attempt + 1))  # rate-limited; back off
+            # rate-limited, the retry (and every other tikwm call) waits for the slowed down limiter
+            self.rate_limiter.on_rate_limited()
 
         raise RuntimeError(f"tikwm {path} failed: {data!r}")
 
+    @timed_stage("thread_fetch")
     async def resolve_comment(
         self,
         url: str,
@@ -60,41 +182,238 @@ class TikTokAsyncClient:
         that comment.
 
         There is no "fetch comment by id" endpoint, so this pages through the
-        top-level comments and, for any comment that has replies, scans its
-        reply list for the target. The conversation path (which replies actually
+        top-level comments and scans reply lists for the target, see
+        :meth:`_scan_comments`. The conversation path (which replies actually
         answer which) is rebuilt in :meth:`_reply_chain`.
         """
         # 1) resolve the short link -> ids carried in the query string
+        shared = await self._resolve_link(url)
+
+        # 2) scan the video's comments for the target, the scan is stopped once it is found
+        async with aclosing(self._scan_comments(shared.aweme_id, [shared.comment_id])) as hits:
+            hit = await anext(hits, None)
+
+        if hit is None:
+            raise LookupError(f"comment {shared.comment_id} not found on video {shared.aweme_id}")
+
+        return self._mark_creator(await self._comment_chain(shared.aweme_id, hit), shared.creator)
+
+    async def resolve_comments(self, urls: Iterable[str], /) -> AsyncGenerator[tuple[str, list[TikTokComment]]]:
+        """Resolve many shared-comment links, yielding ``(url, chain)`` as soon as each chain is built.
+
+        Links are grouped by video and every video is scanned once for all of
+        its shared comments, see :meth:`resolve_comment` for the chains. Links
+        that can not be resolved, videos whose scan fails and comments that are
+        not found are skipped, the failures are logged.
+        """
+
+        async def _produce(emit: Callable[[tuple[str, list[TikTokComment]]], None], /) -> None:
+            videos: defaultdict[str, defaultdict[str, list[str]]] = defaultdict(lambda: defaultdict(list))
+            creators: dict[str, str] = {}
+
+            for url, shared in (await self._resolve_links(urls)).items():
+                videos[shared.aweme_id][shared.comment_id].append(url)
+                creators[shared.aweme_id] = shared.creator
+
+            async with asyncio.TaskGroup() as tg:
+                for aweme_id, targets in videos.items():
+                    tg.create_task(self._resolve_video(aweme_id, targets, creators[aweme_id], emit))
+
+        async with aclosing(_stream(_produce)) as chains:
+            async for chain in chains:
+                yield chain
+
+    async def _resolve_video(
+        self,
+        aweme_id: str,
+        targets: Mapping[str, list[str]],
+        creator: str,
+        emit: Callable[[tuple[str, list[TikTokComment]]], None],
+        /,
+    ) -> None:
+        """Scan the video once for all ``targets`` (comment id -> links), emitting every chain once built.
+
+        Failures are logged and leave the affected links unresolved, so a failed video
+        does not cancel the other videos of the batch.
+        """
+
+        async def _emit_chain(hit: IndexedComment, /) -> None:
+            try:
+                chain = self._mark_creator(await self._comment_chain(aweme_id, hit), creator)
+            except Exception:
+                logger.warning("Failed to build chain of TikTok comment %s", hit.comment_id, exc_info=True)
+                return
+
+            for url in targets[hit.comment_id]:
+                emit((url, chain))
+
+        # chains of comments found before a failed page are still built
+        async with asyncio.TaskGroup() as tg:
+            try:
+                async with aclosing(self._scan_comments(aweme_id, targets)) as hits:
+                    async for hit in hits:
+                        tg.create_task(_emit_chain(hit))
+            except Exception:
+                logger.warning("Failed to scan comments of TikTok video %s", aweme_id, exc_info=True)
+
+    async def _resolve_link(self, url: str, /) -> SharedComment:
+        if self.link_cache is not None:
+            return await self.link_cache.fetch(url, self._follow_link)
+
+        return await self._follow_link(url)
+
+    async def _follow_link(self, url: str, /) -> SharedComment:
         response = await self.client.head(url, follow_redirects=True)
         resolved_url = str(response.url)
         query = parse_qs(urlparse(resolved_url).query)
-        aweme_id = query["share_item_id"][0]
-        comment_id = query["share_comment_id"][0]
-        creator = self._creator_handle(resolved_url)
 
-        # 2) page top-level comments, scanning replies for the target
-        cursor = 0
-        while True:
-            data = await self._tikwm("comment/list", url=aweme_id, count=PAGE_SIZE, cursor=cursor)
+        return SharedComment(
+            aweme_id=query["share_item_id"][0],
+            comment_id=query["share_comment_id"][0],
+            creator=self._creator_handle(resolved_url),
+        )
 
-            for top in data["comments"]:
-                if top["id"] == comment_id:  # target is a top-level comment
-                    return self._mark_creator([TikTokComment.from_raw_response(top)], creator)
+    async def _resolve_links(self, urls: Iterable[str], /) -> dict[str, SharedComment]:
+        urls = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*(self._resolve_link(url) for url in urls), return_exceptions=True)
 
-                if top.get("reply_total", 0) > 0:
-                    chain = await self._reply_chain(aweme_id, top, comment_id)
-                    if chain is not None:  # target lives in this comment's replies
-                        return self._mark_creator(chain, creator)
+        resolved = {}
+        for url, result in zip(urls, results, strict=True):
+            if isinstance(result, Exception):
+                logger.warning("Failed to resolve TikTok link %s", url, exc_info=result)
+            elif isinstance(result, SharedComment):
+                resolved[url] = result
 
-                    await asyncio.sleep(SCAN_DELAY)
+        return resolved
 
-            if not data.get("hasMore"):
-                break
+    async def _scan_comments(self, aweme_id: str, comment_ids: Collection[str]) -> AsyncGenerator[IndexedComment]:
+        """Yield each of ``comment_ids`` as soon as it is found on the video.
 
-            cursor = data.get("cursor", cursor + PAGE_SIZE)
-            await asyncio.sleep(SCAN_DELAY)
+        Outstanding requests are cancelled once every comment is found,
+        comments that do not exist are not yielded.
+        """
+        remaining = set(comment_ids)
+
+        async def _produce(emit: Callable[[IndexedComment], None], /) -> None:
+            def _found(hit: IndexedComment, /) -> None:
+                if hit.comment_id in remaining:
+                    remaining.discard(hit.comment_id)
+                    emit(hit)
+
+            await self._scan_video(aweme_id, remaining, _found)
+
+        async with aclosing(_stream(_produce, until=lambda: not remaining)) as hits:
+            async for hit in hits:
+                yield hit
+
+    async def _resume_scan(
+        self,
+        aweme_id: str,
+        remaining: set[str],
+        found: Callable[[IndexedComment], None],
+        *,
+        resume: bool,
+    ) -> IndexedVideo | None:
+        """Report comments already indexed and return where the previous scan of the video stopped."""
+        if self.comment_index is None:
+            return None
+
+        if resume:
+            for hit in await asyncio.to_thread(self.comment_index.lookup, aweme_id, remaining):
+                found(hit)
+
+            if not remaining:
+                return None
+            if (video := await asyncio.to_thread(self.comment_index.get_video, aweme_id)) is not None:
+                return video
+
+        await asyncio.to_thread(self.comment_index.reset, aweme_id)
+        return None
 
-        raise LookupError(f"comment {comment_id} not found on video {aweme_id}")
+    async def _scan_video(
+        self,
+        aweme_id: str,
+        remaining: set[str],
+        found: Callable[[IndexedComment], None],
+        *,
+        resume: bool = True,
+    ) -> None:
+        """Page top-level comments, scanning reply lists of the comments seen so far meanwhile.
+
+        At most ``scan_concurrency`` reply lists are scanned at once, the next
+        top-level page is not fetched while all of them are busy. With a comment
+        index the scan continues where the previous scan of the video stopped,
+        and starts over when that misses a comment (e.g. posted since then).
+        """
+        video = await self._resume_scan(aweme_id, remaining, found, resume=resume)
+        if not remaining:
+            return
+
+        slots = asyncio.Semaphore(self.scan_concurrency)
+
+        async def _scan_replies(top: AnyDict, /) -> None:
+            try:
+                await self._scan_reply_pages(aweme_id, top, remaining, found)
+            finally:
+                slots.release()
+
+        async def _visit(tg: asyncio.TaskGroup, tops: list[AnyDict], /) -> None:
+            for top in tops:
+                found(IndexedComment(comment_id=top["id"], top=top))
+
+                if remaining and top.get("reply_total", 0) > 0:
+                    await slots.acquire()
+                    tg.create_task(_scan_replies(top))
+
+        cursor, has_more = (video.cursor, video.has_more) if video is not None else (0, True)
+
+        async with asyncio.TaskGroup() as tg:
+            await _visit(tg, video.pending if video is not None else [])
+
+            while remaining and has_more:
+                tops, cursor, has_more = await self._comment_page(aweme_id, cursor)
+                await _visit(tg, tops)
+
+        if remaining and video is not None and video.cursor > 0:
+            await self._scan_video(aweme_id, remaining, found, resume=False)
+
+    async def _scan_reply_pages(
+        self,
+        aweme_id: str,
+        top: AnyDict,
+        remaining: set[str],
+        found: Callable[[IndexedComment], None],
+    ) -> None:
+        replies: list[AnyDict] = []
+
+        async with aclosing(self._reply_pages(aweme_id, top["id"])) as pages:
+            async for page, cursor, has_more in pages:
+                replies.extend(page)
+
+                for reply in page:
+                    if reply["id"] in remaining:
+                        # the chain is built while its remaining reply pages are still fetched
+                        found(
+                            IndexedComment(
+                                comment_id=reply["id"],
+                                top=top,
+                                replies=list(replies),
+                                replies_cursor=cursor if has_more else None,
+                            )
+                        )
+
+                if not remaining and has_more:
+                    return  # the rest of the replies is fetched while the chain is built
+
+        # only complete reply lists are indexed
+        if self.comment_index is not None:
+            await asyncio.to_thread(self.comment_index.put_replies, aweme_id, top["id"], replies)
+
+    async def _comment_chain(self, aweme_id: str, hit: IndexedComment, /) -> list[TikTokComment]:
+        if hit.replies is None:  # target is a top-level comment
+            return [TikTokComment.from_raw_response(hit.top)]
+
+        return await self._reply_chain(aweme_id, hit)
 
     @staticmethod
     def _creator_handle(resolved_url: str) -> str:
@@ -112,68 +431,94 @@ class TikTokAsyncClient:
             comment.is_creator = bool(creator) and comment.user.unique_id == creator
         return chain
 
-    async def _reply_chain(
+    async def _comment_page(self, aweme_id: str, cursor: int) -> tuple[list[AnyDict], int, bool]:
+        data = await self._tikwm("comment/list", url=aweme_id, count=PAGE_SIZE, cursor=cursor)
+        comments: list[AnyDict] = data["comments"]
+        cursor, has_more = data.get("cursor", cursor + PAGE_SIZE), bool(data.get("hasMore"))
+
+        if self.comment_index is not None:
+            await asyncio.to_thread(self.comment_index.put_page, aweme_id, comments, cursor=cursor, has_more=has_more)
+
+        return comments, cursor, has_more
+
+    async def _reply_pages(
         self,
         aweme_id: str,
-        top: AnyDict,
         comment_id: str,
-    ) -> list[TikTokComment] | None:
-        """Build the concrete conversation chain ending at the shared reply.
-
-        Returns ``[top, ...replies on the reply-to-reply path]`` oldest-first, or
-        ``None`` when the target is not among ``top``'s replies. tikwm gives the
-        reply bodies but no threading, so the path is rebuilt from TikTok's own
-        web API (``reply_to_reply_id``). If that lookup yields nothing the chain
-        degrades to just the top comment and the shared reply.
-        """
-        cursor = 0
-        raw_replies: list[AnyDict] = []
+        *,
+        cursor: int = 0,
+    ) -> AsyncGenerator[tuple[list[AnyDict], int, bool]]:
+        """Yield ``(replies, next cursor, has more)`` for every tikwm reply page of ``comment_id``."""
         while True:
             data = await self._tikwm(
                 "comment/reply",
                 video_id=aweme_id,
-                comment_id=top["id"],
+                comment_id=comment_id,
                 count=PAGE_SIZE,
                 cursor=cursor,
             )
-            raw_replies.extend(data["comments"])
+            cursor, has_more = data.get("cursor", cursor + PAGE_SIZE), bool(data.get("hasMore"))
 
-            if not data.get("hasMore"):
-                break
+            yield data["comments"], cursor, has_more
 
-            cursor = data.get("cursor", cursor + PAGE_SIZE)
-            await asyncio.sleep(SCAN_DELAY)
+            if not has_more:
+                return
 
-        by_id = {reply["id"]: reply for reply in raw_replies}
-        if comment_id not in by_id:
-            return None
+    async def _reply_chain(self, aweme_id: str, hit: IndexedComment, /) -> list[TikTokComment]:
+        """Build the concrete conversation chain ending at the shared reply.
+
+        Returns ``[top, ...replies on the reply-to-reply path]`` oldest-first.
+        tikwm gives the reply bodies but no threading, so the path is rebuilt
+        from TikTok's own web API (``reply_to_reply_id``). The web API pages and
+        the tikwm reply pages the scan has not fetched yet are streamed
+        concurrently, the path is followed as soon as the pages it needs arrive
+        and both streams are stopped once it reaches the top comment. If the
+        web API yields nothing the chain degrades to just the top comment and
+        the shared reply.
+        """
+        top_id = hit.top["id"]
+        bodies = {reply["id"]: reply for reply in hit.replies or []}
+        # `parents` maps a reply id to the id it answers ("0" == the top comment)
+        parents = await self._indexed_reply_parents(aweme_id, top_id)
+        fetch_parents = hit.comment_id not in parents
+
+        async with _Prefetch() as prefetch:
+            if hit.replies_cursor is not None:
+                prefetch.add(bodies, self._reply_bodies(aweme_id, top_id, cursor=hit.replies_cursor))
+            if fetch_parents:
+                prefetch.add(parents, self._reply_parents(aweme_id, top_id))
+
+            path = await _walk_reply_path(hit.comment_id, bodies, parents, prefetch.wait_for)
 
-        # `parents` maps a reply id to the id it answers ("0" == the top comment).
-        # Walk it from the shared reply up to the root, then reverse to oldest-first.
-        parents = await self._reply_parents(aweme_id, top["id"])
+        for exc in prefetch.failures():
+            logger.warning("Failed to fetch replies of TikTok comment %s", top_id, exc_info=exc)
 
-        path: list[AnyDict] = []
-        seen: set[str] = set()
-        current = comment_id
-        while current and current != "0" and current in by_id and current not in seen:
-            seen.add(current)
-            path.append(by_id[current])
-            current = parents.get(current, "0")
-        path.reverse()
+        if self.comment_index is not None and fetch_parents:
+            await asyncio.to_thread(self.comment_index.put_parents, aweme_id, parents)
 
         return [
-            TikTokComment.from_raw_response(top),
+            TikTokComment.from_raw_response(hit.top),
             *(TikTokComment.from_raw_response(reply) for reply in path),
         ]
 
-    async def _reply_parents(self, aweme_id: str, comment_id: str) -> dict[str, str]:
-        """Map each reply id to the id it answers (``"0"`` for the top comment).
+    async def _indexed_reply_parents(self, aweme_id: str, top_id: str) -> dict[str, str]:
+        if self.comment_index is None:
+            return {}
+
+        return await asyncio.to_thread(self.comment_index.get_parents, aweme_id, top_id)
+
+    async def _reply_bodies(self, aweme_id: str, comment_id: str, *, cursor: int) -> AsyncGenerator[dict[str, AnyDict]]:
+        async with aclosing(self._reply_pages(aweme_id, comment_id, cursor=cursor)) as pages:
+            async for page, *_ in pages:
+                yield {reply["id"]: reply for reply in page}
+
+    async def _reply_parents(self, aweme_id: str, comment_id: str) -> AsyncGenerator[dict[str, str]]:
+        """Yield pages mapping reply ids to the id they answer (``"0"`` for the top comment).
 
         Uses TikTok's web API, the only source that exposes ``reply_to_reply_id``.
-        Best-effort: returns whatever it managed to collect, so a failed or
-        partial fetch lets the caller fall back gracefully.
+        Best-effort: stops at the first failed page, so a failed or partial
+        fetch lets the caller fall back gracefully.
         """
-        parents: dict[str, str] = {}
         cursor = 0
         while True:
             try:
@@ -190,19 +535,18 @@ class TikTokAsyncClient:
                 response.raise_for_status()
                 data = response.json()
             except (HTTPError, ValueError):
-                break
+                return
 
-            for reply in data.get("comments") or []:
-                parents[str(reply["cid"])] = str(reply.get("reply_to_reply_id") or "0")
+            yield {
+                str(reply["cid"]): str(reply.get("reply_to_reply_id") or "0") for reply in data.get("comments") or []
+            }
 
             if not data.get("has_more"):
-                break
+                return
 
             cursor = data.get("cursor", cursor + PAGE_SIZE)
             await asyncio.sleep(SCAN_DELAY)
 
-        return parents
-
     async def comment_to_image(
         self,
         comments: list[TikTokComment],
@@ -212,21 +556,41 @@ class TikTokAsyncClient:
         config: BrowserCtxConfig | None = None,
         browser: AsyncBrowser | None = None,
     ) -> list[Img]:
+        screenshots = await self.comment_to_image_bytes(
+            comments,
+            tweets_per_image=tweets_per_image,
+            max_tweet_height=max_tweet_height,
+            config=config,
+            browser=browser,
+        )
+
+        return [bytes_to_image(screenshot) for screenshot in screenshots]
+
+    async def comment_to_image_bytes(  # noqa: PLR0913
+        self,
+        comments: list[TikTokComment],
+        *,
+        encoding: ImageEncoding | None = None,
+        tweets_per_image: int | None = None,
+        max_tweet_height: int | None = None,
+        config: BrowserCtxConfig | None = None,
+        browser: AsyncBrowser | None = None,
+    ) -> list[bytes]:
         await self.download_previews(comments)
 
-        html = render_comments_html(comments)
-        result = await html_to_image_async(
+        html = render_comments_html(comments, inline_media=False)
+        screenshots = await html_to_images_async(
             html,
             browser=browser,
             config=config,
-        )
-
-        return BaseXTwitterThreadDumpClient.prepare_result_img(
-            result,
+            media=media_routes(media for comment in comments for media in comment.all_preview_media()),
             tweets_per_image=tweets_per_image,
             max_tweet_height=max_tweet_height,
         )
 
+        return [encode_screenshot(screenshot, encoding) for screenshot in screenshots]
+
+    @timed_stage("preview_download")
     async def download_previews(self, comments: list[TikTokComment], /) -> None:
         medias = [media for comment in comments for media in comment.all_preview_media() if not media.raw_preview_bytes]
 
@@ -234,38 +598,76 @@ class TikTokAsyncClient:
         for media in medias:
             urls[media.preview_url].append(media)
 
-        async def _worker(url: str, /) -> None:
+        async def _download(url: str, /) -> bytes:
             async with self.client.stream("GET", url) as response:
                 response.raise_for_status()
-                content = await response.aread()
+                return await response.aread()
 
-                for media in urls[url]:
-                    media.raw_preview_bytes = content
+        async def _worker(url: str, /) -> None:
+            if self.media_cache is not None:
+                content = await self.media_cache.fetch(url, _download)
+            else:
+                content = await _download(url)
+
+            for media in urls[url]:
+                media.raw_preview_bytes = content
 
         await asyncio.gather(*[_worker(url) for url in urls])
 
 
-@asynccontextmanager
-async def tiktok_async_client(
+def create_tiktok_async_http_client(
     *,
     timeout: float | None = None,
     retries: int | None = None,
     cookies: dict[str, Any] | None = None,
-) -> AsyncIterator[TikTokAsyncClient]:
-    async with AsyncClient(
+    transport: AsyncBaseTransport | None = None,
+) -> AsyncClient:
+    if transport is None:
+        transport = AsyncHTTPTransport(
+            retries=retries or DEFAULT_RETRIES,
+        )
+
+    return AsyncClient(
         base_url=TIKWM_BASE_URL,
         follow_redirects=True,
         headers={"User-Agent": DEFAULT_USER_AGENT},
         timeout=timeout or DEFAULT_TIMEOUT,
-        transport=AsyncHTTPTransport(
-            retries=retries or DEFAULT_RETRIES,
-        ),
+        transport=transport,
         cookies=cookies,
-    ) as client:
-        yield TikTokAsyncClient(client=client)
+    )
+
+
+@asynccontextmanager
+async def tiktok_async_client(  # noqa: PLR0913
+    *,
+    timeout: float | None = None,
+    retries: int | None = None,
+    cookies: dict[str, Any] | None = None,
+    client: AsyncClient | None = None,
+    media_cache: MediaCache | None = None,
+    comment_index: TikTokCommentIndex | None = None,
+    link_cache: ShareLinkCache | None = None,
+    rate_limiter: AdaptiveRateLimiter | None = None,
+    scan_concurrency: int | None = None,
+) -> AsyncIterator[TikTokAsyncClient]:
+    async with AsyncExitStack() as stack:
+        if client is None:
+            client = await stack.enter_async_context(
+                create_tiktok_async_http_client(timeout=timeout, retries=retries, cookies=cookies),
+            )
+
+        yield TikTokAsyncClient(
+            client=client,
+            media_cache=media_cache,
+            comment_index=comment_index,
+            link_cache=link_cache,
+            rate_limiter=rate_limiter or AdaptiveRateLimiter(),
+            scan_concurrency=scan_concurrency or SCAN_CONCURRENCY,
+        )
 
 
 __all__ = [
     "TikTokAsyncClient",
+    "create_tiktok_async_http_client",
     "tiktok_async_client",
 ]
@@ -10,11 +10,17 @@ TIKTOK_WEB_AID = 1988
 DEFAULT_USER_AGENT = "Mozilla/5.0"
 
 # tikwm rate-limits aggressively and returns a non-zero ``code`` when hit too
-# fast, so api calls are retried with a linear backoff.
+# fast. Requests share a token bucket (requests per second) that slows down on
+# such responses and recovers on successful ones, failed calls are retried.
 TIKWM_RETRIES = 4
-TIKWM_BACKOFF = 1.5
+TIKWM_RATE = 2.0
+TIKWM_MIN_RATE = 0.25
+TIKWM_BURST = 2
 
-# polite delay between the (linear) scan requests while looking for a comment.
+# number of reply lists scanned at once while looking for a comment.
+SCAN_CONCURRENCY = 4
+
+# polite delay between TikTok web API requests.
 SCAN_DELAY = 1.0
 
 # page size used for the comment list / reply endpoints.
@@ -24,11 +30,14 @@ PAGE_SIZE = 30
 __all__ = [
     "DEFAULT_USER_AGENT",
     "PAGE_SIZE",
+    "SCAN_CONCURRENCY",
     "SCAN_DELAY",
     "TIKTOK_API_PREFIX",
     "TIKTOK_WEB_AID",
     "TIKWM_API_PREFIX",
-    "TIKWM_BACKOFF",
     "TIKWM_BASE_URL",
+    "TIKWM_BURST",
+    "TIKWM_MIN_RATE",
+    "TIKWM_RATE",
     "TIKWM_RETRIES",
 ]
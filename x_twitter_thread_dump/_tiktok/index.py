@@ -0,0 +1,278 @@
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Collection, Iterable, Mapping
+from dataclasses import dataclass, field
+from datetime import timedelta
+from pathlib import Path
+from typing import Self
+
+from x_twitter_thread_dump.types import AnyDict
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    aweme_id TEXT PRIMARY KEY,
+    cursor INTEGER NOT NULL,
+    has_more INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS comments (
+    aweme_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    top_id TEXT NOT NULL,
+    raw_data TEXT NOT NULL,
+    reply_total INTEGER NOT NULL DEFAULT 0,
+    replies_indexed INTEGER NOT NULL DEFAULT 0,
+    parent_id TEXT,
+    PRIMARY KEY (aweme_id, id)
+);
+CREATE INDEX IF NOT EXISTS comments_top_id ON comments (aweme_id, top_id);
+"""
+
+_SELECT_VIDEO = """
+SELECT cursor, has_more FROM videos WHERE aweme_id = :aweme_id AND indexed_at >= :indexed_after
+"""
+
+_SELECT_PENDING = """
+SELECT raw_data FROM comments
+WHERE aweme_id = :aweme_id AND id = top_id AND reply_total > 0 AND NOT replies_indexed
+"""
+
+_SELECT_PARENTS = """
+SELECT id, parent_id FROM comments
+WHERE aweme_id = :aweme_id AND top_id = :top_id AND id != top_id AND parent_id IS NOT NULL
+"""
+
+_UPSERT_COMMENT = """
+INSERT INTO comments (aweme_id, id, top_id, raw_data, reply_total)
+VALUES (:aweme_id, :id, :top_id, :raw_data, :reply_total)
+ON CONFLICT (aweme_id, id) DO UPDATE SET
+    top_id = excluded.top_id,
+    raw_data = excluded.raw_data,
+    reply_total = excluded.reply_total
+"""
+
+# newest first, with the number of comments indexed for each video
+_SELECT_VIDEO_SIZES = """
+SELECT videos.aweme_id, videos.indexed_at, COUNT(comments.id) FROM videos
+LEFT JOIN comments USING (aweme_id)
+GROUP BY videos.aweme_id
+ORDER BY videos.indexed_at DESC
+"""
+
+# concurrent scans of the same video may finish pages out of order, the cursor only moves forward
+_ADVANCE_CURSOR = """
+UPDATE videos SET cursor = :cursor, has_more = :has_more WHERE aweme_id = :aweme_id AND cursor < :cursor
+"""
+
+
+@dataclass(frozen=True, kw_only=True)
+class IndexedComment:
+    comment_id: str
+    top: AnyDict
+    replies: list[AnyDict] | None = None  # replies of ``top`` so far, ``None`` when the comment is ``top`` itself
+    replies_cursor: int | None = None  # where the rest of ``replies`` starts, ``None`` when they are complete
+
+
+@dataclass(frozen=True, kw_only=True)
+class IndexedVideo:
+    cursor: int  # next top-level page to fetch
+    has_more: bool
+    pending: list[AnyDict] = field(default_factory=list)  # top-level comments whose replies are not indexed yet
+
+
+@dataclass(kw_only=True)
+class TikTokCommentIndex:
+    """Local SQLite index of scanned TikTok comments, so lookups on the same video do not rescan it.
+
+    Keeps raw comments with their top-level comment, reply parents and how far the top-level
+    pages were scanned. Everything indexed for a video expires ``ttl`` after its scan started.
+
+    Expired videos are pruned every ``prune_every`` started scans, keeping at most ``max_videos``
+    most recently scanned videos and ``max_comments`` comments of them.
+    """
+
+    path: Path | str = ":memory:"
+    ttl: timedelta = timedelta(minutes=30)
+    max_videos: int = 500
+    max_comments: int = 50_000
+    prune_every: int = 20
+
+    _conn: sqlite3.Connection = field(init=False, repr=False)
+    _lock: threading.Lock = field(init=False, repr=False, default_factory=threading.Lock)
+    _resets: int = field(init=False, repr=False, default=0)
+
+    def __post_init__(self) -> None:
+        if isinstance(self.path, Path):
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # index is shared between event loop and worker threads, access is serialized by the lock
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _indexed_after(self) -> float:
+        return time.time() - self.ttl.total_seconds()
+
+    def get_video(self, aweme_id: str, /) -> IndexedVideo | None:
+        with self._lock:
+            row = self._conn.execute(
+                _SELECT_VIDEO,
+                {"aweme_id": aweme_id, "indexed_after": self._indexed_after()},
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            pending = self._conn.execute(_SELECT_PENDING, {"aweme_id": aweme_id}).fetchall()
+
+        cursor, has_more = row
+        return IndexedVideo(
+            cursor=cursor,
+            has_more=bool(has_more),
+            pending=[json.loads(raw_data) for (raw_data,) in pending],
+        )
+
+    def lookup(self, aweme_id: str, comment_ids: Collection[str], /) -> list[IndexedComment]:
+        if not comment_ids or self.get_video(aweme_id) is None:
+            return []
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, top_id FROM comments WHERE aweme_id = ? AND id IN ({', '.join('?' * len(comment_ids))})",  # noqa: S608
+                (aweme_id, *comment_ids),
+            ).fetchall()
+
+            threads = {
+                top_id: self._conn.execute(
+                    "SELECT id, raw_data FROM comments WHERE aweme_id = ? AND top_id = ?",
+                    (aweme_id, top_id),
+                ).fetchall()
+                for top_id in {top_id for _, top_id in rows}
+            }
+
+        found = []
+        for comment_id, top_id in rows:
+            thread = {id_: json.loads(raw_data) for id_, raw_data in threads[top_id]}
+            top = thread.pop(top_id)
+
+            found.append(
+                IndexedComment(
+                    comment_id=comment_id,
+                    top=top,
+                    replies=None if comment_id == top_id else list(thread.values()),
+                )
+            )
+
+        return found
+
+    def get_parents(self, aweme_id: str, top_id: str, /) -> dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute(_SELECT_PARENTS, {"aweme_id": aweme_id, "top_id": top_id}).fetchall()
+
+        return dict(rows)
+
+    def reset(self, aweme_id: str, /) -> None:
+        """Drop everything indexed for the video, a new scan starts from its first page."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM comments WHERE aweme_id = ?", (aweme_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO videos (aweme_id, cursor, has_more, indexed_at) VALUES (?, 0, 1, ?)",
+                (aweme_id, time.time()),
+            )
+
+            self._resets += 1
+            if self._resets >= self.prune_every:
+                self._prune()
+
+    def put_page(self, aweme_id: str, comments: Iterable[AnyDict], /, *, cursor: int, has_more: bool) -> None:
+        rows = [
+            {
+                "aweme_id": aweme_id,
+                "id": comment["id"],
+                "top_id": comment["id"],
+                "raw_data": json.dumps(comment),
+                "reply_total": comment.get("reply_total", 0),
+            }
+            for comment in comments
+        ]
+
+        with self._lock, self._conn:
+            self._conn.executemany(_UPSERT_COMMENT, rows)
+            self._conn.execute(_ADVANCE_CURSOR, {"aweme_id": aweme_id, "cursor": cursor, "has_more": has_more})
+
+    def put_replies(self, aweme_id: str, top_id: str, replies: Iterable[AnyDict], /) -> None:
+        rows = [
+            {
+                "aweme_id": aweme_id,
+                "id": reply["id"],
+                "top_id": top_id,
+                "raw_data": json.dumps(reply),
+                "reply_total": 0,
+            }
+            for reply in replies
+        ]
+
+        with self._lock, self._conn:
+            self._conn.executemany(_UPSERT_COMMENT, rows)
+            self._conn.execute(
+                "UPDATE comments SET replies_indexed = 1 WHERE aweme_id = ? AND id = ?",
+                (aweme_id, top_id),
+            )
+
+    def put_parents(self, aweme_id: str, parents: Mapping[str, str], /) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE comments SET parent_id = ? WHERE aweme_id = ? AND id = ?",
+                [(parent_id, aweme_id, reply_id) for reply_id, parent_id in parents.items()],
+            )
+
+    def _prune(self) -> int:
+        indexed_after = self._indexed_after()
+        videos = comments = 0
+        dropped = []
+
+        for aweme_id, indexed_at, size in self._conn.execute(_SELECT_VIDEO_SIZES).fetchall():
+            # the most recently scanned video is kept whatever its size, it is likely being scanned now
+            if (
+                indexed_at < indexed_after
+                or videos >= self.max_videos
+                or (videos and comments + size > self.max_comments)
+            ):
+                dropped.append((aweme_id,))
+            else:
+                videos += 1
+                comments += size
+
+        self._conn.executemany("DELETE FROM videos WHERE aweme_id = ?", dropped)
+        self._conn.executemany("DELETE FROM comments WHERE aweme_id = ?", dropped)
+        # pages written by scans whose video was pruned meanwhile
+        self._conn.execute("DELETE FROM comments WHERE aweme_id NOT IN (SELECT aweme_id FROM videos)")
+
+        self._resets = 0
+        return len(dropped)
+
+    def prune(self) -> int:
+        """Drop expired videos and the oldest ones over the limits, returns the number of dropped videos."""
+        with self._lock, self._conn:
+            return self._prune()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> Self:
+        self.prune()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+
+__all__ = [
+    "IndexedComment",
+    "IndexedVideo",
+    "TikTokCommentIndex",
+]
@@ -0,0 +1,83 @@
+import hashlib
+import json
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+from functools import partial
+from pathlib import Path
+
+from x_twitter_thread_dump.cache import CacheStats, TieredCache
+
+
+@dataclass(frozen=True, kw_only=True)
+class SharedComment:
+    aweme_id: str
+    comment_id: str
+    creator: str  # ``unique_id`` of the video author
+
+
+def _link_key(url: str, /) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def _dump_link(shared: SharedComment, /) -> bytes:
+    return json.dumps(asdict(shared)).encode()
+
+
+def _load_link(_: str, data: bytes, /) -> SharedComment:
+    try:
+        return SharedComment(**json.loads(data))
+    except TypeError as e:
+        raise ValueError("Invalid share link cache entry") from e
+
+
+@dataclass(kw_only=True)
+class ShareLinkCache:
+    """Shared cache of resolved TikTok share links (video, comment and creator a short link points to).
+
+    At most ``max_size`` links are kept in memory, least recently used are evicted first. With ``path``
+    set links are also stored on disk, bounded by ``max_disk_bytes``, oldest files are removed first.
+    Links expire ``ttl`` after they were resolved. Concurrent lookups of the same link share one resolution.
+    """
+
+    max_size: int = 10_000
+    ttl: timedelta = timedelta(days=1)
+    path: Path | None = None
+    max_disk_bytes: int = 64 * 1024 * 1024
+
+    _links: TieredCache[SharedComment] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._links = TieredCache(
+            max_size=self.max_size,
+            path=self.path,
+            max_disk_bytes=self.max_disk_bytes,
+            ttl=self.ttl,
+            dump=_dump_link,
+            load=_load_link,
+        )
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._links.stats
+
+    def __len__(self) -> int:
+        return len(self._links)
+
+    def get(self, url: str, /) -> SharedComment | None:
+        return self._links.get(_link_key(url))
+
+    def put(self, url: str, shared: SharedComment, /) -> None:
+        self._links.put(_link_key(url), shared)
+
+    async def fetch(self, url: str, resolve: Callable[[str], Awaitable[SharedComment]], /) -> SharedComment:
+        return await self._links.fetch(_link_key(url), partial(resolve, url))
+
+    def clear(self) -> None:
+        self._links.clear()
+
+
+__all__ = [
+    "ShareLinkCache",
+    "SharedComment",
+]
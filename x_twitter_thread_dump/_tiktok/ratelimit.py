@@ -0,0 +1,61 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+from .consts import TIKWM_BURST, TIKWM_MIN_RATE, TIKWM_RATE
+
+
+@dataclass(kw_only=True)
+class AdaptiveRateLimiter:
+    """Token bucket whose refill rate adapts to the upstream.
+
+    A rate-limited response halves the rate (down to ``min_rate``) and drains the bucket,
+    every successful request recovers ``recovery`` of ``rate`` back.
+    """
+
+    rate: float = TIKWM_RATE  # requests per second
+    burst: int = TIKWM_BURST
+    min_rate: float = TIKWM_MIN_RATE
+    recovery: float = 0.1
+
+    _current_rate: float = field(init=False)
+    _tokens: float = field(init=False)
+    _updated_at: float = field(init=False, default_factory=time.monotonic)
+    _lock: asyncio.Lock = field(init=False, default_factory=asyncio.Lock)
+
+    def __post_init__(self) -> None:
+        self._current_rate = self.rate
+        self._tokens = float(self.burst)
+
+    @property
+    def current_rate(self) -> float:
+        return self._current_rate
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated_at) * self._current_rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        # waiters are served one at a time in arrival order
+        async with self._lock:
+            self._refill()
+
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._current_rate)
+                self._refill()
+
+            self._tokens -= 1
+
+    def on_success(self) -> None:
+        self._current_rate = min(self.rate, self._current_rate + self.rate * self.recovery)
+
+    def on_rate_limited(self) -> None:
+        self._refill()
+        self._current_rate = max(self.min_rate, self._current_rate / 2)
+        self._tokens = min(self._tokens, 0.0)
+
+
+__all__ = [
+    "AdaptiveRateLimiter",
+]
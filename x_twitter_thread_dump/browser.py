@@ -1,17 +1,26 @@
+import hashlib
+import json
 import math
 from asyncio import gather
-from collections.abc import AsyncIterator, Iterator
-from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager
-from dataclasses import dataclass
-from typing import Any, Literal, cast
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterable, Iterator, Mapping
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager, suppress
+from dataclasses import dataclass, field
+from typing import Any, Literal
 
 from playwright.async_api import Browser as AsyncBrowser
-from playwright.async_api import async_playwright
+from playwright.async_api import Error as AsyncPlaywrightError
+from playwright.async_api import FloatRect, async_playwright
+from playwright.async_api import Page as AsyncPage
+from playwright.async_api import Route as AsyncRoute
 from playwright.sync_api import Browser as SyncBrowser
+from playwright.sync_api import Page as SyncPage
+from playwright.sync_api import Route as SyncRoute
 from playwright.sync_api import sync_playwright
 
-from .images import bytes_to_image
-from .types import BrowserCtxConfig, ClientBoundingRect, Img, Viewport
+from .images import bytes_to_image, chunk_rects, get_max_chunk_height
+from .timing import measure_stage
+from .types import BrowserCtxConfig, ClientBoundingRect, Img, PreviewMedia, Viewport
 
 DEFAULT_CONFIG: BrowserCtxConfig = {
     "color_scheme": "dark",
@@ -154,9 +163,30 @@ BROWSER_RUN_ARGS = [
 ]
 
 
-def _get_ctx_config(config: BrowserCtxConfig | None = None) -> BrowserCtxConfig:
+# reserved tld, such urls never reach the network and are only served by the route handler
+MEDIA_ROUTE_ORIGIN = "https://media.invalid"
+
+
+def media_route_url(preview_url: str, /) -> str:
+    return f"{MEDIA_ROUTE_ORIGIN}/{hashlib.sha256(preview_url.encode()).hexdigest()}"
+
+
+def media_routes(medias: Iterable[PreviewMedia], /) -> dict[str, bytes]:
+    return {media_route_url(media.preview_url): media.raw_preview_bytes for media in medias if media.raw_preview_bytes}
+
+
+def _get_ctx_config(
+    config: BrowserCtxConfig | None = None,
+    *,
+    media: Mapping[str, bytes] | None = None,
+) -> BrowserCtxConfig:
     config = DEFAULT_CONFIG | (config or {})
 
+    if media is not None:
+        # offline mode fails requests before they can be intercepted,
+        # the route handler aborts everything it does not serve instead
+        config["offline"] = False
+
     if not config.get("is_mobile"):
         config.pop("is_mobile", None)
         config.pop("has_touch", None)
@@ -209,12 +239,26 @@ class HTMLToImageResult:
     rects: list[ClientBoundingRect]
     scale: float
 
+    # encoded screenshot, lets the result be sent to another process without decoding the image first
+    screenshot: bytes | None = field(default=None, repr=False)
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        if self.screenshot is not None:
+            del state["img"]
+
+        return state
 
-def _get_scale(*, mobile: bool) -> float:
-    if not mobile:
-        return 1.0
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        if "img" not in state:
+            state["img"] = bytes_to_image(state["screenshot"])
 
-    return cast(int, DEFAULT_CONFIG["device_scale_factor"])
+        self.__dict__.update(state)
+
+
+def _get_scale(config: BrowserCtxConfig, /) -> float:
+    # device_scale_factor is dropped from non-mobile configs, so playwright default of 1 is used
+    return float(config.get("device_scale_factor", 1.0))
 
 
 def _normalize_reacts(
@@ -240,6 +284,37 @@ def _normalize_reacts(
     ]
 
 
+_GET_RECTS_JS = "(items) => items.map(el => el.getBoundingClientRect())"
+
+
+def _chunk_clips(
+    container: dict[str, Any],
+    rects: list[dict[str, Any]],
+    *,
+    tweets_per_image: int | None = None,
+    max_tweet_height: int | None = None,
+) -> list[FloatRect] | None:
+    # rects are in css pixels here, clip is applied before device scaling
+    normalized = _normalize_reacts(rects)
+    max_chunk_height = get_max_chunk_height(
+        normalized,
+        tweets_per_image=tweets_per_image,
+        max_tweet_height=max_tweet_height,
+    )
+    if len(normalized) < 2 or max_chunk_height is None:  # noqa: PLR2004
+        return None
+
+    return [
+        FloatRect(
+            x=container["x"],
+            y=chunk[0]["top"],
+            width=container["width"],
+            height=chunk[-1]["bottom"] - chunk[0]["top"],
+        )
+        for chunk in chunk_rects(normalized, max_chunk_height=max_chunk_height)
+    ]
+
+
 @contextmanager
 def sync_browser(
     *,
@@ -256,6 +331,16 @@ def sync_browser(
             yield browser
 
 
+def _route_media_sync(page: SyncPage, media: Mapping[str, bytes], /) -> None:
+    def _handler(route: SyncRoute) -> None:
+        if (body := media.get(route.request.url)) is not None:
+            route.fulfill(status=200, body=body)
+        else:
+            route.abort()
+
+    page.route("**/*", _handler)
+
+
 def html_to_image(
     html: str,
     /,
@@ -263,31 +348,85 @@ def html_to_image(
     headless: bool = True,
     browser: SyncBrowser | None = None,
     config: BrowserCtxConfig | None = None,
+    media: Mapping[str, bytes] | None = None,
 ) -> HTMLToImageResult:
     with ExitStack() as stack:
         if browser is None:
             browser = stack.enter_context(sync_browser(headless=headless))
 
-        ctx_config = _get_ctx_config(config)
+        ctx_config = _get_ctx_config(config, media=media)
         ctx = browser.new_context(**ctx_config)
 
         page = ctx.new_page()
-        page.set_content(html)
-        page.wait_for_load_state(state="domcontentloaded")
+        if media is not None:
+            _route_media_sync(page, media)
 
-        screenshot = page.locator(".thread-container").screenshot()
-        rects = page.locator(".thread-container > .tweet").evaluate_all(
-            "(tweets) => tweets.map(el => el.getBoundingClientRect())"
-        )
+        with measure_stage("page_load"):
+            page.set_content(html)
+            page.wait_for_load_state(state="domcontentloaded")
 
-        scale = _get_scale(mobile=ctx_config.get("is_mobile", True))
+        with measure_stage("screenshot"):
+            screenshot = page.locator(".thread-container").screenshot()
+            rects = page.locator(".thread-container > .tweet").evaluate_all(
+                "(tweets) => tweets.map(el => el.getBoundingClientRect())"
+            )
+
+        scale = _get_scale(ctx_config)
         return HTMLToImageResult(
             img=bytes_to_image(screenshot),
             rects=_normalize_reacts(rects, scale=scale),
             scale=scale,
+            screenshot=screenshot,
         )
 
 
+def html_to_images(  # noqa: PLR0913
+    html: str,
+    /,
+    *,
+    headless: bool = True,
+    browser: SyncBrowser | None = None,
+    config: BrowserCtxConfig | None = None,
+    media: Mapping[str, bytes] | None = None,
+    tweets_per_image: int | None = None,
+    max_tweet_height: int | None = None,
+) -> list[bytes]:
+    """Render html to png screenshots, one per chunk of ``tweets_per_image`` or ``max_tweet_height``.
+
+    Chunk boundaries are computed from the item rects first and every chunk is captured with a clipped
+    screenshot, so the full-height image is never materialized.
+    """
+    with ExitStack() as stack:
+        if browser is None:
+            browser = stack.enter_context(sync_browser(headless=headless))
+
+        ctx = browser.new_context(**_get_ctx_config(config, media=media))
+        stack.callback(ctx.close)
+
+        page = ctx.new_page()
+        if media is not None:
+            _route_media_sync(page, media)
+
+        with measure_stage("page_load"):
+            page.set_content(html)
+            page.wait_for_load_state(state="domcontentloaded")
+
+        container = page.locator(".main-container")
+        with measure_stage("split"):
+            clips = _chunk_clips(
+                container.evaluate("(el) => el.getBoundingClientRect()"),
+                page.locator(".main-container > .container-item").evaluate_all(_GET_RECTS_JS),
+                tweets_per_image=tweets_per_image,
+                max_tweet_height=max_tweet_height,
+            )
+
+        with measure_stage("screenshot"):
+            if clips is None:
+                return [container.screenshot()]
+
+            return [page.screenshot(clip=clip, full_page=True) for clip in clips]
+
+
 @asynccontextmanager
 async def async_browser(
     *,
@@ -304,46 +443,218 @@ async def async_browser(
             yield browser
 
 
-async def html_to_image_async(
+@dataclass(kw_only=True)
+class AsyncPageCache:
+    """LRU cache of ready-to-use pages of a single browser, keyed by the context config.
+
+    A page is checked out for the duration of a render, so concurrent renders with the same
+    config never share a page. On check-in the page content is reset and the least recently
+    used pages above ``max_size`` are closed together with their contexts.
+    """
+
+    browser: AsyncBrowser
+    max_size: int = 2
+
+    _pages: OrderedDict[str, AsyncPage] = field(init=False, default_factory=OrderedDict)
+
+    @staticmethod
+    def _get_key(config: BrowserCtxConfig) -> str:
+        return json.dumps(config, sort_keys=True)
+
+    @staticmethod
+    async def _close_page(page: AsyncPage) -> None:
+        with suppress(AsyncPlaywrightError):
+            await page.context.close()
+
+    async def _new_page(self, config: BrowserCtxConfig) -> AsyncPage:
+        ctx = await self.browser.new_context(**config)
+
+        try:
+            return await ctx.new_page()
+        except BaseException:
+            await ctx.close()
+            raise
+
+    @asynccontextmanager
+    async def page(self, config: BrowserCtxConfig) -> AsyncIterator[AsyncPage]:
+        key = self._get_key(config)
+
+        page = self._pages.pop(key, None)
+        if page is None or page.is_closed():
+            page = await self._new_page(config)
+
+        try:
+            yield page
+
+            # drop rendered content so an idle page does not hold decoded images
+            await page.set_content("")
+        except BaseException:
+            await self._close_page(page)
+            raise
+
+        if key in self._pages:
+            # another render with the same config already checked in its page
+            await self._close_page(page)
+            return
+
+        self._pages[key] = page
+        while len(self._pages) > self.max_size:
+            _, evicted = self._pages.popitem(last=False)
+            await self._close_page(evicted)
+
+    async def aclose(self) -> None:
+        pages, self._pages = self._pages, OrderedDict()
+        await gather(*[self._close_page(page) for page in pages.values()])
+
+
+async def _route_media(page: AsyncPage, media: Mapping[str, bytes], /) -> None:
+    async def _handler(route: AsyncRoute) -> None:
+        if (body := media.get(route.request.url)) is not None:
+            await route.fulfill(status=200, body=body)
+        else:
+            await route.abort()
+
+    await page.route("**/*", _handler)
+
+
+@asynccontextmanager
+async def _rendered_page(  # noqa: PLR0913
     html: str,
     /,
     *,
     browser: AsyncBrowser | None = None,
+    pages: AsyncPageCache | None = None,
     headless: bool = True,
-    config: BrowserCtxConfig | None = None,
-) -> HTMLToImageResult:
+    ctx_config: BrowserCtxConfig,
+    media: Mapping[str, bytes] | None = None,
+) -> AsyncIterator[AsyncPage]:
     async with AsyncExitStack() as stack:
-        if browser is None:
-            browser = await stack.enter_async_context(async_browser(headless=headless))
+        with measure_stage("browser_acquire"):
+            if pages is not None:
+                page = await stack.enter_async_context(pages.page(ctx_config))
+            else:
+                if browser is None:
+                    browser = await stack.enter_async_context(async_browser(headless=headless))
 
-        ctx_config = _get_ctx_config(config)
-        ctx = await browser.new_context(**ctx_config)
+                ctx = await browser.new_context(**ctx_config)
+                stack.push_async_callback(ctx.close)
 
-        page = await ctx.new_page()
-        await page.set_content(html)
-        await page.wait_for_load_state(state="domcontentloaded")
+                page = await ctx.new_page()
 
-        screenshot, rects = await gather(
-            page.locator(".main-container").screenshot(),
-            page.locator(".main-container > .container-item").evaluate_all(
-                "(tweets) => tweets.map(el => el.getBoundingClientRect())"
-            ),
-        )
+        with measure_stage("page_load"):
+            if media is not None:
+                await _route_media(page, media)
+                # a cached page must not keep serving media of this render
+                stack.push_async_callback(page.unroute_all, behavior="ignoreErrors")
+
+            await page.set_content(html)
+            await page.wait_for_load_state(state="domcontentloaded")
 
-    scale = _get_scale(mobile=ctx_config.get("is_mobile", True))
+        yield page
+
+
+async def html_to_image_async(  # noqa: PLR0913
+    html: str,
+    /,
+    *,
+    browser: AsyncBrowser | None = None,
+    pages: AsyncPageCache | None = None,
+    headless: bool = True,
+    config: BrowserCtxConfig | None = None,
+    media: Mapping[str, bytes] | None = None,
+) -> HTMLToImageResult:
+    """Render html to an image.
+
+    With ``media`` set, media urls produced by :func:`media_route_url` are served from memory
+    instead of being inlined into html as base64.
+    """
+    ctx_config = _get_ctx_config(config, media=media)
+
+    async with _rendered_page(
+        html,
+        browser=browser,
+        pages=pages,
+        headless=headless,
+        ctx_config=ctx_config,
+        media=media,
+    ) as page:
+        with measure_stage("screenshot"):
+            screenshot, rects = await gather(
+                page.locator(".main-container").screenshot(),
+                page.locator(".main-container > .container-item").evaluate_all(_GET_RECTS_JS),
+            )
+
+    scale = _get_scale(ctx_config)
     return HTMLToImageResult(
         img=bytes_to_image(screenshot),
         rects=_normalize_reacts(rects, scale=scale),
         scale=scale,
+        screenshot=screenshot,
     )
 
 
+async def html_to_images_async(  # noqa: PLR0913
+    html: str,
+    /,
+    *,
+    browser: AsyncBrowser | None = None,
+    pages: AsyncPageCache | None = None,
+    headless: bool = True,
+    config: BrowserCtxConfig | None = None,
+    media: Mapping[str, bytes] | None = None,
+    tweets_per_image: int | None = None,
+    max_tweet_height: int | None = None,
+    parallel: bool = False,
+) -> list[bytes]:
+    """Render html to png screenshots, one per chunk of ``tweets_per_image`` or ``max_tweet_height``.
+
+    Chunk boundaries are computed from the item rects first and every chunk is captured with a clipped
+    screenshot, so the full-height image is never materialized. With ``parallel`` all chunk screenshots
+    are requested at once, otherwise one at a time to keep peak memory of the browser low.
+    """
+    async with _rendered_page(
+        html,
+        browser=browser,
+        pages=pages,
+        headless=headless,
+        ctx_config=_get_ctx_config(config, media=media),
+        media=media,
+    ) as page:
+        container = page.locator(".main-container")
+        with measure_stage("split"):
+            container_rect, rects = await gather(
+                container.evaluate("(el) => el.getBoundingClientRect()"),
+                page.locator(".main-container > .container-item").evaluate_all(_GET_RECTS_JS),
+            )
+
+            clips = _chunk_clips(
+                container_rect,
+                rects,
+                tweets_per_image=tweets_per_image,
+                max_tweet_height=max_tweet_height,
+            )
+
+        with measure_stage("screenshot"):
+            if clips is None:
+                return [await container.screenshot()]
+
+            if parallel:
+                return [*await gather(*[page.screenshot(clip=clip, full_page=True) for clip in clips])]
+
+            return [await page.screenshot(clip=clip, full_page=True) for clip in clips]
+
+
 __all__ = [
     "AsyncBrowser",
+    "AsyncPageCache",
     "HTMLToImageResult",
     "SyncBrowser",
     "async_browser",
     "get_browser_ctx_config",
     "html_to_image",
     "html_to_image_async",
+    "html_to_images",
+    "html_to_images_async",
+    "media_route_url",
+    "media_routes",
 ]
@@ -0,0 +1,489 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import timedelta
+from functools import partial
+from pathlib import Path
+
+from .utils import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def _sha256(data: bytes, /) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _url_path(root: Path, url: str, /) -> Path:
+    return root / "urls" / _sha256(url.encode())
+
+
+@dataclass(kw_only=True)
+class CacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+@dataclass(frozen=True, kw_only=True)
+class _Entry[V]:
+    value: V
+    weight: int
+    stored_at: float
+
+
+@dataclass(kw_only=True)
+class TieredCache[V]:
+    """Memory LRU bounded by ``max_size`` (in ``weigh`` units) with an optional disk tier under ``path``.
+
+    Values are written to disk on put, or only once evicted from memory with ``spill`` set. Disk usage is
+    bounded by ``max_disk_bytes``, oldest files are removed first. With ``ttl`` set values expire that long
+    after they were stored. Keys name the files, so they must be safe file names (e.g. hex digests).
+
+    ``on_drop`` receives keys that left both tiers, concurrent fetches of the same key share one load.
+    """
+
+    max_size: int
+    path: Path | None = None
+    max_disk_bytes: int = 256 * 1024 * 1024
+    ttl: timedelta | None = None
+    spill: bool = False
+    weigh: Callable[[V], int] = lambda _: 1
+    dump: Callable[[V], bytes]
+    load: Callable[[str, bytes], V]  # raises ValueError for a corrupted entry
+    on_drop: Callable[[list[str]], None] | None = None
+
+    stats: CacheStats = field(init=False, default_factory=CacheStats)
+
+    _entries: OrderedDict[str, _Entry[V]] = field(init=False, repr=False, default_factory=OrderedDict)
+    _size: int = field(init=False, default=0)
+    _disk_size: int | None = field(init=False, default=None)
+    _lock: threading.RLock = field(init=False, repr=False, default_factory=threading.RLock)
+    _loads: SingleFlight[str, V] = field(init=False, repr=False, default_factory=SingleFlight)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str, /) -> bool:
+        return key in self._entries
+
+    def entry_path(self, root: Path, key: str, /) -> Path:
+        return root / key[:2] / key
+
+    def _files(self, root: Path, /) -> list[Path]:
+        return [p for p in root.rglob("*") if p.is_file() and p.suffix != ".tmp"]
+
+    def _is_fresh(self, stored_at: float, /) -> bool:
+        return self.ttl is None or time.time() - stored_at < self.ttl.total_seconds()
+
+    def get_memory(self, key: str, /) -> V | None:
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                return None
+
+            if not self._is_fresh(entry.stored_at):
+                self._pop_memory(key)
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+
+            return entry.value
+
+    def _get_disk(self, key: str, /) -> V | None:
+        if self.path is None:
+            return None
+
+        entry_path = self.entry_path(self.path, key)
+        try:
+            stored_at = entry_path.stat().st_mtime
+            value = self.load(key, entry_path.read_bytes())
+        except OSError:
+            return None
+        except ValueError:
+            logger.warning("Corrupted cache entry %s, dropping it", entry_path)
+            entry_path.unlink(missing_ok=True)
+            return None
+
+        if not self._is_fresh(stored_at):
+            entry_path.unlink(missing_ok=True)
+            return None
+
+        with self._lock:
+            self.stats.disk_hits += 1
+            evicted = self._put_memory(key, value, stored_at)
+
+        self._evicted(evicted)
+        return value
+
+    def _pop_memory(self, key: str, /) -> _Entry[V] | None:
+        if (entry := self._entries.pop(key, None)) is not None:
+            self._size -= entry.weight
+
+        return entry
+
+    def _put_memory(self, key: str, value: V, stored_at: float, /) -> list[tuple[str, _Entry[V]]]:
+        entry = _Entry(value=value, weight=self.weigh(value), stored_at=stored_at)
+        self._pop_memory(key)
+
+        if entry.weight > self.max_size:
+            return [(key, entry)]
+
+        self._entries[key] = entry
+        self._size += entry.weight
+
+        evicted = []
+        while self._size > self.max_size:
+            evicted_key, evicted_entry = self._entries.popitem(last=False)
+            self._size -= evicted_entry.weight
+            self.stats.evictions += 1
+            evicted.append((evicted_key, evicted_entry))
+
+        return evicted
+
+    def _evicted(self, evicted: list[tuple[str, _Entry[V]]], /) -> None:
+        if self.spill:
+            # spilled content may be on disk already (e.g. loaded from there)
+            dropped = [
+                key
+                for key, entry in evicted
+                if not (self.path is not None and self.entry_path(self.path, key).exists())
+                and not self._put_disk(key, entry.value)
+            ]
+        elif self.path is not None:
+            dropped = [key for key, _ in evicted if not self.entry_path(self.path, key).exists()]
+        else:
+            dropped = [key for key, _ in evicted]
+
+        self._dropped(dropped)
+
+    def _dropped(self, keys: list[str], /) -> None:
+        if keys and self.on_drop is not None:
+            self.on_drop(keys)
+
+    def _put_disk(self, key: str, value: V, /) -> bool:
+        if self.path is None:
+            return False
+
+        entry_path = self.entry_path(self.path, key)
+        content = self.dump(value)
+
+        try:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+
+            # unique per thread, concurrent writes of the same key do not clobber each other's file
+            tmp_path = entry_path.with_name(f"{entry_path.name}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(content)
+            tmp_path.replace(entry_path)
+        except OSError:
+            logger.warning("Failed to write cache entry %s", entry_path, exc_info=True)
+            return False
+
+        # writes run in worker threads, size bookkeeping and pruning must not interleave
+        with self._lock:
+            if self._disk_size is None:
+                self._disk_size = sum(p.stat().st_size for p in self._files(self.path))
+            else:
+                self._disk_size += len(content)
+
+            pruned = self._prune_disk(self.path) if self._disk_size > self.max_disk_bytes else []
+
+        self._dropped(pruned)
+        return True
+
+    def _prune_disk(self, root: Path, /) -> list[str]:
+        files = sorted(self._files(root), key=lambda p: p.stat().st_mtime)
+        size = sum(p.stat().st_size for p in files)
+
+        # free a bit more than needed, so pruning does not run on every write
+        target = self.max_disk_bytes * 0.9
+        pruned = []
+        for file in files:
+            if size <= target:
+                break
+
+            with suppress(OSError):
+                file_size = file.stat().st_size
+                file.unlink()
+                size -= file_size
+
+                if file.name not in self._entries:
+                    pruned.append(file.name)
+
+        self._disk_size = size
+        return pruned
+
+    def lookup(self, key: str, /) -> V | None:
+        """Like :meth:`get`, but a miss is not counted."""
+        if (value := self.get_memory(key)) is None:
+            value = self._get_disk(key)
+
+        return value
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.stats.misses += 1
+
+    def get(self, key: str, /) -> V | None:
+        if (value := self.lookup(key)) is None:
+            self.record_miss()
+
+        return value
+
+    def put(self, key: str, value: V, /) -> None:
+        stored_at = time.time()
+
+        with self._lock:
+            evicted = self._put_memory(key, value, stored_at)
+
+        if not self.spill:
+            self._put_disk(key, value)
+
+        self._evicted(evicted)
+
+    async def fetch(self, key: str, load: Callable[[], Awaitable[V]], /) -> V:
+        if (value := self.get_memory(key)) is not None:
+            return value
+
+        if self.path is not None and (value := await asyncio.to_thread(self._get_disk, key)) is not None:
+            return value
+
+        if key not in self._loads:
+            self.record_miss()
+
+        return await self._loads.run(key, partial(self._load, key, load))
+
+    async def _load(self, key: str, load: Callable[[], Awaitable[V]], /) -> V:
+        value = await load()
+        await self.aput(key, value)
+
+        return value
+
+    async def aput(self, key: str, value: V, /) -> None:
+        if self.path is not None:
+            await asyncio.to_thread(self.put, key, value)
+        else:
+            self.put(key, value)
+
+    def discard(self, keys: Iterable[str], /) -> None:
+        keys = list(keys)
+
+        with self._lock:
+            for key in keys:
+                self._pop_memory(key)
+
+        if self.path is not None:
+            for key in keys:
+                self.entry_path(self.path, key).unlink(missing_ok=True)
+
+        self._dropped(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            self._size = 0
+
+            if self.path is not None:
+                for file in self._files(self.path):
+                    keys.append(file.name)
+                    file.unlink(missing_ok=True)
+
+                self._disk_size = 0
+
+        self._dropped(keys)
+
+
+@dataclass(kw_only=True)
+class MediaCache:
+    """Shared cache of downloaded preview media (avatars, images, video posters).
+
+    Content is stored once per sha256 digest, so the same image served from different urls takes space once.
+    Memory is bounded by ``max_bytes``, evicted entries are spilled to ``path`` when it is set.
+    Disk usage is bounded by ``max_disk_bytes``, oldest files are removed first.
+    """
+
+    max_bytes: int = 64 * 1024 * 1024
+    max_urls: int = 100_000
+    path: Path | None = None
+    max_disk_bytes: int = 512 * 1024 * 1024
+
+    _blobs: TieredCache[bytes] = field(init=False, repr=False)
+    _urls: OrderedDict[str, str] = field(init=False, repr=False, default_factory=OrderedDict)
+    _lock: threading.Lock = field(init=False, repr=False, default_factory=threading.Lock)
+    _downloads: SingleFlight[str, bytes] = field(init=False, repr=False, default_factory=SingleFlight)
+    _swept: bool = field(init=False, repr=False, default=False)
+
+    def __post_init__(self) -> None:
+        self._blobs = TieredCache(
+            max_size=self.max_bytes,
+            path=None if self.path is None else self.path / "blobs",
+            max_disk_bytes=self.max_disk_bytes,
+            spill=True,
+            weigh=len,
+            dump=bytes,
+            load=self._load_blob,
+            on_drop=self._drop_urls,
+        )
+
+    @property
+    def stats(self) -> CacheStats:
+        return self._blobs.stats
+
+    @property
+    def size(self) -> int:
+        return self._blobs.size
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    @staticmethod
+    def _load_blob(digest: str, content: bytes, /) -> bytes:
+        if _sha256(content) != digest:
+            raise ValueError(f"Media content does not match its digest {digest}")
+
+        return content
+
+    def _is_stored(self, root: Path, digest: str, /) -> bool:
+        return digest in self._blobs or self._blobs.entry_path(root / "blobs", digest).exists()
+
+    def _refs_path(self, root: Path, digest: str, /) -> Path:
+        # names of the url index files pointing at the content, so dropping it does not scan the whole index
+        return self._blobs.entry_path(root / "refs", digest)
+
+    def _sweep_urls(self, root: Path, /) -> None:
+        # urls of content that was never spilled before a previous process exited have no refs to follow
+        for url_path in (root / "urls").glob("*"):
+            with suppress(OSError):
+                if not self._is_stored(root, url_path.read_text()):
+                    url_path.unlink()
+
+    def _drop_urls(self, digests: list[str], /) -> None:
+        if self.path is None:
+            return
+
+        if not self._swept:
+            self._swept = True
+            self._sweep_urls(self.path)
+
+        for digest in digests:
+            if self._is_stored(self.path, digest):  # stored again since it was dropped
+                continue
+
+            refs_path = self._refs_path(self.path, digest)
+            with suppress(OSError):
+                for name in refs_path.read_text().split():
+                    url_path = self.path / "urls" / name
+
+                    # the url may point at newer content by now
+                    with suppress(OSError):
+                        if url_path.read_text() == digest:
+                            url_path.unlink()
+
+                refs_path.unlink()
+
+    def _get_memory(self, url: str, /) -> bytes | None:
+        with self._lock:
+            if (digest := self._urls.get(url)) is None:
+                return None
+
+            self._urls.move_to_end(url)
+
+        return self._blobs.get_memory(digest)
+
+    def _lookup(self, url: str, /) -> bytes | None:
+        with self._lock:
+            digest = self._urls.get(url)
+
+        if digest is None and self.path is not None:
+            with suppress(OSError):
+                digest = _url_path(self.path, url).read_text()
+
+        if digest is None or (content := self._blobs.lookup(digest)) is None:
+            return None
+
+        self._put_url(url, digest, persist=False)
+        return content
+
+    def _put_url(self, url: str, digest: str, /, *, persist: bool = True) -> None:
+        with self._lock:
+            self._urls[url] = digest
+            self._urls.move_to_end(url)
+
+            while len(self._urls) > self.max_urls:
+                self._urls.popitem(last=False)
+
+        if persist and self.path is not None:
+            try:
+                url_path = _url_path(self.path, url)
+                if url_path.exists() and url_path.read_text() == digest:
+                    return
+
+                url_path.parent.mkdir(parents=True, exist_ok=True)
+                url_path.write_text(digest)
+
+                refs_path = self._refs_path(self.path, digest)
+                refs_path.parent.mkdir(parents=True, exist_ok=True)
+                with refs_path.open("a") as refs:
+                    refs.write(f"{url_path.name}\n")
+            except OSError:
+                logger.warning("Failed to persist media cache index for %s", url, exc_info=True)
+
+    def get(self, url: str, /) -> bytes | None:
+        if (content := self._lookup(url)) is None:
+            self._blobs.record_miss()
+
+        return content
+
+    def put(self, url: str, content: bytes, /) -> None:
+        digest = _sha256(content)
+
+        self._blobs.put(digest, content)
+        self._put_url(url, digest)
+
+    async def fetch(self, url: str, download: Callable[[str], Awaitable[bytes]], /) -> bytes:
+        if (content := self._get_memory(url)) is not None:
+            return content
+
+        if self.path is not None and (content := await asyncio.to_thread(self._lookup, url)) is not None:
+            return content
+
+        # concurrent requests for the same media share one download
+        if url not in self._downloads:
+            self._blobs.record_miss()
+
+        return await self._downloads.run(url, partial(self._download, url, download))
+
+    async def _download(self, url: str, download: Callable[[str], Awaitable[bytes]], /) -> bytes:
+        content = await download(url)
+
+        if self.path is not None:
+            await asyncio.to_thread(self.put, url, content)
+        else:
+            self.put(url, content)
+
+        return content
+
+    def clear(self) -> None:
+        with self._lock:
+            self._urls.clear()
+
+        self._blobs.clear()
+
+
+__all__ = [
+    "CacheStats",
+    "MediaCache",
+    "TieredCache",
+]
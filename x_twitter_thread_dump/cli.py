@@ -3,6 +3,8 @@ from pathlib import Path
 import click
 
 from x_twitter_thread_dump import x_twitter_thread_dump_async_client
+from x_twitter_thread_dump.images import ImageEncoding, available_image_formats
+from x_twitter_thread_dump.types import ImageFormat
 from x_twitter_thread_dump.utils import async_to_sync, get_tweet_id_from_url
 
 
@@ -27,9 +29,28 @@ def cli() -> None:
 @click.option(
     "-o",
     "--output",
-    type=click.Path(exists=False, writable=True, dir_okay=False),
-    default="dump.png",
-    help="The output file path for the image dump.",
+    type=click.Path(exists=False, writable=True, dir_okay=False, path_type=Path),
+    default=None,
+    help="The output file path for the image dump. Defaults to dump.<format extension>.",
+)
+@click.option(
+    "--format",
+    "image_format",
+    type=click.Choice(available_image_formats()),
+    default="png",
+    help="The output image format.",
+)
+@click.option(
+    "--quality",
+    type=click.IntRange(1, 100),
+    default=None,
+    help="Encoder quality for lossy formats (webp, avif, jpeg). If not specified, the codec default will be used.",
+)
+@click.option(
+    "--effort",
+    type=click.IntRange(0, 10),
+    default=None,
+    help="Encoder effort, higher is smaller but slower. If not specified, the codec default will be used.",
 )
 @click.option(
     "--tweets-per-image",
@@ -54,17 +75,25 @@ async def dump_to_image(  # noqa: PLR0913
     *,
     tweet_url: str,
     limit: int | None = None,
-    output: Path,
+    output: Path | None = None,
+    image_format: ImageFormat = "png",
+    quality: int | None = None,
+    effort: int | None = None,
     tweets_per_image: int | None = None,
     max_tweet_height: int | None = None,
     timeout: int | None = None,
 ) -> None:
     tweet_id = get_tweet_id_from_url(tweet_url)
 
+    encoding = ImageEncoding(format=image_format, quality=quality, effort=effort)
+    extension = encoding.codec.extension
+    output = output or Path(f"dump.{extension}")
+
     async with x_twitter_thread_dump_async_client(timeout=timeout) as client:
         thread = await client.get_thread(tweet_id, limit=limit)
-        result = await client.thread_to_image(
+        result = await client.thread_to_image_bytes(
             thread,
+            encoding=encoding,
             tweets_per_image=tweets_per_image,
             max_tweet_height=max_tweet_height,
         )
@@ -73,10 +102,10 @@ async def dump_to_image(  # noqa: PLR0913
             case []:
                 raise RuntimeError(f"No tweets found for {tweet_id}")
             case [image]:
-                image.save(output)
+                output.write_bytes(image)
             case [*images] if len(images) > 1:
                 for i, img in enumerate(images, 1):
-                    img.save(output.with_name(f"{output.stem}_{i}.png"))
+                    output.with_name(f"{output.stem}_{i}.{extension}").write_bytes(img)
 
 
 if __name__ == "__main__":
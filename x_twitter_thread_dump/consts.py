@@ -1,6 +1,9 @@
 DEFAULT_TIMEOUT = 120  # seconds
 DEFAULT_RETRIES = 5
 
+# statuses X answers with when the guest token is no longer accepted
+GUEST_TOKEN_REJECTED_STATUSES = frozenset({401, 403, 429})
+
 DEFAULT_BEARER_TOKEN = (
     "AAAAAAAAAAAAAAAAAAAAANRILgAAAAAAnNwIzUejRCOuH5E6I8xnZz4puTs%3D1Zv7ttfk8LF81IUq16cHjhLTvJu4FA33AGWWjCpTnA"  # noqa: S105
 )
@@ -60,11 +63,50 @@ TWEET_RESULT_BY_REST_ID_PARAMS = {
     },
 }
 
+# batched lookup, ids that do not exist (or are not visible for guests) are missing from the response
+TWEET_RESULTS_BY_REST_IDS_PATH = "/graphql/Xl5pC_lBk_gcO2ItU39DQw/TweetResultsByRestIds"
+TWEET_RESULTS_BY_REST_IDS_PARAMS = {
+    "variables": {
+        "tweetIds": None,
+        "includePromotedContent": True,
+        "withBirdwatchNotes": True,
+        "withVoice": True,
+        "withCommunity": True,
+    },
+    "features": TWEET_RESULT_BY_REST_ID_PARAMS["features"],
+    "fieldToggles": TWEET_RESULT_BY_REST_ID_PARAMS["fieldToggles"],
+}
+TWEET_RESULTS_BY_REST_IDS_CHUNK_SIZE = 50  # ids are sent in query string, keep urls reasonably short
+
+# conversation timeline of a tweet, it includes the whole ancestors chain and author self-replies
+TWEET_DETAIL_PATH = "/graphql/_8aYOgEDz35BrBcBal1-_w/TweetDetail"
+TWEET_DETAIL_PARAMS = {
+    "variables": {
+        "focalTweetId": None,
+        "referrer": "tweet",
+        "with_rux_injections": False,
+        "rankingMode": "Relevance",
+        "includePromotedContent": False,
+        "withCommunity": True,
+        "withQuickPromoteEligibilityTweetFields": False,
+        "withBirdwatchNotes": True,
+        "withVoice": True,
+    },
+    "features": TWEET_RESULT_BY_REST_ID_PARAMS["features"],
+    "fieldToggles": TWEET_RESULT_BY_REST_ID_PARAMS["fieldToggles"],
+}
+
 
 __all__ = [
     "DEFAULT_BEARER_TOKEN",
     "DEFAULT_RETRIES",
     "DEFAULT_TIMEOUT",
+    "GUEST_TOKEN_REJECTED_STATUSES",
+    "TWEET_DETAIL_PARAMS",
+    "TWEET_DETAIL_PATH",
+    "TWEET_RESULTS_BY_REST_IDS_CHUNK_SIZE",
+    "TWEET_RESULTS_BY_REST_IDS_PARAMS",
+    "TWEET_RESULTS_BY_REST_IDS_PATH",
     "TWEET_RESULT_BY_REST_ID_PARAMS",
     "TWEET_RESULT_BY_REST_ID_PATH",
 ]
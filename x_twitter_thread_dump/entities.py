@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import re
 from collections.abc import Iterable
+from contextlib import suppress
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Literal, Self, cast
@@ -186,8 +187,10 @@ class Tweet:
             yield self.quoted_tweet.user.avatar
 
     @classmethod
-    def _parse_tweet_result(cls, result: AnyDict, /) -> Self:  # noqa: PLR0912
+    def _parse_tweet_result(cls, result: AnyDict, /) -> Self:  # noqa: C901, PLR0912
         match result:
+            case {"result": {"__typename": "TweetWithVisibilityResults", "tweet": {**tweet}}}:
+                return cls._parse_tweet_result({"result": tweet})
             case {
                 "result": {
                     "rest_id": id_,
@@ -264,6 +267,11 @@ class Tweet:
             case _:
                 raise ValueError("Invalid raw data format for Tweet")
 
+    @classmethod
+    def from_raw_result(cls, raw_data: AnyDict, /) -> Self:
+        # counterpart of raw_data, ``{"result": {...}}`` as it is stored on the tweet
+        return cls._parse_tweet_result(raw_data)
+
     @classmethod
     def from_raw_response(cls, raw_data: AnyDict, /) -> Self:
         match raw_data:
@@ -272,6 +280,56 @@ class Tweet:
             case _:
                 raise ValueError("Invalid raw data format for Tweet")
 
+    @classmethod
+    def many_from_raw_response(cls, raw_data: AnyDict, /) -> list[Self]:
+        match raw_data:
+            case {"data": {"tweetResult": [*results]}}:
+                pass
+            case _:
+                raise ValueError("Invalid raw data format for Tweets")
+
+        tweets: list[Self] = []
+        for result in results:
+            # deleted, protected and withheld tweets are returned as empty or tombstone results
+            with suppress(ValueError):
+                tweets.append(cls._parse_tweet_result(result))
+
+        return tweets
+
+    @classmethod
+    def from_raw_conversation_response(cls, raw_data: AnyDict, /) -> list[Self]:
+        match raw_data:
+            case {"data": {"threaded_conversation_with_injections_v2": {"instructions": [*instructions]}}}:
+                pass
+            case _:
+                raise ValueError("Invalid raw data format for conversation")
+
+        results: list[AnyDict] = []
+        for instruction in instructions:
+            match instruction:
+                case {"type": "TimelineAddEntries", "entries": [*entries]}:
+                    pass
+                case _:
+                    continue
+
+            for entry in entries:
+                match entry:
+                    case {"content": {"itemContent": {"tweet_results": {**entry_result}}}}:
+                        results.append(cast(AnyDict, entry_result))
+                    case {"content": {"items": [*items]}}:
+                        for item in items:
+                            match item:
+                                case {"item": {"itemContent": {"tweet_results": {**item_result}}}}:
+                                    results.append(cast(AnyDict, item_result))
+
+        tweets: list[Self] = []
+        for result in results:
+            # tombstones and withheld tweets can not be parsed, they just break the chain
+            with suppress(ValueError):
+                tweets.append(cls._parse_tweet_result(result))
+
+        return tweets
+
 
 type Thread = list[Tweet]
 
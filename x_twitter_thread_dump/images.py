@@ -1,10 +1,173 @@
 import base64
 import io
-from collections.abc import Iterator
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from typing import Any
 
-from PIL import Image
+from PIL import Image, features
 
-from .types import ClientBoundingRect, Img
+from .timing import measure_stage
+from .types import ClientBoundingRect, ImageFormat, Img
+
+# quality/effort are optional, each codec maps them to its own encoder options
+type ImageEncoder = Callable[[Img, int | None, int | None], dict[str, Any]]
+
+
+@dataclass(frozen=True, kw_only=True)
+class ImageCodec:
+    name: ImageFormat
+    pil_format: str
+    media_type: str
+    extension: str
+    options: ImageEncoder
+    mode: str | None = None  # convert image to this mode before saving, if needed
+    feature: str | None = None  # pillow feature required for the codec
+
+    @property
+    def is_available(self) -> bool:
+        return self.feature is None or bool(features.check(self.feature))
+
+    def encode(self, image: Img, *, quality: int | None = None, effort: int | None = None) -> bytes:
+        with measure_stage("encode"):
+            if self.mode is not None and image.mode != self.mode:
+                image = image.convert(self.mode)
+
+            with io.BytesIO() as output:
+                image.save(output, format=self.pil_format, **self.options(image, quality, effort))
+                return output.getvalue()
+
+
+IMAGE_CODECS: dict[ImageFormat, ImageCodec] = {}
+
+
+def register_image_codec(codec: ImageCodec, /) -> ImageCodec:
+    IMAGE_CODECS[codec.name] = codec
+    return codec
+
+
+# effort: png - zlib level (0-9), webp - method (0-6), avif - inverted speed (0-10), jpeg - optimize when > 0
+register_image_codec(
+    ImageCodec(
+        name="png",
+        pil_format="PNG",
+        media_type="image/png",
+        extension="png",
+        options=lambda _, __, effort: {"compress_level": 6 if effort is None else effort},
+    )
+)
+register_image_codec(
+    ImageCodec(
+        name="png-fast",
+        pil_format="PNG",
+        media_type="image/png",
+        extension="png",
+        options=lambda *_: {"compress_level": 1},
+    )
+)
+register_image_codec(
+    ImageCodec(
+        name="png-optimized",
+        pil_format="PNG",
+        media_type="image/png",
+        extension="png",
+        options=lambda *_: {"optimize": True},
+    )
+)
+register_image_codec(
+    ImageCodec(
+        name="webp",
+        pil_format="WEBP",
+        media_type="image/webp",
+        extension="webp",
+        options=lambda _, quality, effort: {"quality": quality or 90, "method": 4 if effort is None else effort},
+        feature="webp",
+    )
+)
+register_image_codec(
+    ImageCodec(
+        name="avif",
+        pil_format="AVIF",
+        media_type="image/avif",
+        extension="avif",
+        options=lambda _, quality, effort: {"quality": quality or 75, "speed": 6 if effort is None else 10 - effort},
+        feature="avif",
+    )
+)
+register_image_codec(
+    ImageCodec(
+        name="jpeg",
+        pil_format="JPEG",
+        media_type="image/jpeg",
+        extension="jpg",
+        options=lambda _, quality, effort: {"quality": quality or 85, "optimize": bool(effort)},
+        mode="RGB",
+    )
+)
+
+
+def get_image_codec(name: ImageFormat | str, /) -> ImageCodec:
+    try:
+        codec = IMAGE_CODECS[name]  # type: ignore[index]
+    except KeyError:
+        raise ValueError(f"Unknown image format {name!r}") from None
+
+    if not codec.is_available:
+        raise ValueError(f"Image format {name!r} is not supported by installed Pillow")
+
+    return codec
+
+
+def available_image_formats() -> list[ImageFormat]:
+    return [name for name, codec in IMAGE_CODECS.items() if codec.is_available]
+
+
+# preferred order when a client accepts several formats
+_NEGOTIATION_ORDER: tuple[ImageFormat, ...] = ("webp", "avif", "png", "jpeg")
+
+
+def negotiate_image_format(accept: str | None, /, *, default: ImageFormat = "png") -> ImageFormat:
+    if not accept:
+        return default
+
+    accepted: dict[str, float] = {}
+    for part in accept.split(","):
+        media_type, *params = (p.strip() for p in part.split(";"))
+
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        accepted[media_type.lower()] = quality
+
+    candidates = [
+        name
+        for name in _NEGOTIATION_ORDER
+        if IMAGE_CODECS[name].is_available and accepted.get(IMAGE_CODECS[name].media_type, 0) > 0
+    ]
+    if not candidates:
+        return default
+
+    # stable sort keeps server preference between equally weighted formats
+    return max(candidates, key=lambda name: accepted[IMAGE_CODECS[name].media_type])
+
+
+@dataclass(frozen=True, kw_only=True)
+class ImageEncoding:
+    format: ImageFormat = "png"
+    quality: int | None = None
+    effort: int | None = None
+
+    @property
+    def codec(self) -> ImageCodec:
+        return get_image_codec(self.format)
+
+    def encode(self, image: Img, /) -> bytes:
+        return self.codec.encode(image, quality=self.quality, effort=self.effort)
 
 
 def base64str_to_image(base64_str: str) -> Img:
@@ -12,8 +175,8 @@ def base64str_to_image(base64_str: str) -> Img:
     return bytes_to_image(content)
 
 
-def image_to_base64str(image: Img) -> str:
-    image_bytes = image_to_bytes(image)
+def image_to_base64str(image: Img, encoding: ImageEncoding | None = None) -> str:
+    image_bytes = image_to_bytes(image, encoding)
     return base64.b64encode(image_bytes).decode("utf-8")
 
 
@@ -21,10 +184,8 @@ def bytes_to_image(image_bytes: bytes) -> Img:
     return Image.open(io.BytesIO(image_bytes))
 
 
-def image_to_bytes(image: Img) -> bytes:
-    with io.BytesIO() as output:
-        image.save(output, format="PNG")
-        return output.getvalue()
+def image_to_bytes(image: Img, encoding: ImageEncoding | None = None) -> bytes:
+    return (encoding or ImageEncoding()).encode(image)
 
 
 def scale_image(image: Img, *, scale: float) -> Img:
@@ -32,6 +193,44 @@ def scale_image(image: Img, *, scale: float) -> Img:
     return image.resize(new_size, Image.Resampling.LANCZOS)
 
 
+def get_max_chunk_height(
+    rects: list[ClientBoundingRect],
+    *,
+    tweets_per_image: int | None = None,
+    max_tweet_height: int | None = None,
+    scale: float = 1.0,
+) -> int | None:
+    match (tweets_per_image, max_tweet_height):
+        case (tweets_per_image, None) if tweets_per_image and rects:
+            average_height = sum(rect["height"] for rect in rects) // len(rects)
+            return average_height * tweets_per_image
+        case (None, max_tweet_height) if max_tweet_height:
+            # max_tweet_height is in css pixels, rects are in the pixels of the image
+            return int(max_tweet_height * scale)
+        case _:
+            return None
+
+
+def chunk_rects(
+    rects: list[ClientBoundingRect],
+    *,
+    max_chunk_height: int,
+) -> list[list[ClientBoundingRect]]:
+    if not rects:
+        return []
+
+    first, *rest = rects
+    chunks = [[first]]
+
+    for rect in rest:
+        if rect["bottom"] - chunks[-1][0]["top"] > max_chunk_height:
+            chunks.append([rect])
+        else:
+            chunks[-1].append(rect)
+
+    return chunks
+
+
 def divide_images(
     img: Img,
     rects: list[ClientBoundingRect],
@@ -42,11 +241,8 @@ def divide_images(
         yield img
         return
 
-    def _img_from_chunk() -> Img:
-        if not chunk:
-            return img
-
-        return img.crop(
+    for chunk in chunk_rects(rects, max_chunk_height=max_chunk_height):
+        yield img.crop(
             (
                 0,
                 chunk[0]["top"],
@@ -55,25 +251,30 @@ def divide_images(
             )
         )
 
-    first, *rest = rects
-    chunk = [first]
 
-    for rect in rest:
-        if rect["bottom"] - chunk[0]["top"] > max_chunk_height:
-            yield _img_from_chunk()
-            chunk = [rect]
-        else:
-            chunk.append(rect)
+def encode_screenshot(screenshot: bytes, encoding: ImageEncoding | None = None) -> bytes:
+    # browser screenshots are already png, re-encode only when something else was asked for
+    if encoding is None or encoding == ImageEncoding():
+        return screenshot
 
-    if chunk:
-        yield _img_from_chunk()
+    return image_to_bytes(bytes_to_image(screenshot), encoding)
 
 
 __all__ = [
+    "IMAGE_CODECS",
+    "ImageCodec",
+    "ImageEncoding",
+    "available_image_formats",
     "base64str_to_image",
     "bytes_to_image",
+    "chunk_rects",
     "divide_images",
+    "encode_screenshot",
+    "get_image_codec",
+    "get_max_chunk_height",
     "image_to_base64str",
     "image_to_bytes",
+    "negotiate_image_format",
+    "register_image_codec",
     "scale_image",
 ]
@@ -4,7 +4,9 @@ import re
 
 import jinja2
 
+from .browser import media_route_url
 from .entities import Thread
+from .timing import measure_stage
 
 jinja2_env = jinja2.Environment(
     loader=jinja2.FileSystemLoader(
@@ -13,6 +15,7 @@ jinja2_env = jinja2.Environment(
     autoescape=jinja2.select_autoescape(["html", "xml"]),
 )
 jinja2_env.filters["b64encode"] = lambda x: base64.b64encode(x).decode("utf-8")
+jinja2_env.filters["media_url"] = media_route_url
 jinja2_env.filters["regex_replace"] = lambda s, pattern, replacement: re.sub(pattern, replacement, s)
 
 
@@ -21,14 +24,17 @@ def render_thread_html(
     *,
     is_single_tweet: bool = False,
     show_connector_on_last: bool = False,
+    inline_media: bool = True,
 ) -> str:
     template = jinja2_env.get_template("thread_template.html")
 
-    return template.render(
-        thread=thread,
-        is_single_tweet=is_single_tweet,
-        show_connector_on_last=show_connector_on_last,
-    )
+    with measure_stage("template"):
+        return template.render(
+            thread=thread,
+            is_single_tweet=is_single_tweet,
+            show_connector_on_last=show_connector_on_last,
+            inline_media=inline_media,
+        )
 
 
 __all__ = [
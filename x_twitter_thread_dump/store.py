@@ -0,0 +1,163 @@
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import timedelta
+from pathlib import Path
+from typing import Self
+
+from .entities import Tweet
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tweets (
+    id TEXT PRIMARY KEY,
+    parent_id TEXT,
+    raw_data TEXT NOT NULL,
+    content_fetched_at REAL NOT NULL,
+    counters_fetched_at REAL NOT NULL
+)
+"""
+
+_SELECT_CHAIN = """
+WITH RECURSIVE chain(id, parent_id, raw_data, counters_fetched_at, depth) AS (
+    SELECT id, parent_id, raw_data, counters_fetched_at, 0
+    FROM tweets
+    WHERE id = :id AND content_fetched_at >= :content_after
+    UNION ALL
+    SELECT t.id, t.parent_id, t.raw_data, t.counters_fetched_at, c.depth + 1
+    FROM tweets AS t
+    JOIN chain AS c ON t.id = c.parent_id
+    WHERE t.content_fetched_at >= :content_after AND c.depth < :max_depth
+)
+SELECT raw_data, counters_fetched_at FROM chain ORDER BY depth
+"""
+
+_UPSERT = """
+INSERT INTO tweets (id, parent_id, raw_data, content_fetched_at, counters_fetched_at)
+VALUES (:id, :parent_id, :raw_data, :fetched_at, :fetched_at)
+ON CONFLICT (id) DO UPDATE SET
+    parent_id = excluded.parent_id,
+    raw_data = excluded.raw_data,
+    content_fetched_at = excluded.content_fetched_at,
+    counters_fetched_at = excluded.counters_fetched_at
+"""
+
+_UPDATE_COUNTERS = """
+UPDATE tweets SET raw_data = :raw_data, counters_fetched_at = :fetched_at WHERE id = :id
+"""
+
+
+@dataclass(kw_only=True)
+class StoredChain:
+    tweets: list[Tweet] = field(default_factory=list)
+    # ids of tweets whose likes/views/retweets are older than counters ttl
+    stale_ids: list[str] = field(default_factory=list)
+
+
+@dataclass(kw_only=True)
+class TweetStore:
+    """Local SQLite store of parsed tweets and their parent edges.
+
+    Text, author, media and the parent edge of a tweet never change, so they are kept for ``content_ttl``.
+    Counters (likes, views, ...) are considered stale after ``counters_ttl`` and should be refreshed by the caller.
+    """
+
+    path: Path | str = ":memory:"
+    content_ttl: timedelta = timedelta(days=7)
+    counters_ttl: timedelta = timedelta(minutes=15)
+    max_depth: int = 1_000
+
+    _conn: sqlite3.Connection = field(init=False, repr=False)
+    _lock: threading.Lock = field(init=False, repr=False, default_factory=threading.Lock)
+
+    def __post_init__(self) -> None:
+        if isinstance(self.path, Path):
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # store is shared between event loop and worker threads, access is serialized by the lock
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+
+    def get_chain(self, tweet_id: str, /) -> StoredChain:
+        now = time.time()
+
+        with self._lock:
+            rows = self._conn.execute(
+                _SELECT_CHAIN,
+                {
+                    "id": str(tweet_id),
+                    "content_after": now - self.content_ttl.total_seconds(),
+                    "max_depth": self.max_depth,
+                },
+            ).fetchall()
+
+        chain = StoredChain()
+        for raw_data, counters_fetched_at in rows:
+            tweet = Tweet.from_raw_result(json.loads(raw_data))
+            chain.tweets.append(tweet)
+
+            if counters_fetched_at < now - self.counters_ttl.total_seconds():
+                chain.stale_ids.append(tweet.id)
+
+        return chain
+
+    def put(self, tweets: Iterable[Tweet], /) -> None:
+        now = time.time()
+        rows = [
+            {
+                "id": tweet.id,
+                "parent_id": tweet.parent_id,
+                "raw_data": json.dumps(tweet.raw_data),
+                "fetched_at": now,
+            }
+            for tweet in tweets
+            if tweet.raw_data is not None
+        ]
+
+        with self._lock, self._conn:
+            self._conn.executemany(_UPSERT, rows)
+
+    def update_counters(self, tweets: Iterable[Tweet], /) -> None:
+        now = time.time()
+        rows = [
+            {
+                "id": tweet.id,
+                "raw_data": json.dumps(tweet.raw_data),
+                "fetched_at": now,
+            }
+            for tweet in tweets
+            if tweet.raw_data is not None
+        ]
+
+        with self._lock, self._conn:
+            self._conn.executemany(_UPDATE_COUNTERS, rows)
+
+    def prune(self) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM tweets WHERE content_fetched_at < ?",
+                (time.time() - self.content_ttl.total_seconds(),),
+            )
+
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> Self:
+        self.prune()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+
+__all__ = [
+    "StoredChain",
+    "TweetStore",
+]
@@ -0,0 +1,87 @@
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+
+# called with stage name and duration in milliseconds for every measured stage
+type StageObserver = Callable[[str, float], None]
+
+_observers: list[StageObserver] = []
+_current_timings: ContextVar["StageTimings | None"] = ContextVar("current_stage_timings", default=None)
+
+
+@dataclass(kw_only=True)
+class StageTiming:
+    duration: float = 0.0  # ms, summed over all calls
+    count: int = 0
+
+
+@dataclass(kw_only=True)
+class StageTimings:
+    stages: dict[str, StageTiming] = field(default_factory=dict)
+
+    def add(self, stage: str, duration: float, /) -> None:
+        timing = self.stages.setdefault(stage, StageTiming())
+        timing.duration += duration
+        timing.count += 1
+
+
+def add_stage_observer(observer: StageObserver, /) -> None:
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+@contextmanager
+def collect_stage_timings() -> Iterator[StageTimings]:
+    # timings is mutable and shared, so stages measured in child tasks are collected too
+    timings = StageTimings()
+    token = _current_timings.set(timings)
+
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def record_stage(stage: str, duration: float, /) -> None:
+    if (timings := _current_timings.get()) is not None:
+        timings.add(stage, duration)
+
+    for observer in _observers:
+        observer(stage, duration)
+
+
+@contextmanager
+def measure_stage(stage: str, /) -> Iterator[None]:
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        record_stage(stage, (time.perf_counter() - start) * 1_000)
+
+
+def timed_stage[**P, R](stage: str, /) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with measure_stage(stage):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+__all__ = [
+    "StageObserver",
+    "StageTiming",
+    "StageTimings",
+    "add_stage_observer",
+    "collect_stage_timings",
+    "measure_stage",
+    "record_stage",
+    "timed_stage",
+]
@@ -1,4 +1,4 @@
-from typing import Any, Literal, NotRequired, TypedDict
+from typing import Any, Literal, NotRequired, Protocol, TypedDict
 
 from PIL import Image
 
@@ -42,6 +42,16 @@ class ClientBoundingRect(TypedDict):
     height: int
 
 
+class PreviewMedia(Protocol):
+    preview_url: str
+    raw_preview_bytes: bytes | None
+
+
+type ImageFormat = Literal["png", "png-fast", "png-optimized", "webp", "avif", "jpeg"]
+
+# "conversation" fetches the ancestors chain with TweetDetail, "walk" fetches tweets one by one
+type ThreadFetchStrategy = Literal["conversation", "walk"]
+
 type Img = Image.Image
 type AnyDict[TKey = str] = dict[TKey, Any]
 
@@ -49,6 +59,9 @@ __all___ = [
     "Img",
     "AnyDict",
     "ClientBoundingRect",
+    "ImageFormat",
+    "PreviewMedia",
+    "ThreadFetchStrategy",
     "Viewport",
     "BrowserContextConfig",
 ]
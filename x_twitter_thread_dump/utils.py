@@ -2,8 +2,10 @@ import asyncio
 import math
 import re
 import time
-from collections.abc import AsyncIterable, Callable, Coroutine, Iterable, Iterator
+from collections import Counter
+from collections.abc import AsyncIterable, Awaitable, Callable, Coroutine, Hashable, Iterable, Iterator
 from contextlib import contextmanager
+from dataclasses import dataclass, field
 from functools import wraps
 from typing import Any, cast
 from urllib.parse import urlparse
@@ -81,6 +83,43 @@ def async_to_sync[**P, R](func: Callable[P, Coroutine[Any, Any, R]], /) -> Calla
     return cast(Callable[P, R], wrapper)
 
 
+@dataclass
+class SingleFlight[K: Hashable, R]:
+    """Concurrent calls with the same key await a single in-flight call instead of running their own.
+
+    The in-flight call is cancelled once every caller awaiting it has been cancelled.
+    """
+
+    _in_flight: dict[K, asyncio.Future[R]] = field(init=False, default_factory=dict)
+    _waiters: Counter[asyncio.Future[R]] = field(init=False, default_factory=Counter)
+
+    def __contains__(self, key: K, /) -> bool:
+        return key in self._in_flight
+
+    def _forget(self, key: K, fut: asyncio.Future[R], /) -> None:
+        if self._in_flight.get(key) is fut:
+            del self._in_flight[key]
+
+    async def run(self, key: K, call: Callable[[], Awaitable[R]], /) -> R:
+        if (fut := self._in_flight.get(key)) is None:
+            fut = self._in_flight[key] = asyncio.ensure_future(call())
+            fut.add_done_callback(lambda f: self._forget(key, f))
+
+        self._waiters[fut] += 1
+        try:
+            # one impatient caller should not cancel the call for everyone else
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            if self._waiters[fut] == 1:
+                fut.cancel()
+
+            raise
+        finally:
+            self._waiters[fut] -= 1
+            if not self._waiters[fut]:
+                del self._waiters[fut]
+
+
 @contextmanager
 def elapsed(label: str) -> Iterator[None]:
     start = time.perf_counter()
@@ -93,6 +132,7 @@ def elapsed(label: str) -> Iterator[None]:
 
 
 __all__ = [
+    "SingleFlight",
     "alimited",
     "async_to_sync",
     "elapsed",